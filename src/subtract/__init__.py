@@ -10,12 +10,30 @@ __version__ = "1.0.0-alpha"
 __author__ = "SubTract Development Team"
 __email__ = "oozalay@unmc.edu"
 
-from .core.pipeline_runner import PipelineRunner
-from .core.subject_manager import SubjectManager
-from .config.settings import SubtractConfig
-
 __all__ = [
     "PipelineRunner",
     "SubjectManager", 
     "SubtractConfig",
-] 
\ No newline at end of file
+]
+
+# Public classes are imported on first access (PEP 562) so that importing the
+# package, e.g. for `subtract --help`, does not pull in the whole pipeline.
+_LAZY_IMPORTS = {
+    "PipelineRunner": ".core.pipeline_runner",
+    "SubjectManager": ".core.subject_manager",
+    "SubtractConfig": ".config.settings",
+}
+
+
+def __getattr__(name):
+    if name in _LAZY_IMPORTS:
+        import importlib
+        module = importlib.import_module(_LAZY_IMPORTS[name], __name__)
+        value = getattr(module, name)
+        globals()[name] = value
+        return value
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
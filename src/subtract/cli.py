@@ -7,7 +7,7 @@ with support for BIDS datasets and comprehensive progress tracking.
 
 import sys
 from pathlib import Path
-from typing import List, Optional
+from typing import List, Optional, Tuple, TYPE_CHECKING
 import logging
 
 import click
@@ -17,9 +17,9 @@ from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, TimeEl
 from rich.logging import RichHandler
 from rich.panel import Panel
 
-from .config.settings import SubtractConfig
-from .core.subject_manager import SubjectManager
-from .core.pipeline_runner import PipelineRunner
+if TYPE_CHECKING:
+    from .core.subject_manager import SubjectManager
+    from .core.pipeline_runner import PipelineRunner
 
 
 console = Console()
@@ -42,7 +42,9 @@ def setup_logging(verbose: bool = False) -> logging.Logger:
     return logging.getLogger("subtract")
 
 
-@click.group()
+# Commands import the configuration and pipeline modules on demand, so shell
+# completion (_SUBTRACT_COMPLETE=bash_source subtract) and --help only load click and rich.
+@click.group(context_settings={"auto_envvar_prefix": "SUBTRACT"})
 @click.option('--verbose', '-v', is_flag=True, help='Enable verbose logging')
 @click.pass_context
 def cli(ctx, verbose):
@@ -53,8 +55,8 @@ def cli(ctx, verbose):
 
 
 @cli.command()
-@click.argument('bids_dir', type=click.Path(exists=True, path_type=Path))
-@click.option('--output-dir', '-o', type=click.Path(path_type=Path), 
+@click.argument('bids_dir', type=click.Path(exists=True, resolve_path=True, path_type=Path))
+@click.option('--output-dir', '-o', type=click.Path(resolve_path=True, path_type=Path), 
               help='Output directory for pipeline results (default: BIDS_DIR/derivatives/subtract)')
 @click.option('--participant-label', '-p', multiple=True, 
               help='One or more participant labels to process (e.g., sub-001 sub-002)')
@@ -93,6 +95,9 @@ def run(ctx, bids_dir, output_dir, participant_label, session_id, steps,
     Example:
         subtract run /path/to/bids/dataset --participant-label sub-001 --steps tractography,sift2
     """
+    from .config.settings import SubtractConfig
+    from .core.subject_manager import SubjectManager
+    from .core.pipeline_runner import PipelineRunner
     
     logger = ctx.obj['logger']
     
@@ -105,29 +110,36 @@ def run(ctx, bids_dir, output_dir, participant_label, session_id, steps,
     config.paths.result_dir = output_dir / "results"
     config.processing.n_threads = n_threads
     config.processing.force_overwrite = force
-    config.steps_to_run = list(steps)
+    
+    # Accept both repeated --steps flags and comma-separated lists
+    try:
+        config.steps_to_run = [step.strip() for value in steps for step in value.split(',') if step.strip()]
+    except ValueError as e:
+        console.print(f"[red]Invalid --steps: {e}[/red]")
+        sys.exit(1)
     
     # Filter subjects if specified
     if participant_label:
-        subject_filter = "|".join(participant_label)
-        config.subject_filter = f"^({subject_filter})$"
+        config.participant_labels = list(participant_label)
     
     # Filter sessions if specified
     if session_id:
         config.bids.sessions = list(session_id)
     
-    # Validate configuration
+    # Validate configuration (full BIDS validation is skipped for dry runs)
     try:
         config.validate_paths()
-        if config.bids.validate_bids:
+        if config.bids.validate_bids and not dry_run:
             config.validate_bids_structure()
     except Exception as e:
         console.print(f"[red]Configuration validation failed: {e}[/red]")
         sys.exit(1)
     
-    # Initialize managers
-    subject_manager = SubjectManager(config, logger)
-    pipeline_runner = PipelineRunner(config, logger)
+    if dry_run and config.bids.validate_bids:
+        console.print("[yellow]Dry run: full BIDS validation skipped[/yellow]")
+    
+    # Initialize subject manager (real runs keep validation results for next time)
+    subject_manager = SubjectManager(config, logger, persist_validation=not dry_run)
     
     # Discover subjects
     subjects = subject_manager.discover_subjects()
@@ -142,7 +154,7 @@ def run(ctx, bids_dir, output_dir, participant_label, session_id, steps,
         f"BIDS Directory: {bids_dir}\n"
         f"Output Directory: {output_dir}\n"
         f"Subjects: {len(subjects)}\n"
-        f"Steps: {', '.join(steps)}\n"
+        f"Steps: {', '.join(config.steps_to_run)}\n"
         f"Threads: {n_threads}\n"
         f"Parallel: {parallel}",
         title="Processing Plan"
@@ -152,21 +164,23 @@ def run(ctx, bids_dir, output_dir, participant_label, session_id, steps,
         _show_processing_plan(subject_manager, subjects)
         return
     
+    # Processors are only needed for a real run
+    pipeline_runner = PipelineRunner(config, logger)
+    
     # Run pipeline
     if parallel:
         console.print("[blue]Running subjects in parallel...[/blue]")
-        results = pipeline_runner.run_multiple_subjects(subjects, parallel=True)
     else:
         console.print("[blue]Running subjects sequentially...[/blue]")
-        results = pipeline_runner.run_multiple_subjects(subjects, parallel=False)
+    
+    summary = _run_pipeline_with_progress(pipeline_runner, subject_manager, subjects, parallel=parallel)
     
     # Show summary
-    summary = pipeline_runner.get_pipeline_summary(results)
     _show_pipeline_summary(summary)
 
 
 @cli.command()
-@click.argument('bids_dir', type=click.Path(exists=True, path_type=Path))
+@click.argument('bids_dir', type=click.Path(exists=True, resolve_path=True, path_type=Path))
 @click.option('--participant-label', '-p', multiple=True,
               help='Participant label(s) to validate')
 @click.option('--session-id', '-s', multiple=True,
@@ -174,6 +188,8 @@ def run(ctx, bids_dir, output_dir, participant_label, session_id, steps,
 @click.pass_context
 def validate(ctx, bids_dir, participant_label, session_id):
     """Validate BIDS dataset for SubTract processing."""
+    from .config.settings import SubtractConfig
+    from .core.subject_manager import SubjectManager
     
     logger = ctx.obj['logger']
     
@@ -182,8 +198,7 @@ def validate(ctx, bids_dir, participant_label, session_id):
     
     # Filter subjects if specified
     if participant_label:
-        subject_filter = "|".join(participant_label)
-        config.subject_filter = f"^({subject_filter})$"
+        config.participant_labels = list(participant_label)
     
     # Filter sessions if specified
     if session_id:
@@ -201,6 +216,12 @@ def validate(ctx, bids_dir, participant_label, session_id):
     
     console.print(f"[blue]Validating {len(subjects)} subjects...[/blue]")
     
+    # Validate all subjects/sessions concurrently, then build the rows in order
+    pairs = subject_manager.get_subject_session_pairs(subjects)
+    validations = subject_manager.validate_subjects(pairs)
+    rows = [_validation_row(validation) for validation in validations]
+    total_valid = sum(1 for validation in validations if validation['valid'])
+    
     # Create validation table
     table = Table(title="BIDS Validation Results")
     table.add_column("Subject", style="cyan")
@@ -211,34 +232,22 @@ def validate(ctx, bids_dir, participant_label, session_id):
     table.add_column("Status", justify="center")
     table.add_column("Issues")
     
-    total_valid = 0
-    
-    for subject_id in subjects:
-        sessions = subject_manager.get_subject_sessions(subject_id)
-        
-        if sessions:
-            for session_id in sessions:
-                validation = subject_manager.validate_subject(subject_id, session_id)
-                _add_validation_row(table, validation)
-                if validation['valid']:
-                    total_valid += 1
-        else:
-            validation = subject_manager.validate_subject(subject_id)
-            _add_validation_row(table, validation)
-            if validation['valid']:
-                total_valid += 1
+    for row in rows:
+        table.add_row(*row)
     
     console.print(table)
     console.print(f"\n[green]{total_valid} valid subjects/sessions found[/green]")
 
 
 @cli.command()
-@click.argument('bids_dir', type=click.Path(exists=True, path_type=Path))
-@click.option('--output-dir', '-o', type=click.Path(path_type=Path),
+@click.argument('bids_dir', type=click.Path(exists=True, resolve_path=True, path_type=Path))
+@click.option('--output-dir', '-o', type=click.Path(resolve_path=True, path_type=Path),
               help='Output directory (default: BIDS_DIR/derivatives/subtract)')
 @click.pass_context
 def status(ctx, bids_dir, output_dir):
     """Show processing status for subjects."""
+    from .config.settings import SubtractConfig
+    from .core.subject_manager import SubjectManager
     
     logger = ctx.obj['logger']
     
@@ -286,12 +295,13 @@ def status(ctx, bids_dir, output_dir):
 
 
 @cli.command()
-@click.argument('bids_dir', type=click.Path(exists=True, path_type=Path))
-@click.option('--output', '-o', type=click.Path(path_type=Path), default='subtract_config.yaml',
+@click.argument('bids_dir', type=click.Path(exists=True, resolve_path=True, path_type=Path))
+@click.option('--output', '-o', type=click.Path(resolve_path=True, path_type=Path), default='subtract_config.yaml',
               help='Output configuration file path')
 @click.pass_context
 def init_config(ctx, bids_dir, output):
     """Create a configuration file for a BIDS dataset."""
+    from .config.settings import SubtractConfig
     
     logger = ctx.obj['logger']
     
@@ -311,10 +321,13 @@ def init_config(ctx, bids_dir, output):
 
 
 @cli.command()
-@click.argument('config_file', type=click.Path(path_type=Path))
+@click.argument('config_file', type=click.Path(resolve_path=True, path_type=Path))
 @click.pass_context
 def run_config(ctx, config_file):
     """Run pipeline using a configuration file."""
+    from .config.settings import SubtractConfig
+    from .core.subject_manager import SubjectManager
+    from .core.pipeline_runner import PipelineRunner
     
     logger = ctx.obj['logger']
     
@@ -333,8 +346,8 @@ def run_config(ctx, config_file):
         console.print(f"[red]Configuration validation failed: {e}[/red]")
         sys.exit(1)
     
-    # Initialize managers
-    subject_manager = SubjectManager(config, logger)
+    # Initialize managers (the run path keeps validation results for next time)
+    subject_manager = SubjectManager(config, logger, persist_validation=True)
     pipeline_runner = PipelineRunner(config, logger)
     
     # Discover subjects
@@ -346,51 +359,79 @@ def run_config(ctx, config_file):
     
     # Run pipeline
     console.print(f"[blue]Processing {len(subjects)} subjects...[/blue]")
-    results = pipeline_runner.run_multiple_subjects(subjects)
+    summary = _run_pipeline_with_progress(pipeline_runner, subject_manager, subjects)
     
     # Show summary
-    summary = pipeline_runner.get_pipeline_summary(results)
     _show_pipeline_summary(summary)
 
 
-def _show_processing_plan(subject_manager: SubjectManager, subjects: List[str]):
+def _run_pipeline_with_progress(
+    pipeline_runner: "PipelineRunner",
+    subject_manager: "SubjectManager",
+    subjects: List[str],
+    parallel: bool = False
+) -> dict:
+    """Run the pipeline, folding each subject's results into the summary as it completes."""
+    from .core.pipeline_runner import PipelineSummaryAccumulator
+    
+    accumulator = PipelineSummaryAccumulator()
+    
+    with Progress(
+        SpinnerColumn(),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(),
+        TimeElapsedColumn(),
+        console=console
+    ) as progress:
+        task = progress.add_task("Processing subjects/sessions", total=None)
+        
+        for subject_key, subject_results in pipeline_runner.iter_multiple_subjects(
+            subjects, parallel=parallel, subject_manager=subject_manager
+        ):
+            accumulator.add(subject_results)
+            progress.update(
+                task,
+                advance=1,
+                description=f"Processed {accumulator.total_subjects} subjects/sessions (last: {subject_key})"
+            )
+    
+    return accumulator.get_summary()
+
+
+def _show_processing_plan(subject_manager: "SubjectManager", subjects: List[str]):
     """Show what would be processed in dry-run mode."""
+    # Build all rows up front, then populate the table in one pass
+    pairs = subject_manager.get_subject_session_pairs(subjects)
+    rows = [_processing_plan_row(validation) for validation in subject_manager.validate_subjects(pairs)]
+    
     table = Table(title="Processing Plan (Dry Run)")
     table.add_column("Subject", style="cyan")
     table.add_column("Session", style="magenta")
     table.add_column("DWI Files", justify="right")
     table.add_column("Status")
     
-    for subject_id in subjects:
-        sessions = subject_manager.get_subject_sessions(subject_id)
-        
-        if sessions:
-            for session_id in sessions:
-                validation = subject_manager.validate_subject(subject_id, session_id)
-                status = "✓ Ready" if validation['valid'] else "✗ Issues"
-                table.add_row(
-                    subject_id,
-                    session_id,
-                    str(validation['data_summary'].get('dwi_files', 0)),
-                    status
-                )
-        else:
-            validation = subject_manager.validate_subject(subject_id)
-            status = "✓ Ready" if validation['valid'] else "✗ Issues"
-            table.add_row(
-                subject_id,
-                "-",
-                str(validation['data_summary'].get('dwi_files', 0)),
-                status
-            )
+    for row in rows:
+        table.add_row(*row)
     
     console.print(table)
 
 
-def _add_validation_row(table: Table, validation: dict):
-    """Add a validation result row to the table."""
+def _processing_plan_row(validation: dict) -> Tuple[str, ...]:
+    """Build a dry-run table row from a validation result."""
+    status = "✓ Ready" if validation['valid'] else "✗ Issues"
+    
+    return (
+        validation['subject_id'],
+        validation.get('session_id') or "-",
+        str(validation['data_summary'].get('dwi_files', 0)),
+        status
+    )
+
+
+def _validation_row(validation: dict) -> Tuple[str, ...]:
+    """Build a validation table row from a validation result."""
     subject_id = validation['subject_id']
-    session_id = validation.get('session_id', '-')
+    session_id = validation.get('session_id') or "-"
     dwi_files = validation['data_summary'].get('dwi_files', 0)
     anat_files = validation['data_summary'].get('anat_files', 0)
     dual_pe = "✓" if validation['data_summary'].get('dual_phase_encoding', False) else "✗"
@@ -407,7 +448,7 @@ def _add_validation_row(table: Table, validation: dict):
             issues += "; "
         issues += f"{len(validation['warnings'])} warnings"
     
-    table.add_row(
+    return (
         subject_id,
         session_id,
         str(dwi_files),
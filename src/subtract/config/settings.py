@@ -3,9 +3,21 @@ Configuration management for SubTract pipeline.
 """
 
 from pathlib import Path
-from typing import Dict, List, Optional, Union
-from pydantic import BaseModel, Field, validator
+from typing import Any, Dict, FrozenSet, List, Optional, Pattern, Tuple, Union
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, field_validator, model_validator
+import copy
 import os
+import re
+import sys
+
+
+# Parsed YAML configurations keyed by (resolved path, mtime)
+_CONFIG_CACHE: Dict[Tuple[str, float], Dict[str, Any]] = {}
+
+
+def _strip_prefix(label: str, prefix: str) -> str:
+    """Remove a BIDS entity prefix (e.g. 'sub-') from a label if present."""
+    return label[len(prefix):] if label.startswith(prefix) else label
 
 
 class PathConfig(BaseModel):
@@ -16,12 +28,27 @@ class PathConfig(BaseModel):
     analysis_dir: Path = Field(description="Directory for analysis outputs")
     result_dir: Path = Field(description="Directory for final results")
     script_dir: Path = Field(description="Directory containing scripts and templates")
+    layout_cache: Optional[Path] = Field(
+        default=None,
+        description="Directory for the persisted pybids layout index (default: analysis_dir/.bids_layout.sqlite)"
+    )
     
-    @validator('*', pre=True)
+    @field_validator('*', mode='before')
+    @classmethod
     def expand_paths(cls, v):
         if isinstance(v, (str, Path)):
-            return Path(v).expanduser().resolve()
+            path = Path(v).expanduser()
+            if path.is_absolute():
+                # Already absolute (e.g. resolved by click): normalise without filesystem calls
+                return Path(os.path.normpath(path))
+            return path.resolve()
         return v
+    
+    def get_layout_cache(self) -> Path:
+        """Get the pybids layout cache location, falling back to the analysis directory."""
+        if self.layout_cache is not None:
+            return self.layout_cache
+        return self.analysis_dir / ".bids_layout.sqlite"
 
 
 class BIDSConfig(BaseModel):
@@ -67,6 +94,7 @@ class ProcessingConfig(BaseModel):
     # General processing
     n_threads: int = Field(default=24, description="Number of threads for processing")
     force_overwrite: bool = Field(default=False, description="Force overwrite existing files")
+    fast_skip_check: bool = Field(default=False, description="Treat a step as done if its last expected output exists")
     
     # Denoising parameters
     denoise_method: str = Field(default="dwidenoise", description="Denoising method")
@@ -74,6 +102,14 @@ class ProcessingConfig(BaseModel):
     # TopUp parameters
     topup_config: str = Field(default="b02b0.cnf", description="TopUp configuration file")
     readout_time: Optional[float] = Field(default=None, description="Total readout time (auto-detect from JSON if None)")
+    inprocess_b0_merge: bool = Field(
+        default=False,
+        description="Extract and merge the TopUp B0 volumes with nibabel instead of fslroi/fslmerge"
+    )
+    topup_scratch: bool = Field(
+        default=False,
+        description="Write the TopUp B0 intermediates uncompressed to /dev/shm and discard them afterwards"
+    )
     
     # Eddy parameters
     eddy_cuda: bool = Field(default=True, description="Use CUDA for Eddy if available")
@@ -93,20 +129,35 @@ class ProcessingConfig(BaseModel):
     sift2_output_coeffs: bool = Field(default=True, description="Generate SIFT2 coefficients files")
     sift2_output_mu: bool = Field(default=True, description="Generate mu (proportionality coefficient) files")
     sift2_fd_scale_gm: bool = Field(default=False, description="Scale fibre density by GM volume")
+    
+    # Connectome parameters
+    inprocess_fingerprints: bool = Field(
+        default=False,
+        description="Sample tracks and build fingerprints in-process instead of tcksample/tck2connectome"
+    )
+    track_sampler: str = Field(
+        default="numpy",
+        description="Streamline sampler for in-process fingerprints: 'numpy' or 'tcksample' (piped, exact MRtrix3 sampling)"
+    )
+    connectome_batch_size: int = Field(default=4, description="Subjects ConnectivityMatrix.process_batch runs at once, sharing the thread budget")
+
+
+# Default fsaverage ROIs, interned so name comparisons are identity checks
+DEFAULT_ROI_NAMES: Tuple[str, ...] = tuple(sys.intern(name) for name in (
+    "L_bnst_fsaverage", "R_bnst_fsaverage",
+    "L_amygdala_fsaverage", "R_amygdala_fsaverage",
+    "L_hippocampus_fsaverage", "R_hippocampus_fsaverage",
+    "L_vmPFC_fsaverage", "R_vmPFC_fsaverage",
+    "L_insula_fsaverage", "R_insula_fsaverage",
+    "L_hypothalamus_fsaverage", "R_hypothalamus_fsaverage"
+))
 
 
 class ROIConfig(BaseModel):
     """ROI configuration."""
     
-    roi_names: List[str] = Field(
-        default=[
-            "L_bnst_fsaverage", "R_bnst_fsaverage",
-            "L_amygdala_fsaverage", "R_amygdala_fsaverage",
-            "L_hippocampus_fsaverage", "R_hippocampus_fsaverage",
-            "L_vmPFC_fsaverage", "R_vmPFC_fsaverage",
-            "L_insula_fsaverage", "R_insula_fsaverage",
-            "L_hypothalamus_fsaverage", "R_hypothalamus_fsaverage"
-        ],
+    roi_names: Tuple[str, ...] = Field(
+        default=DEFAULT_ROI_NAMES,
         description="List of ROI names in fsaverage space to process"
     )
     
@@ -114,6 +165,33 @@ class ROIConfig(BaseModel):
         default=True,
         description="Use GM-WM boundary for tractography"
     )
+    
+    model_config = ConfigDict(frozen=True)
+    
+    _roi_name_set: Optional[FrozenSet[str]] = PrivateAttr(default=None)
+    
+    @field_validator('roi_names', mode='before')
+    @classmethod
+    def intern_roi_names(cls, v):
+        if isinstance(v, (list, tuple)):
+            return tuple(sys.intern(str(name)) for name in v)
+        return v
+    
+    @property
+    def roi_name_set(self) -> FrozenSet[str]:
+        """ROI names as a frozenset for O(1) membership tests."""
+        if self._roi_name_set is None:
+            self._roi_name_set = frozenset(self.roi_names)
+        return self._roi_name_set
+
+
+# All pipeline steps in execution order
+PIPELINE_STEPS: Tuple[str, ...] = (
+    "copy_data", "denoise", "degibbs", "topup", "eddy", 
+    "mdt", "mrtrix_prep", 
+    "tractography", "sift2", "roi_registration", 
+    "connectome"
+)
 
 
 class SubtractConfig(BaseModel):
@@ -124,36 +202,112 @@ class SubtractConfig(BaseModel):
     processing: ProcessingConfig = Field(default_factory=ProcessingConfig)
     rois: ROIConfig = Field(default_factory=ROIConfig)
     
+    model_config = ConfigDict(validate_assignment=True)
+    
     # Pipeline steps to run
     steps_to_run: List[str] = Field(
-        default=[
-            "copy_data", "denoise", "degibbs", "topup", "eddy", 
-            "mdt", "mrtrix_prep", 
-            "tractography", "sift2", "roi_registration", 
-            "connectome"
-        ],
+        default=list(PIPELINE_STEPS),
         description="Pipeline steps to execute"
     )
     
     # Subject filtering
     subject_filter: Optional[str] = Field(
         default=None, 
-        description="Regex pattern to filter subjects"
+        description="Regex pattern that subject IDs must match in full"
+    )
+    
+    # Explicit participant selection (set membership, no regex)
+    participant_labels: Optional[List[str]] = Field(
+        default=None,
+        description="Participant labels to process, with or without the 'sub-' prefix"
     )
     
+    _compiled_subject_filter: Optional[Tuple[str, Pattern[str]]] = PrivateAttr(default=None)
+    _step_set: Optional[FrozenSet[str]] = PrivateAttr(default=None)
+    
+    @field_validator('steps_to_run')
+    @classmethod
+    def order_steps(cls, v):
+        requested = frozenset(v)
+        unknown = requested - frozenset(PIPELINE_STEPS)
+        if unknown:
+            raise ValueError(
+                f"Unknown pipeline steps: {', '.join(sorted(unknown))}. "
+                f"Available steps: {', '.join(PIPELINE_STEPS)}"
+            )
+        # Always execute in canonical pipeline order, without duplicates
+        return [step for step in PIPELINE_STEPS if step in requested]
+    
+    @model_validator(mode='after')
+    def invalidate_step_set(self):
+        # Runs again on every assignment (validate_assignment), including steps_to_run
+        self._step_set = None
+        return self
+    
+    @property
+    def step_set(self) -> FrozenSet[str]:
+        """Steps to run as a frozenset for O(1) membership tests."""
+        if self._step_set is None:
+            self._step_set = frozenset(self.steps_to_run)
+        return self._step_set
+    
+    @property
+    def compiled_subject_filter(self) -> Optional[Pattern[str]]:
+        """Compiled subject_filter regex, recompiled only when the pattern changes."""
+        if not self.subject_filter:
+            return None
+        
+        cached = self._compiled_subject_filter
+        if cached is None or cached[0] != self.subject_filter:
+            cached = (self.subject_filter, re.compile(self.subject_filter))
+            self._compiled_subject_filter = cached
+        
+        return cached[1]
+    
+    def filter_subjects(self, subjects: List[str]) -> List[str]:
+        """
+        Apply participant_labels and subject_filter to a list of subject IDs.
+        
+        Args:
+            subjects: Subject identifiers to filter
+            
+        Returns:
+            Subject identifiers that pass both filters
+        """
+        if self.participant_labels:
+            labels: FrozenSet[str] = frozenset(_strip_prefix(label, "sub-") for label in self.participant_labels)
+            subjects = [s for s in subjects if _strip_prefix(s, "sub-") in labels]
+        
+        pattern = self.compiled_subject_filter
+        if pattern is not None:
+            subjects = [s for s in subjects if pattern.fullmatch(s)]
+        
+        return subjects
+    
     @classmethod
     def from_file(cls, config_path: Union[str, Path]) -> "SubtractConfig":
         """Load configuration from file."""
         import yaml
+        try:
+            from yaml import CSafeLoader as SafeLoader
+        except ImportError:
+            # libyaml bindings not available, use the pure Python loader
+            from yaml import SafeLoader
         
         config_path = Path(config_path)
         if not config_path.exists():
             raise FileNotFoundError(f"Configuration file not found: {config_path}")
         
-        with open(config_path, 'r') as f:
-            config_data = yaml.safe_load(f)
+        cache_key = (str(config_path.resolve()), config_path.stat().st_mtime)
+        config_data = _CONFIG_CACHE.get(cache_key)
+        
+        if config_data is None:
+            with open(config_path, 'r') as f:
+                config_data = yaml.load(f, Loader=SafeLoader)
+            _CONFIG_CACHE[cache_key] = config_data
         
-        return cls(**config_data)
+        # Hand out a copy so callers cannot mutate the cached entry
+        return cls(**copy.deepcopy(config_data))
     
     @classmethod
     def from_legacy_bash(cls, base_path: Union[str, Path]) -> "SubtractConfig":
@@ -191,26 +345,20 @@ class SubtractConfig(BaseModel):
     def save_to_file(self, config_path: Union[str, Path]) -> None:
         """Save configuration to file."""
         import yaml
+        try:
+            from yaml import CSafeDumper as SafeDumper
+        except ImportError:
+            # libyaml bindings not available, use the pure Python dumper
+            from yaml import SafeDumper
         
         config_path = Path(config_path)
         config_path.parent.mkdir(parents=True, exist_ok=True)
         
-        # Convert to dict and handle Path objects
-        config_dict = self.dict()
-        
-        def convert_paths(obj):
-            if isinstance(obj, dict):
-                return {k: convert_paths(v) for k, v in obj.items()}
-            elif isinstance(obj, list):
-                return [convert_paths(item) for item in obj]
-            elif isinstance(obj, Path):
-                return str(obj)
-            return obj
-        
-        config_dict = convert_paths(config_dict)
+        # JSON mode serializes Path objects to strings
+        config_dict = self.model_dump(mode="json")
         
         with open(config_path, 'w') as f:
-            yaml.dump(config_dict, f, default_flow_style=False, indent=2)
+            yaml.dump(config_dict, f, Dumper=SafeDumper, default_flow_style=False, indent=2)
     
     def validate_paths(self) -> bool:
         """Validate that required paths exist."""
@@ -241,10 +389,69 @@ class SubtractConfig(BaseModel):
         
         try:
             import bids
-            layout = bids.BIDSLayout(self.paths.data_dir, validate=True)
-            return True
         except ImportError:
             # pybids not available, skip validation
             return True
+        
+        # Reuse the persisted SQLite index unless the dataset has changed
+        cache_path = self.paths.get_layout_cache()
+        reset_database = self._is_layout_cache_stale(cache_path)
+        
+        try:
+            bids.BIDSLayout(
+                self.paths.data_dir,
+                validate=True,
+                database_path=cache_path,
+                reset_database=reset_database
+            )
         except Exception as e:
-            raise ValueError(f"BIDS validation failed: {str(e)}") 
\ No newline at end of file
+            raise ValueError(f"BIDS validation failed: {str(e)}")
+        
+        if reset_database:
+            self._write_layout_cache_stamp(cache_path)
+        
+        return True
+    
+    def _get_layout_cache_key(self) -> Dict[str, Union[str, float, int]]:
+        """
+        Build the cache key for the layout index.
+        
+        data_dir's own mtime changes whenever a subject directory is added
+        or removed; dataset_description.json covers dataset-level edits.
+        """
+        dataset_desc = self.paths.data_dir / "dataset_description.json"
+        mtime = dataset_desc.stat().st_mtime if dataset_desc.exists() else 0.0
+        try:
+            data_dir_mtime_ns = self.paths.data_dir.stat().st_mtime_ns
+        except OSError:
+            data_dir_mtime_ns = 0
+        
+        return {
+            "data_dir": str(self.paths.data_dir),
+            "data_dir_mtime_ns": data_dir_mtime_ns,
+            "mtime": mtime
+        }
+    
+    def _is_layout_cache_stale(self, cache_path: Path) -> bool:
+        """Check whether the persisted layout index must be rebuilt."""
+        import json
+        
+        stamp_file = cache_path / "subtract_cache_key.json"
+        if not stamp_file.exists():
+            return True
+        
+        try:
+            with open(stamp_file, 'r') as f:
+                cached_key = json.load(f)
+        except (OSError, ValueError):
+            return True
+        
+        return cached_key != self._get_layout_cache_key()
+    
+    def _write_layout_cache_stamp(self, cache_path: Path) -> None:
+        """Record the cache key next to a freshly built layout index."""
+        import json
+        
+        cache_path.mkdir(parents=True, exist_ok=True)
+        with open(cache_path / "subtract_cache_key.json", 'w') as f:
+            json.dump(self._get_layout_cache_key(), f) 
\ No newline at end of file
@@ -8,11 +8,94 @@ This processor implements Step 011 of the SubTract pipeline:
 """
 
 import logging
+import os
+import subprocess
+import tempfile
+import threading
 import time
 from pathlib import Path
 from typing import List, Optional, Dict, Any
 
-from subtract.core.base_processor import MRtrix3Processor, ProcessingResult
+from subtract.core.base_processor import MRtrix3Processor, ProcessingResult, thread_budget
+from subtract.utils.conda_utils import get_activated_environment, get_conda_command, get_tool_environment
+
+try:
+    import nibabel as nib
+    import numpy as np
+except ImportError:
+    nib = None
+    np = None
+
+try:
+    from scipy import ndimage
+    from scipy.spatial import cKDTree
+except ImportError:
+    ndimage = None
+    cKDTree = None
+
+
+try:
+    import numba
+except ImportError:
+    numba = None
+
+
+if numba is not None:
+    @numba.njit(parallel=True, fastmath=True, cache=True)
+    def _sample_tracks_numba(vol, points, affine_inv, offsets, lengths, out):
+        """Per-streamline mean of trilinear samples (zero outside the volume)."""
+        nx, ny, nz = vol.shape
+        for i in numba.prange(offsets.shape[0]):
+            acc = 0.0
+            for k in range(offsets[i], offsets[i] + lengths[i]):
+                # World (mm) -> voxel, done per point to avoid an N x 3 temporary
+                px = points[k, 0]
+                py = points[k, 1]
+                pz = points[k, 2]
+                x = affine_inv[0, 0] * px + affine_inv[0, 1] * py + affine_inv[0, 2] * pz + affine_inv[0, 3]
+                y = affine_inv[1, 0] * px + affine_inv[1, 1] * py + affine_inv[1, 2] * pz + affine_inv[1, 3]
+                z = affine_inv[2, 0] * px + affine_inv[2, 1] * py + affine_inv[2, 2] * pz + affine_inv[2, 3]
+                x0 = int(np.floor(x))
+                y0 = int(np.floor(y))
+                z0 = int(np.floor(z))
+                fx = x - x0
+                fy = y - y0
+                fz = z - z0
+                
+                value = 0.0
+                for dx in range(2):
+                    xi = x0 + dx
+                    if xi < 0 or xi >= nx:
+                        continue
+                    wx = fx if dx else 1.0 - fx
+                    for dy in range(2):
+                        yi = y0 + dy
+                        if yi < 0 or yi >= ny:
+                            continue
+                        wy = fy if dy else 1.0 - fy
+                        for dz in range(2):
+                            zi = z0 + dz
+                            if zi < 0 or zi >= nz:
+                                continue
+                            wz = fz if dz else 1.0 - fz
+                            value += wx * wy * wz * vol[xi, yi, zi]
+                acc += value
+            # Empty streamlines have no samples to average
+            out[i] = acc / lengths[i] if lengths[i] > 0 else 0.0
+else:
+    _sample_tracks_numba = None
+
+# Serializes launches of the parallel kernel: numba's workqueue threading
+# layer (used without TBB/OpenMP) aborts on concurrent launches
+_NUMBA_LOCK = threading.Lock()
+
+
+# The composite is only a streamline weight; half precision is ample and
+# halves the bytes tcksample has to read
+COMPOSITE_DATATYPE = "float16"
+
+# Matches tck2connectome's default -assignment_radial_search distance (mm)
+ASSIGNMENT_SEARCH_RADIUS = 4.0
 
 
 class ConnectivityMatrix(MRtrix3Processor):
@@ -23,6 +106,19 @@ class ConnectivityMatrix(MRtrix3Processor):
     to create weighted connectivity fingerprints for BNST network analysis.
     """
     
+    # mrcalc RPN for the composite formula; "{...}" tokens are replaced by paths
+    _MRCALC_TEMPLATE = (
+        "mrcalc",
+        "{ndi}", "0.35", "-mult",
+        "{odi}", "-neg", "1", "-add", "0.25", "-mult", "-add",
+        "{stick}", "0.25", "-mult", "-add",
+        "{ball}", "-neg", "1", "-add", "0.15", "-mult", "-add",
+        "0", "-max", "1", "-min",
+        "{out}",
+        "-datatype", COMPOSITE_DATATYPE,
+        "-force",
+    )
+    
     def __init__(self, config, logger: Optional[logging.Logger] = None):
         super().__init__(config, logger)
         self.step_name = "connectome"
@@ -30,9 +126,10 @@ class ConnectivityMatrix(MRtrix3Processor):
     
     def _check_dependencies(self) -> None:
         """Check that MRtrix3 tools are available."""
-        required_tools = ["mrcalc", "tcksample", "tck2connectome"]
+        required_tools = ["mrcalc", "mrconvert", "tcksample", "tck2connectome"]
         for tool in required_tools:
-            self.check_command_availability(tool)
+            if not self.find_tool(tool):
+                self.logger.warning(f"{tool} not found in 'subtract' environment")
     
     def process(self, subject_id: str, session_id: Optional[str] = None) -> ProcessingResult:
         """
@@ -55,6 +152,8 @@ class ConnectivityMatrix(MRtrix3Processor):
             else:
                 analysis_dir = self.config.paths.analysis_dir / f"sub-{subject_id}"
                 session_str = ""
+            # Resolve once; every input/output path below derives from this
+            analysis_dir = analysis_dir.resolve()
             
             connectome_dir = analysis_dir / "dwi" / "connectome"
             mrtrix_dir = analysis_dir / "dwi" / "mrtrix3"
@@ -72,19 +171,28 @@ class ConnectivityMatrix(MRtrix3Processor):
             outputs = []
             metrics = {}
             
-            # Part 1: Create composite microstructure and sample tracks
-            self.logger.info("Part 1: Creating composite microstructure and sampling tracks")
-            composite_file, track_weights = self._create_composite_and_sample(
-                subject_id, analysis_dir, connectome_dir, mrtrix_dir
-            )
-            outputs.append(composite_file)
-            outputs.extend(track_weights)
-            
-            # Part 2: Generate connectivity fingerprints
-            self.logger.info("Part 2: Generating connectivity fingerprints")
-            fingerprint_files = self._generate_connectivity_fingerprints(
-                subject_id, connectome_dir, mrtrix_dir, track_weights
-            )
+            if self._use_inprocess_fingerprints():
+                # Single pass: sample, average and bin streamlines in memory
+                self.logger.info("Creating composite microstructure and fingerprints in-process")
+                composite_file, track_weights, fingerprint_files = self._create_fingerprints_inprocess(
+                    subject_id, analysis_dir, connectome_dir, mrtrix_dir
+                )
+                outputs.append(composite_file)
+                outputs.extend(track_weights)
+            else:
+                # Part 1: Create composite microstructure and sample tracks
+                self.logger.info("Part 1: Creating composite microstructure and sampling tracks")
+                composite_file, track_weights = self._create_composite_and_sample(
+                    subject_id, analysis_dir, connectome_dir, mrtrix_dir
+                )
+                outputs.append(composite_file)
+                outputs.extend(track_weights)
+                
+                # Part 2: Generate connectivity fingerprints
+                self.logger.info("Part 2: Generating connectivity fingerprints")
+                fingerprint_files = self._generate_connectivity_fingerprints(
+                    subject_id, connectome_dir, mrtrix_dir, track_weights
+                )
             outputs.extend(fingerprint_files)
             
             # Collect metrics
@@ -117,6 +225,38 @@ class ConnectivityMatrix(MRtrix3Processor):
                 error_message=error_msg
             )
     
+    def process_batch(
+        self,
+        subject_ids: List[str],
+        session_ids: Optional[List[Optional[str]]] = None
+    ) -> List[ProcessingResult]:
+        """
+        Generate connectomes for several subjects as one pool of runs.
+        
+        Up to ``processing.connectome_batch_size`` subjects run at once, each
+        with an equal share of the thread budget; a new subject starts as soon
+        as one finishes, and the batch size bounds how many subjects' volumes
+        are held in memory at once.
+        
+        Args:
+            subject_ids: Subject identifiers
+            session_ids: Session identifier per subject (BIDS only)
+            
+        Returns:
+            ProcessingResult per subject, in the order given
+        """
+        if session_ids is None:
+            session_ids = [None] * len(subject_ids)
+        
+        batch_size = max(1, self.config.processing.connectome_batch_size)
+        subject_threads = max(1, self.n_threads // batch_size)
+        
+        def process_subject(subject: tuple[str, Optional[str]]) -> ProcessingResult:
+            with thread_budget(subject_threads):
+                return self.process(*subject)
+        
+        return self.map_concurrently(process_subject, list(zip(subject_ids, session_ids)), batch_size)
+    
     def _validate_prerequisites(self, subject_id: str, analysis_dir: Path, mrtrix_dir: Path) -> bool:
         """Validate that all prerequisite files exist."""
         # Microstructure files from MDT processing (Step 006) - BIDS format
@@ -147,10 +287,9 @@ class ConnectivityMatrix(MRtrix3Processor):
             required_roi_files
         )
         
-        missing_files = []
-        for f in all_required_files:
-            if not f.exists():
-                missing_files.append(str(f))
+        # Stat concurrently on the shared pool; each check can be slow on network filesystems
+        found = self.map_concurrently(os.path.exists, all_required_files, len(all_required_files))
+        missing_files = [str(f) for f, exists in zip(all_required_files, found) if not exists]
         
         if missing_files:
             self.logger.error(f"Missing prerequisite files for {subject_id}: {missing_files}")
@@ -181,25 +320,31 @@ class ConnectivityMatrix(MRtrix3Processor):
         
         # Output composite file
         composite_file = connectome_dir / "composite_microstructure.mif"
+        composite_str = str(composite_file)
         
         self.logger.info("Creating composite microstructure image")
         
         # Create composite microstructure using tested formula
         # Formula: NDI*0.35 + (1-ODI)*0.25 + w_stick0*0.25 + (1-w_ball)*0.15
-        cmd = [
-            "mrcalc",
-            str(ndi_file.resolve()), "0.35", "-mult",
-            str(odi_file.resolve()), "-neg", "1", "-add", "0.25", "-mult", "-add",
-            str(stick_file.resolve()), "0.25", "-mult", "-add", 
-            str(ball_file.resolve()), "-neg", "1", "-add", "0.15", "-mult", "-add",
-            str(composite_file.resolve()),
-            "-force"
-        ]
-        
-        self.run_command(cmd, cwd=connectome_dir)
+        if nib is not None:
+            self._write_composite_image(
+                ndi_file, odi_file, stick_file, ball_file, composite_file, connectome_dir
+            )
+        else:
+            placeholders = {
+                "{ndi}": str(ndi_file),
+                "{odi}": str(odi_file),
+                "{stick}": str(stick_file),
+                "{ball}": str(ball_file),
+                "{out}": composite_str,
+            }
+            cmd = [placeholders.get(token, token) for token in self._MRCALC_TEMPLATE]
+            
+            self.run_command(cmd, cwd=connectome_dir)
         
         # Sample microstructure along tracks for both hemispheres
         track_weights = []
+        cmds = []
         hemispheres = [
             {"suffix": "L", "name": "Left"},
             {"suffix": "R", "name": "Right"}
@@ -211,19 +356,356 @@ class ConnectivityMatrix(MRtrix3Processor):
             track_file = mrtrix_dir / f"tracks_1M_BNST_{hemi['suffix']}.tck"
             weights_file = connectome_dir / f"track_weights_1M_BNST_{hemi['suffix']}.txt"
             
-            cmd = [
+            cmds.append([
                 "tcksample",
-                str(track_file.resolve()),
-                str(composite_file.resolve()),
-                str(weights_file.resolve()),
+                str(track_file),
+                composite_str,
+                str(weights_file),
                 "-stat_tck", "mean"
-            ]
-            
-            self.run_command(cmd, cwd=connectome_dir)
+            ])
             track_weights.append(weights_file)
         
+        # Hemispheres are independent; sample both at once
+        self._run_commands_parallel(cmds, connectome_dir)
+        
         return composite_file, track_weights
     
+    def _write_composite_image(
+        self,
+        ndi_file: Path,
+        odi_file: Path,
+        stick_file: Path,
+        ball_file: Path,
+        composite_file: Path,
+        connectome_dir: Path
+    ) -> tuple:
+        """
+        Compute the composite microstructure image in-process and save it as .mif.
+        
+        The four maps are loaded once as float32 and combined in a single pass;
+        only the final NIfTI -> .mif conversion goes through MRtrix3, which
+        stores the result as float16 (NIfTI has no half-precision type).
+        
+        Returns:
+            Tuple of (composite array, voxel-to-world affine)
+        """
+        ndi_img = nib.load(str(ndi_file), mmap=True)
+        composite = self._compute_composite_numpy(
+            ndi_img.get_fdata(dtype=np.float32),
+            nib.load(str(odi_file), mmap=True).get_fdata(dtype=np.float32),
+            nib.load(str(stick_file), mmap=True).get_fdata(dtype=np.float32),
+            nib.load(str(ball_file), mmap=True).get_fdata(dtype=np.float32),
+        )
+        
+        composite_img = nib.Nifti1Image(composite, ndi_img.affine, ndi_img.header)
+        composite_img.set_data_dtype(np.float32)
+        
+        # Uncompressed intermediate; mrconvert reads it faster than .nii.gz
+        composite_nifti = composite_file.with_suffix(".nii")
+        composite_img.to_filename(str(composite_nifti))
+        try:
+            cmd = [
+                "mrconvert",
+                str(composite_nifti),
+                str(composite_file),
+                "-datatype", COMPOSITE_DATATYPE,
+                "-force"
+            ]
+            self.run_command(cmd, cwd=connectome_dir)
+        finally:
+            composite_nifti.unlink(missing_ok=True)
+        
+        return composite, ndi_img.affine
+    
+    @staticmethod
+    def _compute_composite_numpy(ndi, odi, stick, ball):
+        """
+        Fuse the composite microstructure formula into one output buffer.
+        
+        Computes NDI*0.35 + (1-ODI)*0.25 + stick*0.25 + (1-ball)*0.15 with
+        in-place operations, reusing a single scratch array, and clips the
+        result to [0, 1] so it is safe to store at half precision.
+        
+        Args:
+            ndi: Neurite density index map
+            odi: Orientation dispersion index map
+            stick: Stick volume fraction map
+            ball: Ball volume fraction map
+            
+        Returns:
+            Composite microstructure array (same shape and dtype as ``ndi``)
+        """
+        out = np.multiply(ndi, 0.35)
+        scratch = np.empty_like(out)
+        # Constant terms: 0.25*1 + 0.15*1
+        out += 0.40
+        np.multiply(odi, 0.25, out=scratch)
+        out -= scratch
+        np.multiply(stick, 0.25, out=scratch)
+        out += scratch
+        np.multiply(ball, 0.15, out=scratch)
+        out -= scratch
+        np.clip(out, 0.0, 1.0, out=out)
+        return out
+    
+    def _use_inprocess_fingerprints(self) -> bool:
+        """Check whether the in-process fingerprint path is enabled and usable."""
+        if not self.config.processing.inprocess_fingerprints:
+            return False
+        if nib is None or ndimage is None:
+            self.logger.warning(
+                "In-process fingerprints need nibabel, numpy and scipy; "
+                "falling back to tcksample/tck2connectome"
+            )
+            return False
+        return True
+    
+    def _create_fingerprints_inprocess(
+        self,
+        subject_id: str,
+        analysis_dir: Path,
+        connectome_dir: Path,
+        mrtrix_dir: Path
+    ) -> tuple[Path, List[Path], List[Path]]:
+        """
+        Create the composite image, track weights and both fingerprints in memory.
+        
+        Track weights are kept as float32 arrays and saved as binary .npy files
+        rather than the ASCII text written by tcksample.
+        
+        Returns:
+            Tuple of (composite_file, track_weights_files, fingerprint_files)
+        """
+        mdt_dir = analysis_dir / "dwi" / "mdt" / "output" / f"{subject_id}_brain_mask"
+        composite_file = connectome_dir / "composite_microstructure.mif"
+        
+        composite, composite_affine = self._write_composite_image(
+            mdt_dir / "NODDIDA" / "NDI.nii.gz",
+            mdt_dir / "NODDIDA" / "ODI.nii.gz",
+            mdt_dir / "BallStick_r1" / "w_stick0.w.nii.gz",
+            mdt_dir / "BallStick_r1" / "w_ball.w.nii.gz",
+            composite_file,
+            connectome_dir
+        )
+        composite_affine_inv = np.linalg.inv(composite_affine)
+        
+        hemispheres = [("L", "left"), ("R", "right")]
+        hemisphere_threads = max(1, self.n_threads // len(hemispheres))
+        
+        def run_hemisphere(hemisphere: tuple[str, str]) -> tuple[Path, Path]:
+            with thread_budget(hemisphere_threads):
+                return process_hemisphere(*hemisphere)
+        
+        def process_hemisphere(suffix: str, roi_name: str) -> tuple[Path, Path]:
+            roi_arr, roi_affine = self._load_mif(
+                mrtrix_dir / "ROIs" / f"{roi_name}_bnst_network_parcellation.mif", connectome_dir
+            )
+            streamlines = nib.streamlines.load(
+                str(mrtrix_dir / f"tracks_1M_BNST_{suffix}.tck")
+            ).streamlines
+            
+            if self.config.processing.track_sampler == "tcksample":
+                weights = self._sample_track_weights_tcksample(
+                    mrtrix_dir / f"tracks_1M_BNST_{suffix}.tck", composite_file, connectome_dir
+                )
+            else:
+                weights = self._sample_track_weights(streamlines, composite, composite_affine_inv)
+            weights_file = connectome_dir / f"track_weights_1M_BNST_{suffix}.npy"
+            np.save(str(weights_file), weights)
+            
+            fingerprint = self._fingerprint_inprocess(streamlines, weights, roi_arr, roi_affine)
+            output_file = connectome_dir / "fingerprints" / f"{suffix}_BNST_fingerprint.csv"
+            np.savetxt(str(output_file), fingerprint[np.newaxis, :], delimiter=",", fmt="%.10g")
+            return weights_file, output_file
+        
+        hemisphere_results = self.map_concurrently(run_hemisphere, hemispheres, len(hemispheres))
+        weights_files, fingerprint_files = zip(*hemisphere_results)
+        
+        return composite_file, list(weights_files), list(fingerprint_files)
+    
+    def _load_mif(self, mif_file: Path, work_dir: Path) -> tuple:
+        """
+        Load an MRtrix .mif image by converting it to a temporary NIfTI file.
+        
+        Args:
+            mif_file: Input .mif image
+            work_dir: Directory for the temporary conversion
+            
+        Returns:
+            Tuple of (image array, voxel-to-world affine)
+        """
+        with tempfile.TemporaryDirectory(dir=work_dir) as tmp_dir:
+            nifti_file = Path(tmp_dir) / f"{mif_file.stem}.nii"
+            self.run_command(
+                ["mrconvert", str(mif_file), str(nifti_file), "-force"],
+                cwd=work_dir
+            )
+            # Read fully before the temporary file is removed
+            img = nib.load(str(nifti_file), mmap=False)
+            return np.asanyarray(img.dataobj), img.affine
+    
+    @staticmethod
+    def _streamline_offsets(streamlines) -> tuple:
+        """Return (points, offsets, lengths) for a nibabel ArraySequence."""
+        lengths = np.asarray(streamlines._lengths)
+        points = streamlines.get_data()
+        offsets = np.zeros_like(lengths)
+        np.cumsum(lengths[:-1], out=offsets[1:])
+        return points, offsets, lengths
+    
+    @classmethod
+    def _sample_track_weights(cls, streamlines, composite_arr, composite_affine_inv):
+        """
+        Mean composite value along each streamline (``tcksample -stat_tck mean``).
+        
+        Args:
+            streamlines: nibabel ArraySequence of streamline points in world (mm) space
+            composite_arr: Composite microstructure volume
+            composite_affine_inv: World-to-voxel affine for ``composite_arr``
+            
+        Returns:
+            float32 array with one weight per streamline
+        """
+        points, offsets, lengths = cls._streamline_offsets(streamlines)
+        
+        if _sample_tracks_numba is not None:
+            # Compiled kernel: streamlines in parallel, no per-point temporaries
+            weights = np.empty(len(lengths), dtype=np.float32)
+            vol = np.ascontiguousarray(composite_arr, dtype=np.float32)
+            affine_inv = np.ascontiguousarray(composite_affine_inv, dtype=np.float64)
+            # The kernel already uses every core, so the hemispheres take turns
+            with _NUMBA_LOCK:
+                _sample_tracks_numba(vol, points, affine_inv, offsets, lengths, weights)
+            return weights
+        
+        # Empty streamlines keep a zero weight; reduceat would otherwise
+        # return the next streamline's first sample for them
+        weights = np.zeros(len(lengths), dtype=np.float32)
+        nonempty = lengths > 0
+        if not nonempty.any():
+            return weights
+        
+        # Trilinear samples for every point in one vectorized call
+        vox = nib.affines.apply_affine(composite_affine_inv, points)
+        samples = ndimage.map_coordinates(composite_arr, vox.T, order=1, mode="constant", cval=0.0)
+        weights[nonempty] = np.add.reduceat(samples, offsets[nonempty]) / lengths[nonempty]
+        return weights
+    
+    def _sample_track_weights_tcksample(self, track_file: Path, composite_file: Path, cwd: Path):
+        """
+        Mean composite value along each streamline using MRtrix3 tcksample.
+        
+        tcksample writes to /dev/stdout, which is parsed as it streams from
+        the pipe, so neither a weights text file nor the full text output is
+        held at once.
+        
+        Args:
+            track_file: Tractogram (.tck)
+            composite_file: Composite microstructure image
+            cwd: Working directory for the command
+            
+        Returns:
+            float32 array with one weight per streamline
+            
+        Raises:
+            subprocess.CalledProcessError: If tcksample exits with an error
+        """
+        cmd = [
+            "tcksample",
+            str(track_file),
+            str(composite_file),
+            "/dev/stdout",
+            "-stat_tck", "mean",
+            "-quiet"
+        ]
+        env_name = get_tool_environment(cmd)
+        activated_env = get_activated_environment(env_name)
+        thread_env = self._thread_env(None)
+        if activated_env is not None:
+            popen_cmd = cmd
+            popen_env = {**activated_env, **thread_env} if thread_env else activated_env
+        else:
+            popen_cmd = get_conda_command(cmd, env_name)
+            popen_env = {**os.environ, **thread_env} if thread_env else None
+        
+        self.logger.debug(f"Streaming in conda env '{env_name}': {' '.join(popen_cmd)}")
+        
+        # stderr goes to a file so a chatty tool cannot block on a full pipe
+        with tempfile.TemporaryFile(mode="w+") as stderr_file:
+            with subprocess.Popen(
+                popen_cmd, cwd=cwd, env=popen_env, stdout=subprocess.PIPE, stderr=stderr_file, text=True
+            ) as proc:
+                try:
+                    weights = np.loadtxt(proc.stdout, dtype=np.float32, comments="#", ndmin=1)
+                except Exception:
+                    proc.kill()
+                    raise
+                returncode = proc.wait()
+            
+            if returncode != 0:
+                stderr_file.seek(0)
+                stderr = stderr_file.read()
+                self.logger.error(f"Command failed in conda env '{env_name}': {' '.join(popen_cmd)}")
+                self.logger.error(f"Return code: {returncode}")
+                if stderr:
+                    self.logger.error(f"Stderr: {stderr}")
+                raise subprocess.CalledProcessError(returncode, popen_cmd, stderr=stderr)
+        
+        return weights
+    
+    @classmethod
+    def _fingerprint_inprocess(cls, streamlines, weights, roi_arr, roi_affine):
+        """
+        Compute a weighted connectivity fingerprint from per-streamline weights.
+        
+        Mirrors ``tck2connectome -vector -scale_invnodevol -scale_file <weights>
+        -stat_edge mean``: each streamline contributes its weight to the node at
+        its terminating endpoint (nearest labelled voxel within the radial search
+        distance if the endpoint is unlabelled).
+        
+        Args:
+            streamlines: nibabel ArraySequence of streamline points in world (mm) space
+            weights: Per-streamline weights from ``_sample_track_weights``
+            roi_arr: Integer parcellation volume (0 = background)
+            roi_affine: Voxel-to-world affine for ``roi_arr``
+            
+        Returns:
+            Fingerprint vector with one value per node (labels 1..N)
+        """
+        points, offsets, lengths = cls._streamline_offsets(streamlines)
+        
+        # Assign each streamline's terminating endpoint to a parcel; integer
+        # parcellations are used as-is to avoid a float copy of the volume
+        if np.issubdtype(roi_arr.dtype, np.integer):
+            roi_labels = roi_arr.astype(np.intp, copy=False)
+        else:
+            roi_labels = np.rint(roi_arr).astype(np.intp)
+        endpoints = points[offsets + lengths - 1]
+        end_vox = np.rint(nib.affines.apply_affine(np.linalg.inv(roi_affine), endpoints)).astype(np.intp)
+        in_bounds = np.all((end_vox >= 0) & (end_vox < roi_labels.shape), axis=1)
+        labels = np.zeros(len(endpoints), dtype=np.intp)
+        labels[in_bounds] = roi_labels[tuple(end_vox[in_bounds].T)]
+        
+        unassigned = np.flatnonzero(labels == 0)
+        labelled_vox = np.argwhere(roi_labels > 0)
+        if unassigned.size and labelled_vox.size:
+            tree = cKDTree(nib.affines.apply_affine(roi_affine, labelled_vox))
+            dist, idx = tree.query(endpoints[unassigned], distance_upper_bound=ASSIGNMENT_SEARCH_RADIUS)
+            hit = np.isfinite(dist)
+            labels[unassigned[hit]] = roi_labels[tuple(labelled_vox[idx[hit]].T)]
+        
+        # Mean weight per node, scaled by inverse node volume (in voxels).
+        # A fingerprint is a single row, so O(K) bincounts replace any K x K matrix.
+        volumes = np.bincount(roi_labels.ravel())
+        n_bins = len(volumes)
+        sums = np.bincount(labels, weights=weights, minlength=n_bins)
+        counts = np.bincount(labels, minlength=n_bins)
+        
+        fingerprint = np.zeros(n_bins)
+        valid = counts > 0
+        np.divide(sums, counts * volumes, out=fingerprint, where=valid)
+        return fingerprint[1:]
+    
     def _generate_connectivity_fingerprints(
         self, 
         subject_id: str,
@@ -244,6 +726,7 @@ class ConnectivityMatrix(MRtrix3Processor):
             List of generated fingerprint files
         """
         fingerprint_files = []
+        cmds = []
         
         # Configuration for both hemispheres
         hemisphere_configs = [
@@ -269,23 +752,44 @@ class ConnectivityMatrix(MRtrix3Processor):
             self.logger.info(f"Generating connectivity fingerprint for {config['name']} BNST")
             
             # Use exact command structure from tested script
-            cmd = [
+            cmds.append([
                 "tck2connectome",
-                str(config["track_file"].resolve()),
-                str(config["roi_file"].resolve()),
-                str(config["output_file"].resolve()),
+                str(config["track_file"]),
+                str(config["roi_file"]),
+                str(config["output_file"]),
                 "-scale_invnodevol",
-                "-scale_file", str(config["weights_file"].resolve()),
+                "-scale_file", str(config["weights_file"]),
                 "-stat_edge", "mean",
                 "-vector",
                 "-force"
-            ]
-            
-            self.run_command(cmd, cwd=connectome_dir)
+            ])
             fingerprint_files.append(config["output_file"])
         
+        self._run_commands_parallel(cmds, connectome_dir)
+        
         return fingerprint_files
     
+    def _run_commands_parallel(self, cmds: List[List[str]], cwd: Path) -> None:
+        """
+        Run independent commands concurrently and wait for all of them.
+        
+        Each command gets an equal share of the thread budget.
+        
+        Args:
+            cmds: Commands to run
+            cwd: Working directory for every command
+            
+        Raises:
+            The first exception raised by any command
+        """
+        cmd_threads = max(1, self.n_threads // len(cmds))
+        
+        def run(cmd: List[str]) -> None:
+            with thread_budget(cmd_threads):
+                self.run_command(cmd, cwd=cwd)
+        
+        self.map_concurrently(run, cmds, len(cmds))
+    
     def _get_composite_formula_description(self) -> str:
         """Get description of the composite microstructure formula."""
         return "NDI*0.35 + (1-ODI)*0.25 + w_stick*0.25 + (1-w_ball)*0.15"
@@ -310,13 +814,19 @@ class ConnectivityMatrix(MRtrix3Processor):
         
         connectome_dir = analysis_dir / "dwi" / "connectome"
         
-        return [
+        outputs = [
             # Composite microstructure
             connectome_dir / "composite_microstructure.mif",
-            # Track weights  
-            connectome_dir / "track_weights_1M_BNST_L.txt",
-            connectome_dir / "track_weights_1M_BNST_R.txt",
             # Connectivity fingerprints
             connectome_dir / "fingerprints" / "L_BNST_fingerprint.csv",
             connectome_dir / "fingerprints" / "R_BNST_fingerprint.csv",
-        ] 
\ No newline at end of file
+        ]
+        
+        # Track weights: binary .npy in-process, ASCII text from tcksample
+        weights_ext = "npy" if self._use_inprocess_fingerprints() else "txt"
+        outputs[1:1] = [
+            connectome_dir / f"track_weights_1M_BNST_L.{weights_ext}",
+            connectome_dir / f"track_weights_1M_BNST_R.{weights_ext}",
+        ]
+        
+        return outputs 
\ No newline at end of file
@@ -3,19 +3,70 @@ Base processor class for all pipeline steps.
 """
 
 from abc import ABC, abstractmethod
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from contextlib import contextmanager
+from contextvars import ContextVar, copy_context
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Union
-from dataclasses import dataclass
+from typing import Any, Callable, ClassVar, Dict, Iterable, Iterator, List, Optional, Tuple, TypeVar, Union
+from dataclasses import dataclass, field
 from datetime import datetime
+import asyncio
+import atexit
+import functools
 import logging
+import os
 import subprocess
 import shlex
+import shutil
+import sys
+import threading
+import time
 
 from ..config.settings import SubtractConfig
-from ..utils.conda_utils import run_tool_command, run_in_conda_env
+from ..utils.conda_utils import run_tool_command, run_tool_command_async, run_in_conda_env
 
 
-@dataclass
+# Slotted instances (Python 3.10+) drop the per-result __dict__
+_RESULT_DATACLASS_OPTIONS = {"slots": True} if sys.version_info >= (3, 10) else {}
+
+# Directory listings are only reused once the directory's mtime is this old,
+# so filesystems with coarse timestamps cannot hide a change made in the
+# same tick as the listing
+_LISTING_SETTLE_NS = 2_000_000_000
+
+_T = TypeVar("_T")
+_R = TypeVar("_R")
+
+# Threads the current step may use when several steps or subjects share the
+# machine (see thread_budget); None means the configured n_threads
+_THREAD_BUDGET: ContextVar[Optional[int]] = ContextVar("subtract_thread_budget", default=None)
+
+# Thread-count variables honoured by OpenMP (FSL), MRtrix3 and ANTs (ITK)
+_THREAD_ENV_VARS = ("OMP_NUM_THREADS", "MRTRIX_NTHREADS", "ITK_GLOBAL_DEFAULT_NUMBER_OF_THREADS")
+
+
+@contextmanager
+def thread_budget(n_threads: int) -> Iterator[None]:
+    """
+    Limit the threads processors use within this context.
+    
+    Args:
+        n_threads: Threads available (at least 1 is used)
+    """
+    token = _THREAD_BUDGET.set(max(1, n_threads))
+    try:
+        yield
+    finally:
+        _THREAD_BUDGET.reset(token)
+
+
+def current_thread_budget(config: SubtractConfig) -> int:
+    """Get the threads available here: the active thread_budget, else config n_threads."""
+    budget = _THREAD_BUDGET.get()
+    return budget if budget is not None else max(1, config.processing.n_threads)
+
+
+@dataclass(frozen=True, **_RESULT_DATACLASS_OPTIONS)
 class ProcessingResult:
     """Result of a processing step."""
     
@@ -24,16 +75,27 @@ class ProcessingResult:
     metrics: Dict[str, Any]
     execution_time: float
     error_message: Optional[str] = None
-    warnings: List[str] = None
-    
-    def __post_init__(self):
-        if self.warnings is None:
-            self.warnings = []
+    warnings: List[str] = field(default_factory=list)
 
 
 class BaseProcessor(ABC):
     """Abstract base class for all processing steps."""
     
+    # Tool lookups shared by all processors: (env_name, tool) -> path or None;
+    # env_name "" is this process's own PATH
+    _tool_cache: ClassVar[Dict[Tuple[str, str], Optional[str]]] = {}
+    
+    # Worker threads shared by all processors, created on first use
+    _executor: ClassVar[Optional[ThreadPoolExecutor]] = None
+    _executor_lock: ClassVar[threading.Lock] = threading.Lock()
+    
+    # Default logger named after the concrete class, resolved once per class
+    _class_logger: ClassVar[logging.Logger] = logging.getLogger("BaseProcessor")
+    
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._class_logger = logging.getLogger(cls.__name__)
+    
     def __init__(self, config: SubtractConfig, logger: Optional[logging.Logger] = None):
         """
         Initialize the processor.
@@ -43,8 +105,90 @@ class BaseProcessor(ABC):
             logger: Logger instance
         """
         self.config = config
-        self.logger = logger or logging.getLogger(self.__class__.__name__)
+        self.logger = logger or self._class_logger
+        
+        # Directory listings: path -> (directory mtime, entry names)
+        self._listing_cache: Dict[str, Tuple[int, Tuple[str, ...]]] = {}
+    
+    @property
+    def n_threads(self) -> int:
+        """Threads this processor may use for the step being run."""
+        return current_thread_budget(self.config)
+    
+    def _thread_env(self, env: Optional[Dict[str, str]]) -> Optional[Dict[str, str]]:
+        """Add the thread-count variables for an active thread budget to a command environment."""
+        budget = _THREAD_BUDGET.get()
+        if budget is None:
+            return env
+        return {**{name: str(budget) for name in _THREAD_ENV_VARS}, **(env or {})}
+    
+    @classmethod
+    def _get_executor(cls) -> ThreadPoolExecutor:
+        """
+        Get the thread pool shared by every processor in this process.
+        
+        Processors use it for their concurrent file-level work (copies,
+        per-file tool runs), so those threads are reused across steps and
+        subjects instead of a pool being created and torn down per call.
+        
+        Returns:
+            Shared ThreadPoolExecutor
+        """
+        if BaseProcessor._executor is None:
+            with BaseProcessor._executor_lock:
+                if BaseProcessor._executor is None:
+                    executor = ThreadPoolExecutor(thread_name_prefix="subtract-worker")
+                    atexit.register(executor.shutdown, wait=True)
+                    BaseProcessor._executor = executor
+        return BaseProcessor._executor
+    
+    def map_concurrently(
+        self,
+        fn: Callable[[_T], _R],
+        items: Iterable[_T],
+        max_concurrent: int
+    ) -> List[_R]:
+        """
+        Apply a function to items on the shared pool, in input order.
+        
+        At most max_concurrent calls are in flight at once, so callers keep
+        their own limits (e.g. a thread budget) while sharing the pool's
+        threads with other processors.
+        
+        Args:
+            fn: Function to apply
+            items: Items to apply it to
+            max_concurrent: Maximum number of concurrent calls
+            
+        Returns:
+            Results of fn for each item, in input order
+        """
+        items = list(items)
+        if max_concurrent <= 1 or len(items) <= 1:
+            return [fn(item) for item in items]
+        
+        executor = self._get_executor()
+        results: List[Any] = [None] * len(items)
+        queued = iter(enumerate(items))
+        pending = {}
+        
+        def submit_next() -> None:
+            entry = next(queued, None)
+            if entry is not None:
+                # Run in a copy of the caller's context so its thread budget applies
+                pending[executor.submit(copy_context().run, fn, entry[1])] = entry[0]
+        
+        for _ in range(max_concurrent):
+            submit_next()
+        
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[pending.pop(future)] = future.result()
+                submit_next()
         
+        return results
+    
     @abstractmethod
     def process(self, subject_id: str, **kwargs) -> ProcessingResult:
         """
@@ -59,6 +203,26 @@ class BaseProcessor(ABC):
         """
         pass
     
+    async def process_async(self, subject_id: str, session_id: Optional[str] = None) -> ProcessingResult:
+        """
+        Process a subject from a coroutine.
+        
+        The default runs ``process`` in the event loop's executor; processors
+        that drive their tools with ``run_command_async`` can override this
+        to avoid holding a thread while external commands run.
+        
+        Args:
+            subject_id: Subject identifier
+            session_id: Session identifier (BIDS only)
+            
+        Returns:
+            ProcessingResult with outputs and metrics
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None, functools.partial(self.process, subject_id, session_id)
+        )
+    
     @abstractmethod
     def validate_inputs(self, subject_id: str, **kwargs) -> bool:
         """
@@ -96,10 +260,78 @@ class BaseProcessor(ABC):
             **kwargs: Additional parameters
             
         Returns:
-            True if all expected outputs exist
+            True if all expected outputs exist (False if none are expected)
         """
         expected_outputs = self.get_expected_outputs(subject_id, **kwargs)
-        return all(output.exists() for output in expected_outputs)
+        return bool(expected_outputs) and self.outputs_exist(expected_outputs)
+    
+    def outputs_exist(self, outputs: List[Path]) -> bool:
+        """
+        Check whether a list of output files exists.
+        
+        Outputs are listed in creation order, so they are checked newest-first
+        and a missing final output short-circuits; outputs sharing a
+        directory are checked against a single listing of it. With
+        ``processing.fast_skip_check`` only the last output is checked, since
+        its presence implies the earlier ones were written.
+        
+        Args:
+            outputs: Output paths in creation order
+            
+        Returns:
+            True if the outputs exist
+        """
+        if self.config.processing.fast_skip_check and outputs:
+            return outputs[-1].exists()
+        
+        # Group by directory (newest output's directory first), so one
+        # listing answers every output in a directory instead of a stat each
+        names_by_parent: Dict[Path, List[str]] = {}
+        for output in reversed(outputs):
+            names_by_parent.setdefault(output.parent, []).append(output.name)
+        
+        for parent, names in names_by_parent.items():
+            if len(names) == 1:
+                if not (parent / names[0]).exists():
+                    return False
+                continue
+            try:
+                with os.scandir(parent) as entries:
+                    listing = {entry.name for entry in entries}
+            except (FileNotFoundError, NotADirectoryError):
+                return False
+            if not all(name in listing for name in names):
+                return False
+        return True
+    
+    def list_dir(self, directory: Path) -> Tuple[str, ...]:
+        """
+        List a directory's entry names, reusing the last listing while the
+        directory is unchanged.
+        
+        validate_inputs, get_expected_outputs and process each look for the
+        same input files; keying listings on the directory's mtime (which
+        changes whenever an entry is added, removed or renamed) turns the
+        repeated scans into a single stat.
+        
+        Args:
+            directory: Directory to list
+            
+        Returns:
+            Sorted names of the non-hidden entries
+        """
+        key = os.fspath(directory)
+        mtime_ns = os.stat(key).st_mtime_ns
+        cached = self._listing_cache.get(key)
+        if cached is not None and cached[0] == mtime_ns:
+            return cached[1]
+        
+        with os.scandir(key) as entries:
+            names = tuple(sorted(entry.name for entry in entries if not entry.name.startswith('.')))
+        
+        if time.time_ns() - mtime_ns > _LISTING_SETTLE_NS:
+            self._listing_cache[key] = (mtime_ns, names)
+        return names
     
     def should_skip(self, subject_id: str, **kwargs) -> bool:
         """
@@ -143,7 +375,7 @@ class BaseProcessor(ABC):
             return run_tool_command(
                 command=command,
                 cwd=cwd,
-                env=env,
+                env=self._thread_env(env),
                 capture_output=capture_output,
                 check=True
             )
@@ -156,11 +388,15 @@ class BaseProcessor(ABC):
             
             self.logger.debug(f"Running command: {' '.join(command_list)}")
             
+            run_env = self._thread_env(env)
+            if env is None and run_env is not None:
+                run_env = {**os.environ, **run_env}
+            
             try:
                 result = subprocess.run(
                     command_list,
                     cwd=cwd,
-                    env=env,
+                    env=run_env,
                     capture_output=capture_output,
                     text=True,
                     check=True
@@ -175,6 +411,75 @@ class BaseProcessor(ABC):
                     self.logger.error(f"Stderr: {e.stderr}")
                 raise
     
+    async def run_command_async(
+        self,
+        command: Union[str, List[str]],
+        cwd: Optional[Path] = None,
+        env: Optional[Dict[str, str]] = None,
+        capture_output: bool = True
+    ) -> subprocess.CompletedProcess:
+        """
+        Run a tool command in its conda environment without blocking the event loop.
+        
+        Args:
+            command: Command to run (string or list)
+            cwd: Working directory
+            env: Environment variables
+            capture_output: Whether to capture stdout/stderr
+            
+        Returns:
+            CompletedProcess result
+        """
+        return await run_tool_command_async(
+            command=command,
+            cwd=cwd,
+            env=self._thread_env(env),
+            capture_output=capture_output,
+            check=True
+        )
+    
+    def find_tool(self, tool: str, env_name: str = "subtract") -> Optional[str]:
+        """
+        Locate a tool in a conda environment, caching the result per process.
+        
+        Args:
+            tool: Executable name
+            env_name: Conda environment name
+            
+        Returns:
+            Path to the tool, or None if it was not found
+        """
+        key = (env_name, tool)
+        if key not in BaseProcessor._tool_cache:
+            try:
+                result = self.run_command_in_env(
+                    command=["which", tool],
+                    env_name=env_name,
+                    capture_output=True
+                )
+                BaseProcessor._tool_cache[key] = result.stdout.strip()
+            except subprocess.CalledProcessError:
+                BaseProcessor._tool_cache[key] = None
+        return BaseProcessor._tool_cache[key]
+    
+    def find_tool_on_path(self, tool: str) -> Optional[str]:
+        """
+        Locate a tool on this process's PATH, caching the result per process.
+        
+        For tools that are run with plain subprocess calls rather than in a
+        conda environment.
+        
+        Args:
+            tool: Executable name
+            
+        Returns:
+            Path to the tool, or None if it was not found
+        """
+        key = ("", tool)
+        if key not in BaseProcessor._tool_cache:
+            BaseProcessor._tool_cache[key] = shutil.which(tool)
+        return BaseProcessor._tool_cache[key]
+    
     def run_command_in_env(
         self,
         command: Union[str, List[str]],
@@ -200,7 +505,7 @@ class BaseProcessor(ABC):
             command=command,
             env_name=env_name,
             cwd=cwd,
-            env=env,
+            env=self._thread_env(env),
             capture_output=capture_output,
             check=True
         )
@@ -265,15 +570,11 @@ class FSLProcessor(BaseProcessor):
     
     def _check_fsl_installation(self) -> None:
         """Check if FSL is properly installed in conda environment."""
-        try:
-            # Check fsl in the appropriate conda environment  
-            result = self.run_command_in_env(
-                command=["which", "fsl"],
-                env_name="subtract", 
-                capture_output=True
-            )
-            self.logger.debug(f"FSL found at: {result.stdout.strip()}")
-        except subprocess.CalledProcessError:
+        # Check fsl in the appropriate conda environment
+        fsl_path = self.find_tool("fsl", env_name="subtract")
+        if fsl_path:
+            self.logger.debug(f"FSL found at: {fsl_path}")
+        else:
             self.logger.warning("FSL not found in 'subtract' environment, but will try to use conda run for commands")
 
 
@@ -286,15 +587,11 @@ class MRtrix3Processor(BaseProcessor):
     
     def _check_mrtrix3_installation(self) -> None:
         """Check if MRtrix3 is properly installed in conda environment."""
-        try:
-            # Check mrconvert in the appropriate conda environment
-            result = self.run_command_in_env(
-                command=["which", "mrconvert"],
-                env_name="subtract",
-                capture_output=True
-            )
-            self.logger.debug(f"MRtrix3 found at: {result.stdout.strip()}")
-        except subprocess.CalledProcessError:
+        # Check mrconvert in the appropriate conda environment
+        mrconvert_path = self.find_tool("mrconvert", env_name="subtract")
+        if mrconvert_path:
+            self.logger.debug(f"MRtrix3 found at: {mrconvert_path}")
+        else:
             self.logger.warning("MRtrix3 not found in 'subtract' environment, but will try to use conda run for commands")
 
 
@@ -307,13 +604,9 @@ class ANTsProcessor(BaseProcessor):
     
     def _check_ants_installation(self) -> None:
         """Check if ANTs is properly installed in conda environment."""
-        try:
-            # Check antsRegistration in the appropriate conda environment
-            result = self.run_command_in_env(
-                command=["which", "antsRegistration"],
-                env_name="ants",
-                capture_output=True
-            )
-            self.logger.debug(f"ANTs found at: {result.stdout.strip()}")
-        except subprocess.CalledProcessError:
+        # Check antsRegistration in the appropriate conda environment
+        ants_path = self.find_tool("antsRegistration", env_name="ants")
+        if ants_path:
+            self.logger.debug(f"ANTs found at: {ants_path}")
+        else:
             self.logger.warning("ANTs not found in 'ants' environment, but will try to use conda run for commands") 
\ No newline at end of file
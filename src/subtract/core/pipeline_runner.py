@@ -4,13 +4,17 @@ Pipeline runner for SubTract pipeline.
 This module orchestrates the execution of all processing steps for subjects.
 """
 
+import asyncio
+import sqlite3
 import time
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import ClassVar, Dict, FrozenSet, Iterator, List, Optional, Any, Tuple, TYPE_CHECKING
 import logging
 
 from ..config.settings import SubtractConfig
-from ..core.base_processor import ProcessingResult
+from ..core.base_processor import ProcessingResult, current_thread_budget, thread_budget
 from ..preprocessing.data_organizer import DataOrganizer
 from ..preprocessing.denoiser import DWIDenoiser
 from ..preprocessing.gibbs_remover import GibbsRemover
@@ -21,6 +25,9 @@ from ..preprocessing.mrtrix_preprocessor import MRtrixPreprocessor
 from ..tractography.track_generator import TrackGenerator
 from ..tractography.track_filter import TrackFilter
 from ..registration.roi_registration import ROIRegistration
+from ..utils.state_db import ProcessingStateDB
+if TYPE_CHECKING:
+    from .subject_manager import SubjectManager
 try:
     from ..connectome.connectivity_matrix import ConnectivityMatrix
 except ImportError:
@@ -31,6 +38,63 @@ except ImportError:
         ConnectivityMatrix = None
 
 
+class PipelineSummaryAccumulator:
+    """
+    Online accumulator for pipeline results.
+    
+    Subject results are folded in one at a time as they complete, so a
+    summary can be produced without keeping every ProcessingResult alive.
+    """
+    
+    def __init__(self):
+        self.total_subjects = 0
+        self.successful_subjects = 0
+        self.failed_subjects = 0
+        self.total_execution_time = 0.0
+        self.step_counts: Counter = Counter()
+        self.step_successes: Counter = Counter()
+    
+    def add(self, subject_results: Dict[str, ProcessingResult]) -> None:
+        """Fold one subject's (or session's) step results into the totals."""
+        subject_success = True
+        
+        for step_name, result in subject_results.items():
+            self.step_counts[step_name] += 1
+            if result.success:
+                self.step_successes[step_name] += 1
+            else:
+                subject_success = False
+            
+            self.total_execution_time += result.execution_time
+        
+        self.total_subjects += 1
+        if subject_success:
+            self.successful_subjects += 1
+        else:
+            self.failed_subjects += 1
+    
+    def get_summary(self) -> Dict[str, Any]:
+        """Build the summary dictionary from the running totals."""
+        step_success_rates = {
+            step_name: self.step_successes[step_name] / count
+            for step_name, count in self.step_counts.items()
+            if count > 0
+        }
+        
+        average_execution_time = 0.0
+        if self.total_subjects > 0:
+            average_execution_time = self.total_execution_time / self.total_subjects
+        
+        return {
+            "total_subjects": self.total_subjects,
+            "successful_subjects": self.successful_subjects,
+            "failed_subjects": self.failed_subjects,
+            "step_success_rates": step_success_rates,
+            "total_execution_time": self.total_execution_time,
+            "average_execution_time": average_execution_time
+        }
+
+
 class PipelineRunner:
     """
     Main pipeline runner that orchestrates all processing steps.
@@ -39,6 +103,28 @@ class PipelineRunner:
     handling step dependencies, error recovery, and progress tracking.
     """
     
+    # Earlier steps whose outputs each step reads
+    STEP_DEPENDENCIES: ClassVar[Dict[str, FrozenSet[str]]] = {
+        "copy_data": frozenset(),
+        "denoise": frozenset({"copy_data"}),
+        "degibbs": frozenset({"denoise"}),
+        "topup": frozenset({"degibbs"}),
+        "eddy": frozenset({"topup"}),
+        "mdt": frozenset({"eddy"}),
+        "mrtrix_prep": frozenset({"mdt"}),
+        "tractography": frozenset({"mrtrix_prep"}),
+        "sift2": frozenset({"tractography", "mdt"}),
+        "roi_registration": frozenset({"mrtrix_prep"}),
+        "connectome": frozenset({"tractography", "roi_registration", "mdt"}),
+    }
+    
+    # Steps whose failure stops a subject's pipeline
+    CRITICAL_STEPS: ClassVar[FrozenSet[str]] = frozenset({
+        "copy_data",  # Can't proceed without data
+        "denoise",    # Essential preprocessing
+        "eddy",       # Essential motion correction
+    })
+    
     def __init__(self, config: SubtractConfig, logger: Optional[logging.Logger] = None):
         """
         Initialize the pipeline runner.
@@ -52,43 +138,79 @@ class PipelineRunner:
         
         # Initialize processors for each step
         self.processors = self._initialize_processors()
+        
+        # Flat (step, processor, is_critical) plan walked for every subject
+        for step_name in self.config.steps_to_run:
+            if step_name not in self.processors:
+                self.logger.warning(f"Processor for step '{step_name}' not implemented yet, skipping")
+        self._ordered_steps = tuple(
+            (step_name, self.processors[step_name], step_name in self.CRITICAL_STEPS)
+            for step_name in self.config.steps_to_run
+            if step_name in self.processors
+        )
+        
+        # The step graph only depends on steps_to_run, so resolve it once
+        self._step_plan = {
+            step_name: (processor, is_critical)
+            for step_name, processor, is_critical in self._ordered_steps
+        }
+        self._step_dependencies = {
+            step_name: frozenset(self._planned_dependencies(step_name, self._step_plan.keys()))
+            for step_name in self._step_plan
+        }
+        
+        # Per-step status index used by `subtract status`
+        self.state_db = ProcessingStateDB.for_analysis_dir(self.config.paths.analysis_dir)
+        
+        # Shared SubjectManager, built on first use (its BIDS layout scans the dataset)
+        self._subject_manager: Optional["SubjectManager"] = None
+    
+    @property
+    def subject_manager(self) -> "SubjectManager":
+        """SubjectManager shared by every multi-subject run of this runner."""
+        if self._subject_manager is None:
+            # Import here to avoid circular imports
+            from .subject_manager import SubjectManager
+            self._subject_manager = SubjectManager(self.config, self.logger, persist_validation=True)
+        return self._subject_manager
     
     def _initialize_processors(self) -> Dict[str, Any]:
         """Initialize all processing step classes."""
         processors = {}
+        steps = self.config.step_set
         
         # Initialize available processors
-        if "copy_data" in self.config.steps_to_run:
+        if "copy_data" in steps:
             processors["copy_data"] = DataOrganizer(self.config, self.logger)
         
-        if "denoise" in self.config.steps_to_run:
+        if "denoise" in steps:
             processors["denoise"] = DWIDenoiser(self.config, self.logger)
         
-        if "degibbs" in self.config.steps_to_run:
+        if "degibbs" in steps:
             processors["degibbs"] = GibbsRemover(self.config, self.logger)
         
-        if "topup" in self.config.steps_to_run:
+        if "topup" in steps:
             processors["topup"] = DistortionCorrector(self.config, self.logger)
         
-        if "eddy" in self.config.steps_to_run:
+        if "eddy" in steps:
             processors["eddy"] = EddyCorrector(self.config, self.logger)
         
-        if "mdt" in self.config.steps_to_run:
+        if "mdt" in steps:
             processors["mdt"] = MDTProcessor(self.config, self.logger)
         
-        if "mrtrix_prep" in self.config.steps_to_run:
+        if "mrtrix_prep" in steps:
             processors["mrtrix_prep"] = MRtrixPreprocessor(self.config, self.logger)
         
-        if "tractography" in self.config.steps_to_run:
+        if "tractography" in steps:
             processors["tractography"] = TrackGenerator(self.config, self.logger)
         
-        if "sift2" in self.config.steps_to_run:
+        if "sift2" in steps:
             processors["sift2"] = TrackFilter(self.config, self.logger)
         
-        if "roi_registration" in self.config.steps_to_run:
+        if "roi_registration" in steps:
             processors["roi_registration"] = ROIRegistration(self.config, self.logger)
         
-        if "connectome" in self.config.steps_to_run:
+        if "connectome" in steps:
             if ConnectivityMatrix is not None:
                 processors["connectome"] = ConnectivityMatrix(self.config, self.logger)
             else:
@@ -113,52 +235,411 @@ class PipelineRunner:
         
         results = {}
         
-        # Execute steps in order
-        for step_name in self.config.steps_to_run:
-            if step_name not in self.processors:
-                self.logger.warning(f"Processor for step '{step_name}' not implemented yet, skipping")
-                continue
-            
-            self.logger.info(f"Running step: {step_name} for subject: {subject_id}{session_str}")
-            
-            try:
-                processor = self.processors[step_name]
-                result = processor.process(subject_id, session_id)
-                results[step_name] = result
+        # Read what earlier runs recorded once per subject so re-runs skip finished work
+        previous = self._load_previous_state(subject_id, session_id)
+        
+        # Execute steps as soon as the steps they read from have finished;
+        # e.g. roi_registration runs alongside tractography
+        step_plan, waiting_on = self._schedule_steps()
+        running = {}
+        rerun = set()
+        stop = False
+        
+        def finish(step_name: str, result: ProcessingResult) -> None:
+            for deps in waiting_on.values():
+                deps.discard(step_name)
+            if not result.metrics.get("skipped"):
+                rerun.add(step_name)
+        
+        # Threads for this subject (less than n_threads when subjects run in parallel)
+        budget = current_thread_budget(self.config)
+        max_workers = max(1, min(self.config.processing.n_threads, len(step_plan)))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while waiting_on or running:
+                if not stop:
+                    ready = [step_name for step_name, deps in waiting_on.items() if not deps]
+                    step_threads = self._step_threads(budget, len(running), len(ready))
+                    for step_name in ready:
+                        del waiting_on[step_name]
+                        processor = step_plan[step_name][0]
+                        if self._may_skip(step_name, previous, rerun):
+                            future = executor.submit(
+                                self._run_step_unless_complete, step_name, processor,
+                                subject_id, session_id, previous.get(step_name), step_threads
+                            )
+                        else:
+                            future = executor.submit(
+                                self._run_step, step_name, processor, subject_id, session_id, step_threads
+                            )
+                        running[future] = step_name
+                
+                if not running:
+                    break
                 
-                if not result.success:
-                    self.logger.error(f"Step {step_name} failed for subject {subject_id}{session_str}: {result.error_message}")
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    step_name = running.pop(future)
+                    result = future.result()
+                    results[step_name] = result
+                    finish(step_name, result)
+                    
                     # Decide whether to continue or stop based on step criticality
-                    if self._is_critical_step(step_name):
+                    if not result.success and step_plan[step_name][1]:
                         self.logger.error(f"Critical step {step_name} failed, stopping pipeline for {subject_id}{session_str}")
-                        break
-                
-            except Exception as e:
-                error_msg = f"Unexpected error in step {step_name} for subject {subject_id}{session_str}: {str(e)}"
-                self.logger.error(error_msg)
-                
-                results[step_name] = ProcessingResult(
-                    success=False,
-                    outputs=[],
-                    metrics={},
-                    execution_time=0.0,
-                    error_message=error_msg
-                )
+                        stop = True
+        
+        # Report results in pipeline order
+        results = {step_name: results[step_name] for step_name in step_plan if step_name in results}
+        
+        total_time = time.time() - start_time
+        self.logger.info(f"Completed pipeline for subject {subject_id}{session_str} in {total_time:.2f} seconds")
+        
+        return results
+    
+    async def run_subject_async(self, subject_id: str, session_id: Optional[str] = None) -> Dict[str, ProcessingResult]:
+        """
+        Run the complete pipeline for a single subject from a coroutine.
+        
+        Steps are scheduled as in run_subject, but each is awaited through its
+        processor's process_async, so many subjects can share one event loop.
+        
+        Args:
+            subject_id: Subject identifier
+            session_id: Session identifier (BIDS only)
+            
+        Returns:
+            Dictionary mapping step names to ProcessingResult objects
+        """
+        session_str = f" session {session_id}" if session_id else ""
+        self.logger.info(f"Starting pipeline for subject: {subject_id}{session_str}")
+        start_time = time.time()
+        
+        results = {}
+        
+        loop = asyncio.get_running_loop()
+        previous = await loop.run_in_executor(None, self._load_previous_state, subject_id, session_id)
+        
+        step_plan, waiting_on = self._schedule_steps()
+        running = {}
+        rerun = set()
+        stop = False
+        
+        def finish(step_name: str, result: ProcessingResult) -> None:
+            for deps in waiting_on.values():
+                deps.discard(step_name)
+            if not result.metrics.get("skipped"):
+                rerun.add(step_name)
+        
+        budget = current_thread_budget(self.config)
+        while waiting_on or running:
+            if not stop:
+                ready = [step_name for step_name, deps in waiting_on.items() if not deps]
+                step_threads = self._step_threads(budget, len(running), len(ready))
+                for step_name in ready:
+                    del waiting_on[step_name]
+                    processor = step_plan[step_name][0]
+                    may_skip = self._may_skip(step_name, previous, rerun)
+                    task = asyncio.ensure_future(self._run_step_async(
+                        step_name, processor, subject_id, session_id,
+                        may_skip, previous.get(step_name) if may_skip else None, step_threads
+                    ))
+                    running[task] = step_name
+            
+            if not running:
+                break
+            
+            done, _ = await asyncio.wait(set(running), return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                step_name = running.pop(task)
+                result = task.result()
+                results[step_name] = result
+                finish(step_name, result)
                 
-                if self._is_critical_step(step_name):
+                if not result.success and step_plan[step_name][1]:
                     self.logger.error(f"Critical step {step_name} failed, stopping pipeline for {subject_id}{session_str}")
-                    break
+                    stop = True
+        
+        results = {step_name: results[step_name] for step_name in step_plan if step_name in results}
         
         total_time = time.time() - start_time
         self.logger.info(f"Completed pipeline for subject {subject_id}{session_str} in {total_time:.2f} seconds")
         
         return results
     
+    def _schedule_steps(self) -> Tuple[Dict[str, Tuple[Any, bool]], Dict[str, set]]:
+        """
+        Build the per-subject step schedule.
+        
+        Returns:
+            Tuple of (step name -> (processor, is_critical) in pipeline order,
+            step name -> planned steps it still waits on); the second mapping
+            is a fresh copy the caller may mutate
+        """
+        waiting_on = {step_name: set(deps) for step_name, deps in self._step_dependencies.items()}
+        return self._step_plan, waiting_on
+    
+    def _load_previous_state(
+        self,
+        subject_id: str,
+        session_id: Optional[str]
+    ) -> Optional[Dict[str, Dict[str, Any]]]:
+        """
+        Load the step results earlier runs recorded for a subject.
+        
+        Args:
+            subject_id: Subject identifier
+            session_id: Session identifier (BIDS only)
+            
+        Returns:
+            Persisted step results, or None if no step may be skipped
+            (force_overwrite)
+        """
+        if self.config.processing.force_overwrite:
+            return None
+        
+        try:
+            return self.state_db.get_subject_results(subject_id, session_id)
+        except sqlite3.Error as e:
+            self.logger.warning(f"Could not read persisted results for {subject_id}: {e}")
+            return {}
+    
+    @staticmethod
+    def _step_threads(budget: int, n_running: int, n_starting: int) -> int:
+        """
+        Split a subject's thread budget between the steps about to run.
+        
+        Steps that become ready together (e.g. roi_registration and
+        tractography) share the budget with each other and with the steps
+        still running, instead of each using every core.
+        
+        Args:
+            budget: Threads available to the subject
+            n_running: Steps already running
+            n_starting: Steps being started now
+            
+        Returns:
+            Threads for each starting step, at least 1
+        """
+        return max(1, budget // max(1, n_running + n_starting))
+    
+    def _may_skip(
+        self,
+        step_name: str,
+        previous: Optional[Dict[str, Dict[str, Any]]],
+        rerun: set
+    ) -> bool:
+        """
+        Check whether a step is allowed to be skipped if already complete.
+        
+        A step's outputs are stale once a step it reads from has re-run in
+        this invocation, so it must run again too.
+        
+        Args:
+            step_name: Name of the processing step
+            previous: Persisted step results (None when overwriting)
+            rerun: Steps that actually ran in this invocation
+            
+        Returns:
+            True if the step may be skipped
+        """
+        return previous is not None and not (self._step_dependencies[step_name] & rerun)
+    
+    def _completed_result(
+        self,
+        step_name: str,
+        processor: Any,
+        subject_id: str,
+        session_id: Optional[str],
+        previous: Optional[Dict[str, Any]]
+    ) -> Optional[ProcessingResult]:
+        """
+        Get the result for a step an earlier run already completed.
+        
+        A step counts as complete only when the state index has a "done"
+        entry for it and the processor's own output check confirms its
+        outputs are still there; directory names alone do not, since a run
+        killed part way leaves those behind.
+        
+        Args:
+            step_name: Name of the processing step
+            processor: Processor instance for the step
+            subject_id: Subject identifier
+            session_id: Session identifier (BIDS only)
+            previous: Result persisted for the step, if any
+            
+        Returns:
+            Skipped result, or None if the step has to run
+        """
+        if previous is None or not previous["success"]:
+            return None
+        
+        # The outputs may have been removed since; a processor that cannot
+        # confirm its outputs (should_skip() False) always re-runs
+        try:
+            outputs_exist = processor.should_skip(subject_id, session_id=session_id)
+        except Exception as e:
+            self.logger.debug(f"Could not check outputs of {step_name} for {subject_id}: {e}")
+            return None
+        return self._skipped_result(previous) if outputs_exist else None
+    
+    def _run_step_unless_complete(
+        self,
+        step_name: str,
+        processor: Any,
+        subject_id: str,
+        session_id: Optional[str],
+        previous: Optional[Dict[str, Any]],
+        n_threads: Optional[int] = None
+    ) -> ProcessingResult:
+        """Run a step unless an earlier run already completed it (see _completed_result)."""
+        result = self._completed_result(step_name, processor, subject_id, session_id, previous)
+        if result is not None:
+            session_str = f" session {session_id}" if session_id else ""
+            self.logger.info(f"Step {step_name} already complete for subject {subject_id}{session_str}, skipping")
+            return result
+        return self._run_step(step_name, processor, subject_id, session_id, n_threads)
+    
+    @staticmethod
+    def _skipped_result(previous: Optional[Dict[str, Any]] = None) -> ProcessingResult:
+        """
+        Result reported for a step whose outputs are already complete.
+        
+        Args:
+            previous: Result persisted by the run that completed the step, if any
+            
+        Returns:
+            ProcessingResult carrying the earlier outputs
+        """
+        outputs = [Path(output) for output in previous["outputs"]] if previous else []
+        return ProcessingResult(
+            success=True,
+            outputs=outputs,
+            metrics={"skipped": True},
+            execution_time=0.0
+        )
+    
+    def _planned_dependencies(self, step_name: str, planned: Any) -> set:
+        """
+        Get the planned steps a step must wait for.
+        
+        Dependencies that are not being run are looked through, so a step still
+        waits on the nearest planned step upstream of it.
+        
+        Args:
+            step_name: Name of the processing step
+            planned: Collection of step names being run
+            
+        Returns:
+            Set of planned step names the step depends on
+        """
+        deps = set()
+        pending = list(self.STEP_DEPENDENCIES.get(step_name, ()))
+        seen = set()
+        while pending:
+            dep = pending.pop()
+            if dep in seen:
+                continue
+            seen.add(dep)
+            if dep in planned:
+                deps.add(dep)
+            else:
+                pending.extend(self.STEP_DEPENDENCIES.get(dep, ()))
+        return deps
+    
+    def _run_step(
+        self,
+        step_name: str,
+        processor: Any,
+        subject_id: str,
+        session_id: Optional[str],
+        n_threads: Optional[int] = None
+    ) -> ProcessingResult:
+        """
+        Run one step for a subject and record its outcome.
+        
+        Args:
+            step_name: Name of the processing step
+            processor: Processor instance for the step
+            subject_id: Subject identifier
+            session_id: Session identifier (BIDS only)
+            n_threads: Threads the step may use (default: config n_threads)
+            
+        Returns:
+            ProcessingResult for the step (failures are returned, not raised)
+        """
+        session_str = f" session {session_id}" if session_id else ""
+        self.logger.info(f"Running step: {step_name} for subject: {subject_id}{session_str}")
+        
+        try:
+            with thread_budget(n_threads or current_thread_budget(self.config)):
+                result = processor.process(subject_id, session_id)
+            if not result.success:
+                self.logger.error(f"Step {step_name} failed for subject {subject_id}{session_str}: {result.error_message}")
+        except Exception as e:
+            error_msg = f"Unexpected error in step {step_name} for subject {subject_id}{session_str}: {str(e)}"
+            self.logger.error(error_msg)
+            
+            result = ProcessingResult(
+                success=False,
+                outputs=[],
+                metrics={},
+                execution_time=0.0,
+                error_message=error_msg
+            )
+        
+        self._record_step_state(subject_id, session_id, step_name, result)
+        return result
+    
+    async def _run_step_async(
+        self,
+        step_name: str,
+        processor: Any,
+        subject_id: str,
+        session_id: Optional[str],
+        may_skip: bool = False,
+        previous: Optional[Dict[str, Any]] = None,
+        n_threads: Optional[int] = None
+    ) -> ProcessingResult:
+        """Awaitable counterpart of _run_step(_unless_complete) using the processor's process_async."""
+        session_str = f" session {session_id}" if session_id else ""
+        if may_skip:
+            # The output check touches the filesystem; keep it off the event loop
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(
+                None, self._completed_result, step_name, processor, subject_id, session_id, previous
+            )
+            if result is not None:
+                self.logger.info(f"Step {step_name} already complete for subject {subject_id}{session_str}, skipping")
+                return result
+        
+        self.logger.info(f"Running step: {step_name} for subject: {subject_id}{session_str}")
+        
+        try:
+            with thread_budget(n_threads or current_thread_budget(self.config)):
+                result = await processor.process_async(subject_id, session_id)
+            if not result.success:
+                self.logger.error(f"Step {step_name} failed for subject {subject_id}{session_str}: {result.error_message}")
+        except Exception as e:
+            error_msg = f"Unexpected error in step {step_name} for subject {subject_id}{session_str}: {str(e)}"
+            self.logger.error(error_msg)
+            
+            result = ProcessingResult(
+                success=False,
+                outputs=[],
+                metrics={},
+                execution_time=0.0,
+                error_message=error_msg
+            )
+        
+        self._record_step_state(subject_id, session_id, step_name, result)
+        return result
+    
     def run_multiple_subjects(
         self, 
         subject_ids: List[str], 
         parallel: bool = False,
-        n_jobs: Optional[int] = None
+        n_jobs: Optional[int] = None,
+        subject_manager: Optional["SubjectManager"] = None
     ) -> Dict[str, Dict[str, ProcessingResult]]:
         """
         Run the pipeline for multiple subjects.
@@ -167,23 +648,107 @@ class PipelineRunner:
             subject_ids: List of subject identifiers
             parallel: Whether to run subjects in parallel
             n_jobs: Number of parallel jobs (default: use config n_threads)
+            subject_manager: Existing SubjectManager to reuse for session lookup
             
         Returns:
             Dictionary mapping subject IDs to their results
         """
+        return dict(self.iter_multiple_subjects(subject_ids, parallel, n_jobs, subject_manager))
+    
+    def iter_multiple_subjects(
+        self, 
+        subject_ids: List[str], 
+        parallel: bool = False,
+        n_jobs: Optional[int] = None,
+        subject_manager: Optional["SubjectManager"] = None
+    ) -> Iterator[Tuple[str, Dict[str, ProcessingResult]]]:
+        """
+        Run the pipeline for multiple subjects, yielding results as they complete.
+        
+        Args:
+            subject_ids: List of subject identifiers
+            parallel: Whether to run subjects in parallel
+            n_jobs: Number of parallel jobs (default: use config n_threads)
+            subject_manager: Existing SubjectManager to reuse for session lookup
+            
+        Yields:
+            Tuples of (subject or session key, step results)
+        """
+        if subject_manager is None:
+            subject_manager = self.subject_manager
+        else:
+            # Reuse the caller's manager (and its caches) for later runs too
+            self._subject_manager = subject_manager
+        
         if parallel:
-            return self._run_subjects_parallel(subject_ids, n_jobs)
+            yield from self._iter_subjects_parallel(subject_ids, n_jobs, subject_manager)
         else:
-            return self._run_subjects_sequential(subject_ids)
+            yield from self._iter_subjects_sequential(subject_ids, subject_manager)
     
-    def _run_subjects_sequential(self, subject_ids: List[str]) -> Dict[str, Dict[str, ProcessingResult]]:
-        """Run subjects sequentially."""
-        all_results = {}
+    async def run_multiple_subjects_async(
+        self,
+        subject_ids: List[str],
+        n_jobs: Optional[int] = None,
+        subject_manager: Optional["SubjectManager"] = None
+    ) -> Dict[str, Dict[str, ProcessingResult]]:
+        """
+        Run the pipeline for multiple subjects concurrently on the running event loop.
         
-        # Import here to avoid circular imports
-        from .subject_manager import SubjectManager
-        subject_manager = SubjectManager(self.config, self.logger)
+        Args:
+            subject_ids: List of subject identifiers
+            n_jobs: Maximum number of subjects/sessions in flight (default: config n_threads)
+            subject_manager: Existing SubjectManager to reuse for session lookup
+            
+        Returns:
+            Dictionary mapping subject or session keys to their results
+        """
+        if subject_manager is None:
+            subject_manager = self.subject_manager
+        else:
+            self._subject_manager = subject_manager
         
+        # Session lookup scans the data directory; keep it off the event loop
+        loop = asyncio.get_running_loop()
+        pairs = await loop.run_in_executor(None, subject_manager.get_subject_session_pairs, subject_ids)
+        if not pairs:
+            return {}
+        
+        if n_jobs is None:
+            n_jobs = self.config.processing.n_threads
+        n_concurrent = max(1, min(n_jobs, len(pairs)))
+        limit = asyncio.Semaphore(n_concurrent)
+        # Subjects in flight share the n_threads budget
+        subject_threads = max(1, self.config.processing.n_threads // n_concurrent)
+        
+        async def process_session(subject_id: str, session_id: Optional[str]) -> Tuple[str, Dict[str, ProcessingResult]]:
+            session_key = f"{subject_id}_ses-{session_id}" if session_id else subject_id
+            async with limit:
+                try:
+                    with thread_budget(subject_threads):
+                        return session_key, await self.run_subject_async(subject_id, session_id)
+                except Exception as e:
+                    self.logger.error(f"Failed to process subject {session_key}: {str(e)}")
+                    return session_key, {}
+        
+        self.logger.info(f"Running {len(pairs)} subjects/sessions concurrently, at most {n_jobs} at a time")
+        return dict(await asyncio.gather(
+            *(process_session(subject_id, session_id) for subject_id, session_id in pairs)
+        ))
+    
+    def _run_subjects_sequential(
+        self, 
+        subject_ids: List[str], 
+        subject_manager: "SubjectManager"
+    ) -> Dict[str, Dict[str, ProcessingResult]]:
+        """Run subjects sequentially."""
+        return dict(self._iter_subjects_sequential(subject_ids, subject_manager))
+    
+    def _iter_subjects_sequential(
+        self, 
+        subject_ids: List[str], 
+        subject_manager: "SubjectManager"
+    ) -> Iterator[Tuple[str, Dict[str, ProcessingResult]]]:
+        """Run subjects sequentially, yielding each subject/session as it finishes."""
         for subject_id in subject_ids:
             try:
                 # Check if subject has sessions
@@ -194,72 +759,79 @@ class PipelineRunner:
                     for session_id in sessions:
                         session_key = f"{subject_id}_ses-{session_id}"
                         results = self.run_subject(subject_id, session_id)
-                        all_results[session_key] = results
+                        yield session_key, results
                 else:
                     # Process subject without sessions
                     results = self.run_subject(subject_id)
-                    all_results[subject_id] = results
+                    yield subject_id, results
                     
             except Exception as e:
                 self.logger.error(f"Failed to process subject {subject_id}: {str(e)}")
-                all_results[subject_id] = {}
-        
-        return all_results
+                yield subject_id, {}
     
     def _run_subjects_parallel(
         self, 
         subject_ids: List[str], 
-        n_jobs: Optional[int] = None
+        n_jobs: Optional[int],
+        subject_manager: "SubjectManager"
     ) -> Dict[str, Dict[str, ProcessingResult]]:
-        """Run subjects in parallel using joblib."""
+        """Run subjects in parallel using joblib threads, sharing this runner's processors."""
+        return dict(self._iter_subjects_parallel(subject_ids, n_jobs, subject_manager))
+    
+    def _iter_subjects_parallel(
+        self, 
+        subject_ids: List[str], 
+        n_jobs: Optional[int],
+        subject_manager: "SubjectManager"
+    ) -> Iterator[Tuple[str, Dict[str, ProcessingResult]]]:
+        """Run subjects in parallel, yielding each result as soon as it finishes."""
         try:
             from joblib import Parallel, delayed
         except ImportError:
             self.logger.warning("joblib not available, falling back to sequential processing")
-            return self._run_subjects_sequential(subject_ids)
+            yield from self._iter_subjects_sequential(subject_ids, subject_manager)
+            return
+        
+        # Resolve sessions once in the parent so workers only run the pipeline
+        pairs = subject_manager.get_subject_session_pairs(subject_ids)
+        if not pairs:
+            return
         
+        # Never start more threads than there are subjects/sessions to run
         if n_jobs is None:
-            n_jobs = min(self.config.processing.n_threads, len(subject_ids))
+            n_jobs = self.config.processing.n_threads
+        n_jobs = max(1, min(n_jobs, len(pairs)))
         
-        self.logger.info(f"Running {len(subject_ids)} subjects in parallel with {n_jobs} jobs")
+        self.logger.info(f"Running {len(pairs)} subjects/sessions in parallel with {n_jobs} jobs")
         
-        def process_subject_wrapper(subject_id):
+        # Subjects in flight share the n_threads budget
+        subject_threads = max(1, self.config.processing.n_threads // n_jobs)
+        
+        def process_session_wrapper(subject_id, session_id):
+            session_key = f"{subject_id}_ses-{session_id}" if session_id else subject_id
             try:
-                # Import here to avoid circular imports
-                from .subject_manager import SubjectManager
-                subject_manager = SubjectManager(self.config, self.logger)
-                
-                # Check if subject has sessions
-                sessions = subject_manager.get_subject_sessions(subject_id)
-                
-                if sessions:
-                    # Process each session
-                    session_results = {}
-                    for session_id in sessions:
-                        session_key = f"{subject_id}_ses-{session_id}"
-                        results = self.run_subject(subject_id, session_id)
-                        session_results[session_key] = results
-                    return subject_id, session_results
-                else:
-                    # Process subject without sessions
-                    results = self.run_subject(subject_id)
-                    return subject_id, {subject_id: results}
-                    
+                with thread_budget(subject_threads):
+                    return session_key, self.run_subject(subject_id, session_id)
             except Exception as e:
-                self.logger.error(f"Failed to process subject {subject_id}: {str(e)}")
-                return subject_id, {}
-        
-        results_list = Parallel(n_jobs=n_jobs)(
-            delayed(process_subject_wrapper)(subject_id) 
-            for subject_id in subject_ids
+                self.logger.error(f"Failed to process subject {session_key}: {str(e)}")
+                return session_key, {}
+        
+        # Steps shell out to FSL/MRtrix3/ANTs (GIL released while waiting), so
+        # threads avoid re-importing the package and pickling this runner per worker.
+        # Unordered results let a slow subject finish without holding back the rest.
+        # Subjects run for minutes, so dispatch them one at a time for load balancing
+        # and queue at most two per thread.
+        yield from Parallel(
+            n_jobs=n_jobs,
+            backend="threading",
+            batch_size=1,
+            pre_dispatch=min(2 * n_jobs, len(pairs)),
+            return_as="generator_unordered",
+            verbose=0
+        )(
+            delayed(process_session_wrapper)(subject_id, session_id) 
+            for subject_id, session_id in pairs
         )
-        
-        # Flatten the results
-        all_results = {}
-        for subject_id, subject_results in results_list:
-            all_results.update(subject_results)
-        
-        return all_results
     
     def run_step_for_subjects(
         self, 
@@ -300,24 +872,27 @@ class PipelineRunner:
         
         return results
     
-    def _is_critical_step(self, step_name: str) -> bool:
-        """
-        Determine if a step is critical (pipeline should stop if it fails).
-        
-        Args:
-            step_name: Name of the processing step
-            
-        Returns:
-            True if the step is critical
-        """
-        # Define critical steps that should stop the pipeline if they fail
-        critical_steps = {
-            "copy_data",  # Can't proceed without data
-            "denoise",    # Essential preprocessing
-            "eddy",       # Essential motion correction
-        }
-        
-        return step_name in critical_steps
+    def _record_step_state(
+        self,
+        subject_id: str,
+        session_id: Optional[str],
+        step_name: str,
+        result: ProcessingResult
+    ) -> None:
+        """Record a step outcome in the state index without failing the pipeline."""
+        status = "done" if result.success else "failed"
+        try:
+            self.state_db.record(
+                subject_id,
+                session_id,
+                step_name,
+                status,
+                execution_time=result.execution_time,
+                outputs=result.outputs,
+                error_message=result.error_message
+            )
+        except (sqlite3.Error, OSError) as e:
+            self.logger.warning(f"Could not record state for {step_name} ({subject_id}): {e}")
     
     def get_pipeline_summary(self, results: Dict[str, Dict[str, ProcessingResult]]) -> Dict[str, Any]:
         """
@@ -329,51 +904,9 @@ class PipelineRunner:
         Returns:
             Dictionary with summary statistics
         """
-        summary = {
-            "total_subjects": len(results),
-            "successful_subjects": 0,
-            "failed_subjects": 0,
-            "step_success_rates": {},
-            "total_execution_time": 0.0,
-            "average_execution_time": 0.0
-        }
-        
-        step_counts = {}
-        step_successes = {}
-        
-        for subject_id, subject_results in results.items():
-            subject_success = True
-            subject_time = 0.0
-            
-            for step_name, result in subject_results.items():
-                # Track step statistics
-                if step_name not in step_counts:
-                    step_counts[step_name] = 0
-                    step_successes[step_name] = 0
-                
-                step_counts[step_name] += 1
-                if result.success:
-                    step_successes[step_name] += 1
-                else:
-                    subject_success = False
-                
-                subject_time += result.execution_time
-            
-            if subject_success:
-                summary["successful_subjects"] += 1
-            else:
-                summary["failed_subjects"] += 1
-            
-            summary["total_execution_time"] += subject_time
-        
-        # Calculate success rates
-        for step_name in step_counts:
-            if step_counts[step_name] > 0:
-                success_rate = step_successes[step_name] / step_counts[step_name]
-                summary["step_success_rates"][step_name] = success_rate
+        accumulator = PipelineSummaryAccumulator()
         
-        # Calculate average execution time
-        if summary["total_subjects"] > 0:
-            summary["average_execution_time"] = summary["total_execution_time"] / summary["total_subjects"]
+        for subject_results in results.values():
+            accumulator.add(subject_results)
         
-        return summary 
\ No newline at end of file
+        return accumulator.get_summary()
@@ -5,13 +5,78 @@ This module handles subject discovery, validation, and tracking throughout
 the pipeline processing with BIDS support.
 """
 
-import re
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, NamedTuple, Optional, Dict, Any, Tuple
+import atexit
 import logging
+import os
+import pickle
+import re
+import sqlite3
+import threading
+import weakref
 
 from ..config.settings import SubtractConfig
-from ..utils.bids_utils import BIDSLayout
+from ..utils.bids_utils import get_bids_layout
+from ..utils.state_db import ProcessingStateDB
+
+
+# Most recent validation messages kept in a subjects summary (counts cover all)
+SUMMARY_MESSAGE_LIMIT = 256
+
+# Managers whose validation results are written back at exit (see persist_validation)
+_PERSISTED_MANAGERS: "weakref.WeakSet[SubjectManager]" = weakref.WeakSet()
+
+
+def _save_validation_caches() -> None:
+    """Flush the validation cache of every live persisting SubjectManager."""
+    for manager in list(_PERSISTED_MANAGERS):
+        manager.save_validation_cache()
+
+
+atexit.register(_save_validation_caches)
+
+
+class SubjectPaths(NamedTuple):
+    """Analysis directories for one subject/session."""
+    
+    analysis: Path
+    dwi: Path
+    anat: Path
+    mrtrix3: Path
+
+
+@lru_cache(maxsize=4096)
+def subject_paths(analysis_root: Path, subject_id: str, session_id: Optional[str] = None) -> SubjectPaths:
+    """
+    Get the analysis directories for a subject/session, built once per process.
+    
+    Args:
+        analysis_root: Pipeline analysis directory
+        subject_id: Subject identifier
+        session_id: Session identifier (BIDS only)
+        
+    Returns:
+        SubjectPaths for the subject/session
+    """
+    analysis = analysis_root / f"sub-{subject_id}"
+    if session_id:
+        analysis = analysis / f"ses-{session_id}"
+    dwi = analysis / "dwi"
+    return SubjectPaths(analysis=analysis, dwi=dwi, anat=analysis / "anat", mrtrix3=dwi / "mrtrix3")
+
+
+@lru_cache(maxsize=4096)
+def _subject_data_dir(data_root: Path, is_bids: bool, subject_id: str, session_id: Optional[str] = None) -> Path:
+    """Get a subject's input data directory (cached; see SubjectManager._get_subject_data_dir)."""
+    if not is_bids:
+        return data_root / subject_id
+    if session_id:
+        return data_root / f"sub-{subject_id}" / f"ses-{session_id}"
+    return data_root / f"sub-{subject_id}"
 
 
 class SubjectManager:
@@ -22,13 +87,24 @@ class SubjectManager:
     validating their data structure, and tracking processing status.
     """
     
-    def __init__(self, config: SubtractConfig, logger: Optional[logging.Logger] = None):
+    # Phase encoding direction in a DWI filename: a BIDS dir- entity or a
+    # standalone AP/PA token (not part of a longer uppercase word)
+    _PE_RE = re.compile(r"dir-(AP|PA)|(?<![A-Z])(AP|PA)(?![A-Z])")
+    
+    def __init__(
+        self,
+        config: SubtractConfig,
+        logger: Optional[logging.Logger] = None,
+        persist_validation: bool = False
+    ):
         """
         Initialize the subject manager.
         
         Args:
             config: Pipeline configuration
             logger: Logger instance
+            persist_validation: Write validation results back to the analysis
+                directory at exit (read-only commands leave it untouched)
         """
         self.config = config
         self.logger = logger or logging.getLogger(self.__class__.__name__)
@@ -36,7 +112,7 @@ class SubjectManager:
         # Initialize BIDS layout if data directory exists
         if self.config.paths.data_dir.exists():
             try:
-                self.bids_layout = BIDSLayout(
+                self.bids_layout = get_bids_layout(
                     self.config.paths.data_dir, 
                     self.config, 
                     self.logger
@@ -50,35 +126,128 @@ class SubjectManager:
         else:
             self.bids_layout = None
             self.is_bids = False
+        
+        # Memoized filesystem lookups (see clear_cache)
+        self._subjects_cache: Optional[Tuple[Tuple[Any, ...], List[str]]] = None
+        self._sessions_cache: Dict[str, List[str]] = {}
+        
+        # Validation results persist across runs: (subject, session) -> (fingerprint, result)
+        self._validation_cache: Optional[Dict[Tuple[str, Optional[str]], Tuple[Any, Dict[str, Any]]]] = None
+        self._validation_cache_dirty = False
+        # Guards loading and snapshotting the cache, which threads share (see validate_subjects)
+        self._validation_cache_lock = threading.Lock()
+        if persist_validation:
+            _PERSISTED_MANAGERS.add(self)
+    
+    def clear_cache(self) -> None:
+        """Forget memoized subject, session and validation lookups."""
+        self._subjects_cache = None
+        self._sessions_cache.clear()
+        self._validation_cache = {}
+        self._validation_cache_dirty = True
+    
+    def _validation_cache_path(self) -> Path:
+        """Get the on-disk location of the validation cache."""
+        return self.config.paths.analysis_dir / ".subtract_cache" / "validation.pkl"
+    
+    def _load_validation_cache(self) -> Dict[Tuple[str, Optional[str]], Tuple[Any, Dict[str, Any]]]:
+        """Load persisted validation results, starting empty if unavailable."""
+        if self._validation_cache is None:
+            with self._validation_cache_lock:
+                if self._validation_cache is None:
+                    try:
+                        with open(self._validation_cache_path(), "rb") as f:
+                            self._validation_cache = pickle.load(f)
+                    except FileNotFoundError:
+                        self._validation_cache = {}
+                    except Exception as e:
+                        self.logger.debug(f"Ignoring unreadable validation cache: {e}")
+                        self._validation_cache = {}
+        return self._validation_cache
+    
+    def save_validation_cache(self) -> None:
+        """Write validation results to disk if they changed (no-op without an analysis directory)."""
+        if not self._validation_cache_dirty or self._validation_cache is None:
+            return
+        if not self.config.paths.analysis_dir.is_dir():
+            return
+        
+        with self._validation_cache_lock:
+            snapshot = dict(self._validation_cache)
+        
+        cache_path = self._validation_cache_path()
+        try:
+            cache_path.parent.mkdir(exist_ok=True)
+            tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+            with open(tmp_path, "wb") as f:
+                pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(tmp_path, cache_path)
+            self._validation_cache_dirty = False
+        except OSError as e:
+            self.logger.warning(f"Could not save validation cache: {e}")
+    
+    def _config_fingerprint(self) -> Tuple[Any, ...]:
+        """Stamp of the configuration validation depends on (layout type and BIDS settings)."""
+        bids_settings = self.config.bids.model_dump(mode="json")
+        return (self.is_bids, tuple(sorted((key, repr(value)) for key, value in bids_settings.items())))
+    
+    def _data_fingerprint(self, subject_id: str, session_id: Optional[str] = None) -> Tuple[Any, ...]:
+        """Cheap change stamp for a subject's data: its path plus mtimes of its data, dwi and anat directories."""
+        subject_dir = self._get_subject_data_dir(subject_id, session_id)
+        stamps: List[Any] = [str(subject_dir)]
+        for directory in (subject_dir, subject_dir / "dwi", subject_dir / "anat"):
+            try:
+                stamps.append(directory.stat().st_mtime_ns)
+            except OSError:
+                stamps.append(None)
+        return tuple(stamps)
     
     def discover_subjects(self) -> List[str]:
         """
         Discover all subjects in the data directory.
         
+        Results are memoized until the data directory's mtime or the subject
+        filters change.
+        
         Returns:
             List of subject identifiers
         """
-        if not self.config.paths.data_dir.exists():
-            self.logger.error(f"Data directory does not exist: {self.config.paths.data_dir}")
+        data_dir = self.config.paths.data_dir
+        try:
+            data_dir_mtime = data_dir.stat().st_mtime_ns
+        except OSError:
+            self.logger.error(f"Data directory does not exist: {data_dir}")
             return []
         
+        cache_key = (
+            str(data_dir),
+            data_dir_mtime,
+            tuple(self.config.participant_labels or ()),
+            self.config.subject_filter,
+        )
+        if self._subjects_cache is not None and self._subjects_cache[0] == cache_key:
+            return list(self._subjects_cache[1])
+        
+        subjects = self._discover_subjects_uncached()
+        self._subjects_cache = (cache_key, subjects)
+        return list(subjects)
+    
+    def _discover_subjects_uncached(self) -> List[str]:
+        """Discover subjects by listing the data directory."""
         if self.is_bids and self.bids_layout:
             # Use BIDS layout for subject discovery
             subjects = self.bids_layout.get_subjects()
             self.logger.info(f"Discovered {len(subjects)} BIDS subjects in {self.config.paths.data_dir}")
         else:
             # Fallback to directory-based discovery
-            subject_dirs = [
-                d for d in self.config.paths.data_dir.iterdir() 
-                if d.is_dir() and not d.name.startswith('.')
-            ]
+            with os.scandir(self.config.paths.data_dir) as entries:
+                subjects = [
+                    entry.name for entry in entries
+                    if not entry.name.startswith('.') and entry.is_dir()
+                ]
             
-            subjects = [d.name for d in subject_dirs]
-            
-            # Apply subject filter if specified
-            if self.config.subject_filter:
-                pattern = re.compile(self.config.subject_filter)
-                subjects = [s for s in subjects if pattern.match(s)]
+            # Apply participant labels and subject filter if specified
+            subjects = self.config.filter_subjects(subjects)
             
             self.logger.info(f"Discovered {len(subjects)} subjects in {self.config.paths.data_dir}")
         
@@ -94,9 +263,14 @@ class SubjectManager:
         Returns:
             List of session identifiers, empty if no sessions or not BIDS
         """
-        if self.is_bids and self.bids_layout:
-            return self.bids_layout.get_sessions(subject_id)
-        return []
+        if not (self.is_bids and self.bids_layout):
+            return []
+        
+        sessions = self._sessions_cache.get(subject_id)
+        if sessions is None:
+            sessions = self.bids_layout.get_sessions(subject_id)
+            self._sessions_cache[subject_id] = sessions
+        return list(sessions)
     
     def validate_subject(self, subject_id: str, session_id: Optional[str] = None) -> Dict[str, Any]:
         """
@@ -107,12 +281,79 @@ class SubjectManager:
             session_id: Session identifier (BIDS only)
             
         Returns:
-            Dictionary with validation results
+            Dictionary with validation results (cached; treat as read-only)
         """
+        cache = self._load_validation_cache()
+        key = (subject_id, session_id)
+        fingerprint = (self._config_fingerprint(), self._data_fingerprint(subject_id, session_id))
+        
+        cached = cache.get(key)
+        if cached is not None and cached[0] == fingerprint:
+            return cached[1]
+        
         if self.is_bids and self.bids_layout:
-            return self._validate_bids_subject(subject_id, session_id)
+            validation = self._validate_bids_subject(subject_id, session_id)
+        else:
+            validation = self._validate_legacy_subject(subject_id)
+        
+        cache[key] = (fingerprint, validation)
+        self._validation_cache_dirty = True
+        return validation
+    
+    def get_subject_session_pairs(self, subject_ids: List[str]) -> List[Tuple[str, Optional[str]]]:
+        """
+        Expand subjects into (subject, session) pairs.
+        
+        Args:
+            subject_ids: Subject identifiers
+            
+        Returns:
+            List of (subject_id, session_id) tuples; session_id is None for
+            subjects without sessions
+        """
+        # Session lookups are directory listings, so list subjects concurrently
+        n_jobs = max(1, min(self.config.processing.n_threads, len(subject_ids)))
+        if n_jobs > 1:
+            with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+                subject_sessions = list(executor.map(self.get_subject_sessions, subject_ids))
         else:
-            return self._validate_legacy_subject(subject_id)
+            subject_sessions = [self.get_subject_sessions(subject_id) for subject_id in subject_ids]
+        
+        pairs = []
+        for subject_id, sessions in zip(subject_ids, subject_sessions):
+            if sessions:
+                pairs.extend((subject_id, session_id) for session_id in sessions)
+            else:
+                pairs.append((subject_id, None))
+        return pairs
+    
+    def validate_subjects(
+        self,
+        pairs: List[Tuple[str, Optional[str]]],
+        n_jobs: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Validate several subjects/sessions concurrently.
+        
+        Validation is dominated by filesystem lookups, so a thread pool is
+        used; results are returned in the same order as ``pairs``.
+        
+        Args:
+            pairs: (subject_id, session_id) tuples to validate
+            n_jobs: Number of worker threads (default: config n_threads)
+            
+        Returns:
+            List of validation dictionaries
+        """
+        if n_jobs is None:
+            n_jobs = self.config.processing.n_threads
+        n_jobs = max(1, min(n_jobs, len(pairs)))
+        
+        if n_jobs == 1:
+            return [self.validate_subject(subject_id, session_id) for subject_id, session_id in pairs]
+        
+        with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+            return list(executor.map(lambda pair: self.validate_subject(*pair), pairs))
     
     def _validate_bids_subject(self, subject_id: str, session_id: Optional[str] = None) -> Dict[str, Any]:
         """Validate BIDS subject data."""
@@ -193,8 +434,13 @@ class SubjectManager:
                 validation_result["warnings"].append("No .bvec files found")
             
             # Check for dual phase encoding (for TopUp)
-            ap_files = [f for f in dwi_files if "AP" in f.name or "dir-AP" in f.name]
-            pa_files = [f for f in dwi_files if "PA" in f.name or "dir-PA" in f.name]
+            ap_files = []
+            pa_files = []
+            for f in dwi_files:
+                match = self._PE_RE.search(f.name)
+                if match:
+                    direction = match.group(1) or match.group(2)
+                    (ap_files if direction == "AP" else pa_files).append(f)
             
             validation_result["data_summary"]["dual_phase_encoding"] = len(ap_files) > 0 and len(pa_files) > 0
             
@@ -223,7 +469,7 @@ class SubjectManager:
             "data_dir": self._get_subject_data_dir(subject_id, session_id),
             "analysis_dir": self._get_subject_analysis_dir(subject_id, session_id),
             "validation": validation,
-            "processing_status": self._get_processing_status(subject_id, session_id),
+            "processing_status": self.get_processing_status(subject_id, session_id),
             "is_bids": self.is_bids
         }
         
@@ -231,30 +477,20 @@ class SubjectManager:
     
     def _get_subject_data_dir(self, subject_id: str, session_id: Optional[str] = None) -> Path:
         """Get subject data directory path."""
-        if self.is_bids:
-            if session_id:
-                return self.config.paths.data_dir / f"sub-{subject_id}" / f"ses-{session_id}"
-            else:
-                return self.config.paths.data_dir / f"sub-{subject_id}"
-        else:
-            return self.config.paths.data_dir / subject_id
+        return _subject_data_dir(self.config.paths.data_dir, self.is_bids, subject_id, session_id)
     
     def _get_subject_analysis_dir(self, subject_id: str, session_id: Optional[str] = None) -> Path:
         """Get subject analysis directory path."""
-        if session_id:
-            return self.config.paths.analysis_dir / f"sub-{subject_id}" / f"ses-{session_id}"
-        else:
-            return self.config.paths.analysis_dir / f"sub-{subject_id}"
+        return subject_paths(self.config.paths.analysis_dir, subject_id, session_id).analysis
     
     def _find_dwi_files(self, directory: Path) -> List[Path]:
         """Find DWI files in a directory."""
-        dwi_patterns = ["*.nii", "*.nii.gz"]
-        dwi_files = []
-        
-        for pattern in dwi_patterns:
-            files = list(directory.glob(pattern))
-            # Filter for files that likely contain DWI data
-            dwi_files.extend([f for f in files if "dwi" in f.name.lower()])
+        # NIfTI files that likely contain DWI data, in a single listing
+        with os.scandir(directory) as entries:
+            dwi_files = [
+                Path(entry.path) for entry in entries
+                if entry.name.endswith((".nii", ".nii.gz")) and "dwi" in entry.name.lower()
+            ]
         
         return sorted(dwi_files)
     
@@ -265,7 +501,7 @@ class SubjectManager:
         
         return sorted(bval_files), sorted(bvec_files)
     
-    def _get_processing_status(self, subject_id: str, session_id: Optional[str] = None) -> Dict[str, bool]:
+    def get_processing_status(self, subject_id: str, session_id: Optional[str] = None) -> Dict[str, bool]:
         """
         Check processing status for each pipeline step.
         
@@ -276,34 +512,7 @@ class SubjectManager:
         Returns:
             Dictionary mapping step names to completion status
         """
-        status = {}
-        analysis_dir = self._get_subject_analysis_dir(subject_id, session_id)
-        
-        # Check for each step's expected outputs
-        step_checks = {
-            "copy_data": analysis_dir.exists(),
-            "denoise": (analysis_dir / "dwi").exists() and 
-                      any((analysis_dir / "dwi").glob("*denoised*")),
-            "degibbs": (analysis_dir / "dwi").exists() and 
-                      any((analysis_dir / "dwi").glob("*degibbs*")),
-            "topup": (analysis_dir / "dwi" / "Topup").exists(),
-            "eddy": (analysis_dir / "dwi" / "Eddy").exists(),
-            "registration": (analysis_dir / "dwi" / "Reg").exists(),
-            "mdt": (analysis_dir / "dwi" / "mdt").exists(),
-            "mrtrix_prep": (analysis_dir / "dwi" / "mrtrix3").exists(),
-            "tractography": (analysis_dir / "dwi" / "mrtrix3").exists() and
-                           any((analysis_dir / "dwi" / "mrtrix3").glob("tracks_*")),
-            "sift2": (analysis_dir / "dwi" / "mrtrix3").exists() and
-                    any((analysis_dir / "dwi" / "mrtrix3").glob("sift_*")),
-            "roi_registration": (analysis_dir / "dwi" / "mrtrix3" / "ROIs").exists(),
-            "connectome": any((analysis_dir / "dwi" / "mrtrix3").glob("*fingerprint*")) if 
-                         (analysis_dir / "dwi" / "mrtrix3").exists() else False
-        }
-        
-        for step, completed in step_checks.items():
-            status[step] = completed
-        
-        return status
+        return get_processing_status(self.config, subject_id, session_id)
     
     def get_subjects_summary(self, subject_ids: Optional[List[str]] = None) -> Dict[str, Any]:
         """
@@ -313,7 +522,9 @@ class SubjectManager:
             subject_ids: List of subject IDs to summarize (default: all discovered subjects)
             
         Returns:
-            Dictionary with summary statistics
+            Dictionary with summary statistics; validation_errors and
+            validation_warnings hold the last SUMMARY_MESSAGE_LIMIT messages,
+            error_count and warning_count the totals
         """
         if subject_ids is None:
             subject_ids = self.discover_subjects()
@@ -324,35 +535,60 @@ class SubjectManager:
             "subjects_with_dual_encoding": 0,
             "subjects_with_sessions": 0,
             "processing_status": {step: 0 for step in self.config.steps_to_run},
-            "validation_errors": [],
-            "validation_warnings": [],
+            "validation_errors": deque(maxlen=SUMMARY_MESSAGE_LIMIT),
+            "validation_warnings": deque(maxlen=SUMMARY_MESSAGE_LIMIT),
+            "error_count": 0,
+            "warning_count": 0,
             "is_bids": self.is_bids
         }
         
-        for subject_id in subject_ids:
-            # Check for sessions
-            sessions = self.get_subject_sessions(subject_id)
-            if sessions:
-                summary["subjects_with_sessions"] += 1
-                # Validate each session
-                for session_id in sessions:
-                    validation = self.validate_subject(subject_id, session_id)
-                    self._update_summary_with_validation(summary, validation, subject_id, session_id)
+        # Prefer the state index written by the pipeline over stat-ing outputs
+        state_db = ProcessingStateDB.for_analysis_dir(self.config.paths.analysis_dir)
+        check_outputs = True
+        if state_db.exists():
+            try:
+                counts = state_db.get_step_counts("done", subject_ids)
+            except sqlite3.Error as e:
+                self.logger.warning(f"Could not read processing state index: {e}")
             else:
-                # No sessions, validate subject directly
-                validation = self.validate_subject(subject_id)
-                self._update_summary_with_validation(summary, validation, subject_id)
+                for step in summary["processing_status"]:
+                    summary["processing_status"][step] = counts.get(step, 0)
+                check_outputs = False
+        
+        # Validate and check outputs for each subject/session in one pass,
+        # concurrently, then fold the results into the summary in order
+        pairs = self.get_subject_session_pairs(subject_ids)
+        summary["subjects_with_sessions"] = len(
+            {subject_id for subject_id, session_id in pairs if session_id is not None}
+        )
+        
+        def inspect(pair: Tuple[str, Optional[str]]) -> Tuple[Dict[str, Any], Optional[Dict[str, bool]]]:
+            subject_id, session_id = pair
+            validation = self.validate_subject(subject_id, session_id)
+            status = self.get_processing_status(subject_id, session_id) if check_outputs else None
+            return validation, status
+        
+        n_jobs = max(1, min(self.config.processing.n_threads, len(pairs)))
+        if n_jobs > 1:
+            with ThreadPoolExecutor(max_workers=n_jobs) as executor:
+                inspected = list(executor.map(inspect, pairs))
+        else:
+            inspected = [inspect(pair) for pair in pairs]
+        
+        for validation, status in inspected:
+            self._update_summary_with_validation(summary, validation, status)
         
+        summary["validation_errors"] = list(summary["validation_errors"])
+        summary["validation_warnings"] = list(summary["validation_warnings"])
         return summary
     
     def _update_summary_with_validation(
         self, 
         summary: Dict[str, Any], 
         validation: Dict[str, Any], 
-        subject_id: str, 
-        session_id: Optional[str] = None
+        status: Optional[Dict[str, bool]] = None
     ) -> None:
-        """Update summary with validation results."""
+        """Update summary with validation results and, if given, processing status."""
         if validation["valid"]:
             summary["valid_subjects"] += 1
         
@@ -361,9 +597,102 @@ class SubjectManager:
         
         summary["validation_errors"].extend(validation["errors"])
         summary["validation_warnings"].extend(validation["warnings"])
+        summary["error_count"] += len(validation["errors"])
+        summary["warning_count"] += len(validation["warnings"])
+        
+        if status is None:
+            return
         
-        # Check processing status
-        status = self._get_processing_status(subject_id, session_id)
         for step, completed in status.items():
             if step in summary["processing_status"] and completed:
-                summary["processing_status"][step] += 1 
\ No newline at end of file
+                summary["processing_status"][step] += 1
+
+
+# Output name checks per step, applied to entries of the dwi and mrtrix3 directories
+_DWI_STATUS_CHECKS: Dict[str, Callable[[str], bool]] = {
+    "denoise": lambda name: "denoised" in name,
+    "degibbs": lambda name: "degibbs" in name,
+    "topup": lambda name: name == "Topup",
+    "eddy": lambda name: name == "Eddy",
+    "registration": lambda name: name == "Reg",
+    "mdt": lambda name: name == "mdt",
+    "mrtrix_prep": lambda name: name == "mrtrix3",
+}
+_MRTRIX_STATUS_CHECKS: Dict[str, Callable[[str], bool]] = {
+    "tractography": lambda name: name.startswith("tracks_"),
+    "sift2": lambda name: name.startswith("sift_"),
+    "roi_registration": lambda name: name == "ROIs",
+    "connectome": lambda name: "fingerprint" in name,
+}
+
+
+def _scan_dir_names(directory: Path, checks: Dict[str, Callable[[str], bool]]) -> Dict[str, bool]:
+    """
+    Evaluate name checks against a directory's entries in a single pass.
+    
+    The scan stops as soon as every check has matched, so large output
+    directories (e.g. thousands of track files) are rarely listed in full.
+    
+    Args:
+        directory: Directory to scan (missing directories match nothing)
+        checks: Mapping of step names to predicates on entry names
+        
+    Returns:
+        Dictionary mapping step names to whether any entry matched
+    """
+    found = dict.fromkeys(checks, False)
+    pending = dict(checks)
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                matched = [step for step, check in pending.items() if check(entry.name)]
+                for step in matched:
+                    found[step] = True
+                    del pending[step]
+                if not pending:
+                    break
+    except OSError:
+        pass
+    return found
+
+
+def get_processing_status(
+    config: SubtractConfig,
+    subject_id: str,
+    session_id: Optional[str] = None
+) -> Dict[str, bool]:
+    """
+    Check processing status for each pipeline step.
+    
+    Outcomes recorded in the processing state index take precedence over
+    the output-based checks, so a step that failed part way is not reported
+    as complete just because its output directory exists.
+    
+    Args:
+        config: Pipeline configuration
+        subject_id: Subject identifier
+        session_id: Session identifier (BIDS only)
+        
+    Returns:
+        Dictionary mapping step names to completion status
+    """
+    paths = subject_paths(config.paths.analysis_dir, subject_id, session_id)
+    
+    # One early-exit scan per directory instead of an exists()/glob() per step
+    status = {"copy_data": paths.analysis.exists()}
+    status.update(_scan_dir_names(paths.dwi, _DWI_STATUS_CHECKS))
+    if status["mrtrix_prep"]:
+        status.update(_scan_dir_names(paths.mrtrix3, _MRTRIX_STATUS_CHECKS))
+    else:
+        status.update(dict.fromkeys(_MRTRIX_STATUS_CHECKS, False))
+    
+    # Recorded outcomes override the output heuristics
+    state_db = ProcessingStateDB.for_analysis_dir(config.paths.analysis_dir)
+    try:
+        recorded = state_db.get_subject_status(subject_id, session_id)
+    except sqlite3.Error:
+        recorded = {}
+    for step, step_status in recorded.items():
+        status[step] = step_status == "done"
+    
+    return status
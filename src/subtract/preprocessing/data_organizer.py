@@ -5,15 +5,260 @@ This module handles copying and organizing data from BIDS datasets
 to the analysis directory structure.
 """
 
+import errno
+import operator
+import os
 import shutil
 import time
+from dataclasses import replace
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Any, BinaryIO, Dict, Iterator, List, Optional, Set, Tuple
 import logging
 
 from ..core.base_processor import BaseProcessor, ProcessingResult
 from ..config.settings import SubtractConfig
-from ..utils.bids_utils import BIDSLayout
+from ..core.subject_manager import subject_paths
+from ..utils.bids_utils import BIDSLayout, get_bids_layout
+
+try:
+    import fcntl
+except ImportError:
+    # fcntl is POSIX-only; reflink clones are skipped without it
+    fcntl = None
+
+
+# Linux ioctl that makes the destination a copy-on-write clone of the source
+# (btrfs, XFS with reflink, bcachefs); other filesystems reject it
+_FICLONE = 0x40049409
+
+# Buffer for the user-space fallback; much larger than shutil's default so
+# multi-GB DWI files take fewer read/write round trips
+_COPY_BUFFER_SIZE = 4 * 1024 * 1024
+
+# Bytes moved per splice call (and requested pipe size)
+_SPLICE_CHUNK_SIZE = 1024 * 1024
+
+# Page-cache hints for copy sources (POSIX only; absent on macOS and Windows)
+_posix_fadvise = getattr(os, "posix_fadvise", None)
+_FADV_SEQUENTIAL = getattr(os, "POSIX_FADV_SEQUENTIAL", 0)
+_FADV_WILLNEED = getattr(os, "POSIX_FADV_WILLNEED", 0)
+_FADV_DONTNEED = getattr(os, "POSIX_FADV_DONTNEED", 0)
+
+# BIDS entities kept in output filenames, in BIDS order
+_DWI_ENTITY_ORDER = ('task', 'acq', 'dir', 'run')
+_ANAT_ENTITY_ORDER = ('acq', 'ce', 'rec', 'run')
+
+
+# Errors meaning a copy method cannot work between two filesystems at all
+_UNSUPPORTED_COPY_ERRNOS = frozenset({
+    errno.EINVAL, errno.ENOSYS, errno.ENOTTY, errno.EOPNOTSUPP, errno.EXDEV,
+})
+
+# Copy methods found unsupported per (source device, destination directory),
+# so each batch of files probes a failing method once rather than per file
+_UNSUPPORTED_COPY_METHODS: Dict[Tuple[int, str], Set[str]] = {}
+
+
+def _copy_with_copy_file_range(src_fd: int, dst_fd: int, size: int) -> int:
+    """Copy with os.copy_file_range; returns the number of bytes copied."""
+    offset = 0
+    while offset < size:
+        n = os.copy_file_range(src_fd, dst_fd, size - offset, offset, offset)
+        if n == 0:
+            break
+        offset += n
+    return offset
+
+
+def _copy_with_splice(src_fd: int, dst_fd: int, size: int) -> int:
+    """Copy with os.splice through a pipe; returns the number of bytes copied."""
+    flags = os.SPLICE_F_MOVE | os.SPLICE_F_MORE
+    pipe_r, pipe_w = os.pipe()
+    try:
+        if fcntl is not None and hasattr(fcntl, "F_SETPIPE_SZ"):
+            try:
+                # Larger pipe, fewer round trips; the default is 64 KiB
+                fcntl.fcntl(pipe_w, fcntl.F_SETPIPE_SZ, _SPLICE_CHUNK_SIZE)
+            except OSError:
+                pass
+        offset = 0
+        while offset < size:
+            n = os.splice(src_fd, pipe_w, min(_SPLICE_CHUNK_SIZE, size - offset),
+                          offset_src=offset, flags=flags)
+            if n == 0:
+                break
+            # Drain the pipe into the destination at the same offset
+            written = 0
+            while written < n:
+                written += os.splice(pipe_r, dst_fd, n - written,
+                                     offset_dst=offset + written, flags=flags)
+            offset += n
+        return offset
+    finally:
+        os.close(pipe_r)
+        os.close(pipe_w)
+
+
+def _copy_with_sendfile(src_fd: int, dst_fd: int, size: int) -> int:
+    """Copy with os.sendfile; returns the number of bytes copied."""
+    offset = 0
+    while offset < size:
+        os.lseek(dst_fd, offset, os.SEEK_SET)
+        n = os.sendfile(dst_fd, src_fd, offset, size - offset)
+        if n == 0:
+            break
+        offset += n
+    return offset
+
+
+# In-kernel copy methods, in order of preference; each is skipped where the
+# os function it needs does not exist (splice is Linux-only, Python 3.10+)
+_KERNEL_COPY_METHODS = (
+    ("copy_file_range", _copy_with_copy_file_range),
+    ("splice", _copy_with_splice),
+    ("sendfile", _copy_with_sendfile),
+)
+
+
+def _copy_in_kernel(fsrc: BinaryIO, fdst: BinaryIO, size: int, route: Tuple[int, str]) -> bool:
+    """
+    Copy a file without moving its bytes through user space.
+    
+    Tries a reflink clone, then os.copy_file_range (server-side on NFS 4.2),
+    then os.splice through a pipe, then os.sendfile. After a failed attempt
+    the destination is reset so the next method starts from scratch.
+    
+    Args:
+        fsrc: Source file opened for binary reading
+        fdst: Destination file opened for binary writing
+        size: Source size in bytes
+        route: (source device, destination directory) key for remembering
+            which methods are unsupported
+        
+    Returns:
+        True if the file was copied
+    """
+    src_fd, dst_fd = fsrc.fileno(), fdst.fileno()
+    unsupported = _UNSUPPORTED_COPY_METHODS.setdefault(route, set())
+    
+    if fcntl is not None and "clone" not in unsupported:
+        try:
+            fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+            return True
+        except OSError as e:
+            if e.errno in _UNSUPPORTED_COPY_ERRNOS:
+                unsupported.add("clone")
+    
+    for method, copy in _KERNEL_COPY_METHODS:
+        if not hasattr(os, method) or method in unsupported:
+            continue
+        try:
+            if copy(src_fd, dst_fd, size) == size:
+                return True
+        except OSError as e:
+            if e.errno in _UNSUPPORTED_COPY_ERRNOS:
+                unsupported.add(method)
+        os.ftruncate(dst_fd, 0)
+    
+    return False
+
+
+def _advise(fd: int, *advice: int) -> None:
+    """
+    Pass page-cache hints for a whole file to the kernel, where supported.
+    
+    Args:
+        fd: Open file descriptor
+        advice: os.POSIX_FADV_* constants
+    """
+    if _posix_fadvise is None:
+        return
+    for value in advice:
+        try:
+            _posix_fadvise(fd, 0, 0, value)
+        except OSError:
+            # Hints are optional; e.g. pipes and some FUSE mounts reject them
+            return
+
+
+def _fast_copy(src: Path, dst: Path) -> None:
+    """
+    Copy a file, keeping the data in the kernel (or shared) where possible.
+    
+    Falls back to a buffered user-space copy when no in-kernel method
+    works. Only the access and modification times are carried over; the
+    mode and extended attributes that shutil.copystat would also copy are
+    not needed for pipeline inputs and cost several syscalls per file.
+    
+    Args:
+        src: Source file
+        dst: Destination file
+    """
+    with open(src, "rb") as fsrc, open(dst, "wb") as fdst:
+        src_fd = fsrc.fileno()
+        src_stat = os.fstat(src_fd)
+        route = (src_stat.st_dev, os.path.dirname(os.path.abspath(dst)))
+        if not _copy_in_kernel(fsrc, fdst, src_stat.st_size, route):
+            # The user-space copy reads the source once, front to back: ask
+            # for aggressive readahead. (Reflinks and server-side copies never
+            # read the data, so WILLNEED would only add a full read there.)
+            _advise(src_fd, _FADV_SEQUENTIAL, _FADV_WILLNEED)
+            fsrc.seek(0)
+            fdst.seek(0)
+            shutil.copyfileobj(fsrc, fdst, _COPY_BUFFER_SIZE)
+        # ...and is not read again, so its pages need not evict hotter ones.
+        # The copy is kept cached since the next step reads it.
+        _advise(src_fd, _FADV_DONTNEED)
+    
+    os.utime(dst, ns=(src_stat.st_atime_ns, src_stat.st_mtime_ns))
+
+
+def _is_up_to_date(src: Path, dst: Path) -> bool:
+    """
+    Check whether a destination already holds a copy of the source.
+    
+    Copies keep the source's modification time, so a destination of the
+    same size that is at least as new is taken to be current.
+    
+    Args:
+        src: Source file
+        dst: Destination file
+        
+    Returns:
+        True if copying src to dst can be skipped
+    """
+    try:
+        dst_stat = os.stat(dst)
+    except OSError:
+        return False
+    src_stat = os.stat(src)
+    return (dst_stat.st_size == src_stat.st_size
+            and dst_stat.st_mtime_ns >= src_stat.st_mtime_ns)
+
+
+def _walk_files(root: Path) -> Iterator[str]:
+    """
+    Yield the paths of all files below a directory.
+    
+    Uses os.scandir so entry types come from the directory listing, and
+    yields plain strings to avoid building a Path per entry. Symlinked
+    files are included (e.g. git-annex datasets); symlinked directories
+    are not descended into, matching Path.rglob.
+    
+    Args:
+        root: Directory to walk
+        
+    Yields:
+        File paths as strings
+    """
+    stack = [os.fspath(root)]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file():
+                    yield entry.path
 
 
 class DataOrganizer(BaseProcessor):
@@ -34,22 +279,30 @@ class DataOrganizer(BaseProcessor):
         """
         super().__init__(config, logger)
         
-        # Initialize BIDS layout if available
-        if self.config.paths.data_dir.exists():
-            try:
-                self.bids_layout = BIDSLayout(
-                    self.config.paths.data_dir, 
-                    self.config, 
-                    self.logger
-                )
-                self.is_bids = True
-            except Exception as e:
-                self.logger.warning(f"Failed to initialize BIDS layout: {e}")
-                self.bids_layout = None
-                self.is_bids = False
-        else:
-            self.bids_layout = None
-            self.is_bids = False
+        # BIDS layout, built on first use (building it scans the dataset)
+        self._bids_layout: Optional[BIDSLayout] = None
+        self._bids_checked = False
+    
+    @property
+    def bids_layout(self) -> Optional[BIDSLayout]:
+        """BIDS layout of the data directory, or None if it is not usable."""
+        if not self._bids_checked:
+            self._bids_checked = True
+            if self.config.paths.data_dir.exists():
+                try:
+                    self._bids_layout = get_bids_layout(
+                        self.config.paths.data_dir, 
+                        self.config, 
+                        self.logger
+                    )
+                except Exception as e:
+                    self.logger.warning(f"Failed to initialize BIDS layout: {e}")
+        return self._bids_layout
+    
+    @property
+    def is_bids(self) -> bool:
+        """Whether the data directory is handled as a BIDS dataset."""
+        return self.bids_layout is not None
     
     def process(self, subject_id: str, session_id: Optional[str] = None) -> ProcessingResult:
         """
@@ -71,9 +324,8 @@ class DataOrganizer(BaseProcessor):
                 result = self._process_legacy_subject(subject_id)
             
             execution_time = time.time() - start_time
-            result.execution_time = execution_time
             
-            return result
+            return replace(result, execution_time=execution_time)
             
         except Exception as e:
             execution_time = time.time() - start_time
@@ -94,20 +346,19 @@ class DataOrganizer(BaseProcessor):
         metrics = {}
         
         # Create analysis directory structure
-        if session_id:
-            analysis_dir = self.config.paths.analysis_dir / f"sub-{subject_id}" / f"ses-{session_id}"
-        else:
-            analysis_dir = self.config.paths.analysis_dir / f"sub-{subject_id}"
-        
-        dwi_analysis_dir = analysis_dir / "dwi"
-        anat_analysis_dir = analysis_dir / "anat"
+        paths = subject_paths(self.config.paths.analysis_dir, subject_id, session_id)
+        analysis_dir = paths.analysis
+        dwi_analysis_dir = paths.dwi
+        anat_analysis_dir = paths.anat
         
-        # Create directories
+        # Create directories; the first call creates their shared parent
         dwi_analysis_dir.mkdir(parents=True, exist_ok=True)
-        anat_analysis_dir.mkdir(parents=True, exist_ok=True)
+        anat_analysis_dir.mkdir(exist_ok=True)
         
-        # Get DWI files
-        dwi_files = self.bids_layout.get_dwi_files(subject_id, session_id)
+        # Get DWI and anatomical files
+        subject_files = self.bids_layout.get_subject_files(subject_id, session_id)
+        dwi_files = subject_files['dwi']
+        anat_files = subject_files['anat']
         
         if not dwi_files:
             return ProcessingResult(
@@ -118,106 +369,80 @@ class DataOrganizer(BaseProcessor):
                 error_message=f"No DWI files found for subject {subject_id}"
             )
         
-        # Copy DWI files
-        dwi_copied = 0
+        # Filename prefix shared by every file of this subject/session
+        prefix = f"sub-{subject_id}" + (f"_ses-{session_id}" if session_id else "")
+        
+        # Plan every copy up front so all files can be copied concurrently
+        dwi_jobs = []
         for dwi_info in dwi_files:
-            try:
-                # Create descriptive filename
-                entities = dwi_info['entities']
-                filename_parts = [f"sub-{subject_id}"]
-                
-                if session_id:
-                    filename_parts.append(f"ses-{session_id}")
-                
-                # Add other entities
-                for entity in ['task', 'acq', 'dir', 'run']:
-                    if entity in entities:
-                        filename_parts.append(f"{entity}-{entities[entity]}")
-                
-                filename_parts.append("dwi")
-                base_filename = "_".join(filename_parts)
-                
-                # Copy NIfTI file
-                nii_dest = dwi_analysis_dir / f"{base_filename}.nii.gz"
-                shutil.copy2(dwi_info['nii'], nii_dest)
-                outputs.append(nii_dest)
-                
-                # Copy bval file
-                if dwi_info['bval']:
-                    bval_dest = dwi_analysis_dir / f"{base_filename}.bval"
-                    shutil.copy2(dwi_info['bval'], bval_dest)
-                    outputs.append(bval_dest)
-                
-                # Copy bvec file
-                if dwi_info['bvec']:
-                    bvec_dest = dwi_analysis_dir / f"{base_filename}.bvec"
-                    shutil.copy2(dwi_info['bvec'], bvec_dest)
-                    outputs.append(bvec_dest)
-                
-                # Copy JSON file
-                if dwi_info['json']:
-                    json_dest = dwi_analysis_dir / f"{base_filename}.json"
-                    shutil.copy2(dwi_info['json'], json_dest)
-                    outputs.append(json_dest)
-                
+            # Create descriptive filename from the entities that are present
+            entities = dwi_info['entities']
+            base_filename = prefix + "".join(
+                f"_{entity}-{entities[entity]}" for entity in _DWI_ENTITY_ORDER if entity in entities
+            ) + "_dwi"
+            
+            # NIfTI plus whichever bval/bvec/JSON sidecars exist
+            pairs = [(dwi_info['nii'], dwi_analysis_dir / f"{base_filename}.nii.gz")]
+            for key in ['bval', 'bvec', 'json']:
+                if dwi_info[key]:
+                    pairs.append((dwi_info[key], dwi_analysis_dir / f"{base_filename}.{key}"))
+            dwi_jobs.append((dwi_info, pairs))
+        
+        anat_jobs = []
+        for anat_info in anat_files:
+            # Create descriptive filename from the entities that are present
+            entities = anat_info['entities']
+            base_filename = prefix + "".join(
+                f"_{entity}-{entities[entity]}" for entity in _ANAT_ENTITY_ORDER if entity in entities
+            ) + f"_{anat_info['suffix']}"
+            
+            pairs = [(anat_info['nii'], anat_analysis_dir / f"{base_filename}.nii.gz")]
+            if anat_info['json']:
+                pairs.append((anat_info['json'], anat_analysis_dir / f"{base_filename}.json"))
+            anat_jobs.append((anat_info, pairs))
+        
+        errors = iter(self._copy_files(
+            [pair for _, pairs in dwi_jobs + anat_jobs for pair in pairs]
+        ))
+        
+        # A file group counts as copied only if all of its files were
+        dwi_copied = 0
+        for dwi_info, pairs in dwi_jobs:
+            group_errors = [next(errors) for _ in pairs]
+            outputs.extend(dest for (_, dest), error in zip(pairs, group_errors) if error is None)
+            failed = [error for error in group_errors if error is not None]
+            if failed:
+                self.logger.error(f"Failed to copy DWI file {dwi_info['nii']}: {failed[0]}")
+            else:
                 dwi_copied += 1
                 self.logger.info(f"Copied DWI data: {dwi_info['nii'].name}")
-                
-            except Exception as e:
-                self.logger.error(f"Failed to copy DWI file {dwi_info['nii']}: {e}")
         
         metrics['dwi_files_copied'] = dwi_copied
         
-        # Get and copy anatomical files
-        anat_files = self.bids_layout.get_anat_files(subject_id, session_id)
         anat_copied = 0
-        
-        for anat_info in anat_files:
-            try:
-                # Create descriptive filename
-                entities = anat_info['entities']
-                filename_parts = [f"sub-{subject_id}"]
-                
-                if session_id:
-                    filename_parts.append(f"ses-{session_id}")
-                
-                # Add other entities
-                for entity in ['acq', 'ce', 'rec', 'run']:
-                    if entity in entities:
-                        filename_parts.append(f"{entity}-{entities[entity]}")
-                
-                filename_parts.append(anat_info['suffix'])
-                base_filename = "_".join(filename_parts)
-                
-                # Copy NIfTI file
-                nii_dest = anat_analysis_dir / f"{base_filename}.nii.gz"
-                shutil.copy2(anat_info['nii'], nii_dest)
-                outputs.append(nii_dest)
-                
-                # Copy JSON file
-                if anat_info['json']:
-                    json_dest = anat_analysis_dir / f"{base_filename}.json"
-                    shutil.copy2(anat_info['json'], json_dest)
-                    outputs.append(json_dest)
-                
+        for anat_info, pairs in anat_jobs:
+            group_errors = [next(errors) for _ in pairs]
+            outputs.extend(dest for (_, dest), error in zip(pairs, group_errors) if error is None)
+            failed = [error for error in group_errors if error is not None]
+            if failed:
+                self.logger.error(f"Failed to copy anatomical file {anat_info['nii']}: {failed[0]}")
+            else:
                 anat_copied += 1
                 self.logger.info(f"Copied anatomical data: {anat_info['nii'].name}")
-                
-            except Exception as e:
-                self.logger.error(f"Failed to copy anatomical file {anat_info['nii']}: {e}")
         
         metrics['anat_files_copied'] = anat_copied
         
         # Create processing log
         log_file = analysis_dir / "processing_log.txt"
-        with open(log_file, 'w') as f:
-            f.write(f"SubTract Pipeline Processing Log\n")
-            f.write(f"Subject: {subject_id}\n")
-            if session_id:
-                f.write(f"Session: {session_id}\n")
-            f.write(f"Data organization completed\n")
-            f.write(f"DWI files copied: {dwi_copied}\n")
-            f.write(f"Anatomical files copied: {anat_copied}\n")
+        log_lines = ["SubTract Pipeline Processing Log", f"Subject: {subject_id}"]
+        if session_id:
+            log_lines.append(f"Session: {session_id}")
+        log_lines += [
+            "Data organization completed",
+            f"DWI files copied: {dwi_copied}",
+            f"Anatomical files copied: {anat_copied}",
+        ]
+        log_file.write_text("\n".join(log_lines) + "\n")
         
         outputs.append(log_file)
         
@@ -237,7 +462,7 @@ class DataOrganizer(BaseProcessor):
         metrics = {}
         
         source_dir = self.config.paths.data_dir / subject_id
-        analysis_dir = self.config.paths.analysis_dir / f"sub-{subject_id}"
+        analysis_dir = subject_paths(self.config.paths.analysis_dir, subject_id).analysis
         
         if not source_dir.exists():
             return ProcessingResult(
@@ -254,33 +479,38 @@ class DataOrganizer(BaseProcessor):
         # Copy entire subject directory
         try:
             if analysis_dir.exists() and not self.config.processing.force_overwrite:
-                # Directory exists, check if we should skip
-                existing_files = list(analysis_dir.rglob("*"))
-                if existing_files:
+                # Directory exists, skip if it holds any file (stops at the first)
+                if next(_walk_files(analysis_dir), None) is not None:
                     self.logger.info(f"Analysis directory exists for {subject_id}, skipping copy")
                     return ProcessingResult(
                         success=True,
                         outputs=[analysis_dir],
-                        metrics={"files_copied": len(existing_files)},
+                        metrics={"files_copied": 0},
                         execution_time=0.0,
                         error_message=None
                     )
             
-            # Copy all files
-            files_copied = 0
-            for item in source_dir.rglob("*"):
-                if item.is_file():
-                    # Calculate relative path
-                    rel_path = item.relative_to(source_dir)
-                    dest_path = analysis_dir / rel_path
-                    
-                    # Create parent directories
+            # Mirror the directory tree first, then copy all files concurrently
+            pairs = []
+            created_dirs = set()
+            source_root = os.fspath(source_dir)
+            for item in _walk_files(source_dir):
+                # Calculate relative path
+                rel_path = os.path.relpath(item, source_root)
+                dest_path = analysis_dir / rel_path
+                
+                # Create each parent directory once, not once per file
+                if dest_path.parent not in created_dirs:
                     dest_path.parent.mkdir(parents=True, exist_ok=True)
-                    
-                    # Copy file
-                    shutil.copy2(item, dest_path)
-                    outputs.append(dest_path)
-                    files_copied += 1
+                    created_dirs.add(dest_path.parent)
+                pairs.append((Path(item), dest_path))
+            
+            for error in self._copy_files(pairs):
+                if error is not None:
+                    raise error
+            
+            outputs.extend(dest_path for _, dest_path in pairs)
+            files_copied = len(pairs)
             
             metrics['files_copied'] = files_copied
             
@@ -306,6 +536,38 @@ class DataOrganizer(BaseProcessor):
                 error_message=error_msg
             )
     
+    def _copy_files(self, pairs: List[Tuple[Path, Path]]) -> List[Optional[Exception]]:
+        """
+        Copy files concurrently.
+        
+        Copies are I/O bound, so running them on a thread pool lets the
+        storage service several files at once instead of one after another;
+        each copy is a reflink clone where the filesystem supports it.
+        Destinations that already match their source are left alone unless
+        force_overwrite is set, so incremental runs only copy what changed.
+        
+        Args:
+            pairs: (source, destination) paths to copy
+            
+        Returns:
+            Error raised for each pair (None if it was copied or already
+            up to date), in input order
+        """
+        overwrite = self.config.processing.force_overwrite
+        
+        def copy(pair: Tuple[Path, Path]) -> Optional[Exception]:
+            try:
+                if not overwrite and _is_up_to_date(*pair):
+                    self.logger.debug(f"Up to date, skipping copy: {pair[1]}")
+                    return None
+                _fast_copy(*pair)
+            except Exception as e:
+                return e
+            return None
+        
+        n_jobs = max(1, min(self.config.processing.n_threads, len(pairs)))
+        return self.map_concurrently(copy, pairs, n_jobs)
+    
     def validate_inputs(self, subject_id: str, **kwargs) -> bool:
         """
         Validate that the subject data directory exists and contains expected files.
@@ -333,13 +595,13 @@ class DataOrganizer(BaseProcessor):
             self.logger.warning(f"DWI subdirectory not found: {dwi_dir}")
             # Don't fail validation - some datasets might have different structure
         
-        # Check for at least some files
-        files = list(source_dir.rglob("*"))
-        if not files:
+        # Check for at least one file; no need to list the whole tree
+        first_file = next(_walk_files(source_dir), None)
+        if first_file is None:
             self.logger.error(f"No files found in source directory: {source_dir}")
             return False
         
-        self.logger.debug(f"Found {len(files)} files/directories in {source_dir}")
+        self.logger.debug(f"Found files in {source_dir}")
         return True
     
     def get_expected_outputs(self, subject_id: str, **kwargs) -> List[Path]:
@@ -353,12 +615,29 @@ class DataOrganizer(BaseProcessor):
         Returns:
             List of expected output paths
         """
-        dest_dir = self.config.paths.analysis_dir / f"sub-{subject_id}"
+        dest_dir = subject_paths(self.config.paths.analysis_dir, subject_id).analysis
         
         # Return the main subject directory as the primary output
         # Additional files will be discovered during processing
         return [dest_dir]
     
+    def should_skip(self, subject_id: str, **kwargs) -> bool:
+        """
+        Never skip based on outputs alone.
+        
+        The analysis directory exists as soon as any copy starts, so it does
+        not show that copying finished; process() already skips files that
+        are up to date.
+        
+        Args:
+            subject_id: Subject identifier
+            **kwargs: Additional parameters (unused)
+            
+        Returns:
+            False
+        """
+        return False
+    
     def get_dwi_files(self, subject_id: str) -> List[Path]:
         """
         Get list of DWI files for a subject.
@@ -369,23 +648,21 @@ class DataOrganizer(BaseProcessor):
         Returns:
             List of DWI file paths
         """
-        subject_dir = self.config.paths.analysis_dir / f"sub-{subject_id}"
-        dwi_dir = subject_dir / "dwi"
+        dwi_dir = subject_paths(self.config.paths.analysis_dir, subject_id).dwi
         
         if not dwi_dir.exists():
             return []
         
-        # Look for common DWI file patterns
-        dwi_patterns = ["*.nii", "*.nii.gz"]
-        dwi_files = []
-        
-        for pattern in dwi_patterns:
-            dwi_files.extend(dwi_dir.glob(pattern))
-        
-        # Filter for files that likely contain DWI data
-        dwi_files = [f for f in dwi_files if "dwi" in f.name.lower()]
+        # NIfTI files that likely contain DWI data, in a single listing
+        with os.scandir(dwi_dir) as entries:
+            dwi_files = [
+                Path(entry.path) for entry in entries
+                if entry.name.endswith((".nii", ".nii.gz")) and "dwi" in entry.name.lower()
+            ]
         
-        return sorted(dwi_files)
+        # All files share one directory, so ordering by name is enough
+        dwi_files.sort(key=operator.attrgetter("name"))
+        return dwi_files
     
     def get_bval_bvec_files(self, subject_id: str) -> tuple[Optional[Path], Optional[Path]]:
         """
@@ -397,8 +674,7 @@ class DataOrganizer(BaseProcessor):
         Returns:
             Tuple of (bval_file, bvec_file) or (None, None) if not found
         """
-        subject_dir = self.config.paths.analysis_dir / f"sub-{subject_id}"
-        dwi_dir = subject_dir / "dwi"
+        dwi_dir = subject_paths(self.config.paths.analysis_dir, subject_id).dwi
         
         if not dwi_dir.exists():
             return None, None
@@ -5,16 +5,23 @@ This module handles DWI denoising using MRtrix3 dwidenoise,
 corresponding to Step 002 in the original pipeline.
 """
 
+import asyncio
+import os
 import subprocess
 import time
 from pathlib import Path
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Tuple
 import logging
 
 from ..core.base_processor import BaseProcessor, ProcessingResult
 from ..config.settings import SubtractConfig
 
 
+def _inode_number(path: Path) -> int:
+    """Get a file's inode number, a proxy for its position on disk."""
+    return os.stat(path).st_ino
+
+
 class DWIDenoiser(BaseProcessor):
     """
     DWI denoising processor using MRtrix3 dwidenoise.
@@ -47,87 +54,261 @@ class DWIDenoiser(BaseProcessor):
         start_time = time.time()
         
         try:
-            # Get subject analysis directory
-            if session_id:
-                analysis_dir = self.config.paths.analysis_dir / f"sub-{subject_id}" / f"ses-{session_id}"
-            else:
-                analysis_dir = self.config.paths.analysis_dir / f"sub-{subject_id}"
-            
-            dwi_dir = analysis_dir / "dwi"
-            
-            if not dwi_dir.exists():
+            dwi_files, error_message = self._find_inputs(subject_id, session_id)
+            if error_message:
                 return ProcessingResult(
                     success=False,
                     outputs=[],
                     metrics={},
                     execution_time=time.time() - start_time,
-                    error_message=f"DWI directory not found: {dwi_dir}"
+                    error_message=error_message
                 )
             
-            # Find DWI files to denoise
-            dwi_files = self._find_dwi_files(dwi_dir)
+            # Process the DWI files concurrently, splitting the n_threads
+            # budget between the dwidenoise runs
+            n_parallel, threads_per_run = self._plan_parallel_runs(len(dwi_files))
             
-            if not dwi_files:
-                return ProcessingResult(
+            def denoise(dwi_file: Path) -> Tuple[Optional[Path], Optional[Exception]]:
+                try:
+                    return self._denoise_file(dwi_file, threads_per_run), None
+                except Exception as e:
+                    return None, e
+            
+            file_results = self.map_concurrently(denoise, dwi_files, n_parallel)
+            
+            return self._collect_results(dwi_files, file_results, start_time)
+            
+        except Exception as e:
+            return self._failed_result(subject_id, e, start_time)
+    
+    def process_batch(
+        self,
+        subject_ids: List[str],
+        session_ids: Optional[List[Optional[str]]] = None
+    ) -> List[ProcessingResult]:
+        """
+        Process DWI denoising for several subjects as one pool of runs.
+        
+        The files of all subjects share one n_threads budget, so a subject
+        with a single file does not leave threads idle while the next
+        subject waits its turn.
+        
+        Args:
+            subject_ids: Subject identifiers
+            session_ids: Session identifier per subject (BIDS only)
+            
+        Returns:
+            ProcessingResult per subject, in the order given
+        """
+        start_time = time.time()
+        if session_ids is None:
+            session_ids = [None] * len(subject_ids)
+        
+        # Find every subject's inputs up front; subjects without any get their error result
+        results: List[Optional[ProcessingResult]] = []
+        subject_files: List[List[Path]] = []
+        for subject_id, session_id in zip(subject_ids, session_ids):
+            try:
+                dwi_files, error_message = self._find_inputs(subject_id, session_id)
+            except Exception as e:
+                results.append(self._failed_result(subject_id, e, start_time))
+                subject_files.append([])
+                continue
+            
+            if error_message:
+                results.append(ProcessingResult(
                     success=False,
                     outputs=[],
                     metrics={},
                     execution_time=time.time() - start_time,
-                    error_message=f"No DWI files found in {dwi_dir}"
-                )
-            
-            outputs = []
-            metrics = {"files_processed": 0, "files_skipped": 0}
+                    error_message=error_message
+                ))
+            else:
+                results.append(None)
+            subject_files.append(dwi_files)
+        
+        all_files = [dwi_file for dwi_files in subject_files for dwi_file in dwi_files]
+        if all_files:
+            n_parallel, threads_per_run = self._plan_parallel_runs(len(all_files))
             
-            # Process each DWI file
-            for dwi_file in dwi_files:
+            def denoise(dwi_file: Path) -> Tuple[Optional[Path], Optional[Exception]]:
                 try:
-                    result = self._denoise_file(dwi_file)
-                    if result:
-                        outputs.append(result)
-                        metrics["files_processed"] += 1
-                        self.logger.info(f"Denoised: {dwi_file.name}")
-                    else:
-                        metrics["files_skipped"] += 1
-                        self.logger.info(f"Skipped (already exists): {dwi_file.name}")
-                        
+                    return self._denoise_file(dwi_file, threads_per_run), None
                 except Exception as e:
-                    self.logger.error(f"Failed to denoise {dwi_file}: {e}")
-                    # Continue with other files
+                    return None, e
+            
+            file_results = self.map_concurrently(denoise, all_files, n_parallel)
+            
+            # Hand each subject back its slice of the pooled results
+            offset = 0
+            for index, dwi_files in enumerate(subject_files):
+                if results[index] is None:
+                    results[index] = self._collect_results(
+                        dwi_files, file_results[offset:offset + len(dwi_files)], start_time
+                    )
+                offset += len(dwi_files)
+        
+        return results
+    
+    async def process_async(self, subject_id: str, session_id: Optional[str] = None) -> ProcessingResult:
+        """
+        Process DWI denoising for a subject from a coroutine.
+        
+        Runs dwidenoise as asyncio subprocesses, so the event loop can keep
+        many subjects' runs in flight without a thread per run.
+        
+        Args:
+            subject_id: Subject identifier
+            session_id: Session identifier (BIDS only)
+            
+        Returns:
+            ProcessingResult object
+        """
+        start_time = time.time()
+        
+        try:
+            dwi_files, error_message = self._find_inputs(subject_id, session_id)
+            if error_message:
+                return ProcessingResult(
+                    success=False,
+                    outputs=[],
+                    metrics={},
+                    execution_time=time.time() - start_time,
+                    error_message=error_message
+                )
+            
+            n_parallel, threads_per_run = self._plan_parallel_runs(len(dwi_files))
+            limit = asyncio.Semaphore(n_parallel)
             
-            execution_time = time.time() - start_time
-            # Success if we processed files OR skipped files (outputs already exist)
-            total_files_handled = metrics["files_processed"] + metrics["files_skipped"]
-            success = total_files_handled > 0
+            async def denoise(dwi_file: Path) -> Tuple[Optional[Path], Optional[Exception]]:
+                async with limit:
+                    try:
+                        return await self._denoise_file_async(dwi_file, threads_per_run), None
+                    except Exception as e:
+                        return None, e
             
-            # Add skipped files to outputs (they already exist)
-            if metrics["files_skipped"] > 0:
-                dwi_files = self._find_dwi_files(dwi_dir)
-                for dwi_file in dwi_files:
-                    expected_output = self._get_expected_output_path(dwi_file)
-                    if expected_output.exists() and expected_output not in outputs:
-                        outputs.append(expected_output)
+            file_results = await asyncio.gather(*(denoise(dwi_file) for dwi_file in dwi_files))
             
-            return ProcessingResult(
-                success=success,
-                outputs=outputs,
-                metrics=metrics,
-                execution_time=execution_time,
-                error_message=None if success else "No DWI files found to denoise"
-            )
+            return self._collect_results(dwi_files, file_results, start_time)
             
         except Exception as e:
-            execution_time = time.time() - start_time
-            error_msg = f"DWI denoising failed for subject {subject_id}: {str(e)}"
-            self.logger.error(error_msg)
+            return self._failed_result(subject_id, e, start_time)
+    
+    def _find_inputs(self, subject_id: str, session_id: Optional[str]) -> Tuple[List[Path], Optional[str]]:
+        """
+        Find the DWI files to denoise for a subject.
+        
+        Args:
+            subject_id: Subject identifier
+            session_id: Session identifier (BIDS only)
             
-            return ProcessingResult(
-                success=False,
-                outputs=[],
-                metrics={},
-                execution_time=execution_time,
-                error_message=error_msg
-            )
+        Returns:
+            Tuple of (DWI files, error message if there is nothing to denoise)
+        """
+        # Get subject analysis directory
+        if session_id:
+            analysis_dir = self.config.paths.analysis_dir / f"sub-{subject_id}" / f"ses-{session_id}"
+        else:
+            analysis_dir = self.config.paths.analysis_dir / f"sub-{subject_id}"
+        
+        dwi_dir = analysis_dir / "dwi"
+        
+        if not dwi_dir.exists():
+            return [], f"DWI directory not found: {dwi_dir}"
+        
+        # Find DWI files to denoise
+        dwi_files = self._find_dwi_files(dwi_dir)
+        
+        if not dwi_files:
+            return [], f"No DWI files found in {dwi_dir}"
+        
+        # Files are denoised independently, so start them in inode order
+        # (roughly their on-disk layout) rather than by name
+        dwi_files.sort(key=_inode_number)
+        
+        return dwi_files, None
+    
+    def _collect_results(
+        self,
+        dwi_files: List[Path],
+        file_results: List[Tuple[Optional[Path], Optional[Exception]]],
+        start_time: float
+    ) -> ProcessingResult:
+        """
+        Combine per-file denoising results into the step result.
+        
+        Args:
+            dwi_files: Input DWI files
+            file_results: (output or None if skipped, error) per input file
+            start_time: Step start time
+            
+        Returns:
+            ProcessingResult object
+        """
+        outputs = []
+        skipped_files = []
+        metrics = {"files_processed": 0, "files_skipped": 0}
+        
+        for dwi_file, (result, error) in zip(dwi_files, file_results):
+            if error is not None:
+                self.logger.error(f"Failed to denoise {dwi_file}: {error}")
+                # Continue with other files
+            elif result:
+                outputs.append(result)
+                metrics["files_processed"] += 1
+                self.logger.info(f"Denoised: {dwi_file.name}")
+            else:
+                skipped_files.append(dwi_file)
+                metrics["files_skipped"] += 1
+                self.logger.info(f"Skipped (already exists): {dwi_file.name}")
+        
+        execution_time = time.time() - start_time
+        # Success if we processed files OR skipped files (outputs already exist)
+        total_files_handled = metrics["files_processed"] + metrics["files_skipped"]
+        success = total_files_handled > 0
+        
+        # Add skipped files to outputs (they were skipped because they already exist)
+        outputs.extend(self._get_expected_output_path(dwi_file) for dwi_file in skipped_files)
+        
+        return ProcessingResult(
+            success=success,
+            outputs=outputs,
+            metrics=metrics,
+            execution_time=execution_time,
+            error_message=None if success else "No DWI files found to denoise"
+        )
+    
+    def _failed_result(self, subject_id: str, error: Exception, start_time: float) -> ProcessingResult:
+        """Build the result for a denoising run that raised."""
+        execution_time = time.time() - start_time
+        error_msg = f"DWI denoising failed for subject {subject_id}: {str(error)}"
+        self.logger.error(error_msg)
+        
+        return ProcessingResult(
+            success=False,
+            outputs=[],
+            metrics={},
+            execution_time=execution_time,
+            error_message=error_msg
+        )
+    
+    def _plan_parallel_runs(self, n_files: int) -> Tuple[int, int]:
+        """
+        Split the n_threads budget between concurrent dwidenoise runs.
+        
+        Every file gets its own run while there are threads to spare, so
+        N files finish in about the time of one instead of N, and the
+        threads of all runs together never exceed n_threads.
+        
+        Args:
+            n_files: Number of files to denoise
+            
+        Returns:
+            (concurrent runs, threads per run), both at least 1
+        """
+        n_threads = self.n_threads
+        n_parallel = max(1, min(n_files, n_threads))
+        return n_parallel, n_threads // n_parallel
     
     def _find_dwi_files(self, dwi_dir: Path) -> List[Path]:
         """
@@ -141,12 +322,14 @@ class DWIDenoiser(BaseProcessor):
         """
         dwi_files = []
         
-        # Look for .nii and .nii.gz files containing "dwi"
-        for pattern in ["*.nii", "*.nii.gz"]:
-            files = list(dwi_dir.glob(pattern))
-            dwi_files.extend([f for f in files if "dwi" in f.name.lower() and "denoised" not in f.name.lower()])
+        # Look for .nii and .nii.gz files containing "dwi"; the (sorted)
+        # listing is reused by later calls while the directory is unchanged
+        for name in self.list_dir(dwi_dir):
+            lower_name = name.lower()
+            if name.endswith((".nii", ".nii.gz")) and "dwi" in lower_name and "denoised" not in lower_name:
+                dwi_files.append(dwi_dir / name)
         
-        return sorted(dwi_files)
+        return dwi_files
     
     def _get_expected_output_path(self, input_file: Path) -> Path:
         """
@@ -164,15 +347,16 @@ class DWIDenoiser(BaseProcessor):
             stem = input_file.name.replace(".nii.gz", "")
             return input_file.parent / f"{stem}_denoised.nii.gz"
     
-    def _denoise_file(self, input_file: Path) -> Optional[Path]:
+    def _denoise_command(self, input_file: Path, n_threads: Optional[int]) -> Tuple[Path, Optional[List[str]]]:
         """
-        Denoise a single DWI file using MRtrix3 dwidenoise.
+        Build the dwidenoise command for a DWI file.
         
         Args:
             input_file: Input DWI file path
+            n_threads: Threads for dwidenoise (default: config n_threads)
             
         Returns:
-            Output file path if successful, None if skipped
+            Tuple of (output path, command or None if the output already exists)
         """
         # Determine output filename
         output_file = self._get_expected_output_path(input_file)
@@ -180,7 +364,7 @@ class DWIDenoiser(BaseProcessor):
         # Check if output already exists and we're not forcing overwrite
         if output_file.exists() and not self.config.processing.force_overwrite:
             self.logger.debug(f"Output exists, skipping: {output_file}")
-            return None
+            return output_file, None
         
         # Build dwidenoise command with absolute paths
         cmd = [
@@ -188,24 +372,76 @@ class DWIDenoiser(BaseProcessor):
             str(input_file.resolve()),
             str(output_file.resolve()),
             "-force",
-            "-nthreads", str(self.config.processing.n_threads)
+            "-nthreads", str(n_threads or self.n_threads)
         ]
         
+        # The progress bar is only ever logged at debug level; without it
+        # stderr carries just warnings and errors
+        if not self.logger.isEnabledFor(logging.DEBUG):
+            cmd.append("-quiet")
+        return output_file, cmd
+    
+    def _check_denoise_output(self, result: subprocess.CompletedProcess, output_file: Path) -> Path:
+        """Log dwidenoise's output and verify that it wrote its output file."""
+        # Log any output from dwidenoise
+        if result.stdout:
+            self.logger.debug(f"dwidenoise stdout: {result.stdout}")
+        if result.stderr:
+            self.logger.debug(f"dwidenoise stderr: {result.stderr}")
+        
+        # Verify output file was created
+        if not output_file.exists():
+            raise RuntimeError(f"Output file was not created: {output_file}")
+        
+        return output_file
+    
+    def _denoise_file(self, input_file: Path, n_threads: Optional[int] = None) -> Optional[Path]:
+        """
+        Denoise a single DWI file using MRtrix3 dwidenoise.
+        
+        Args:
+            input_file: Input DWI file path
+            n_threads: Threads for dwidenoise (default: config n_threads)
+            
+        Returns:
+            Output file path if successful, None if skipped
+        """
+        output_file, cmd = self._denoise_command(input_file, n_threads)
+        if cmd is None:
+            return None
+        
         # Execute command
         try:
-            result = self.run_command(cmd)
+            return self._check_denoise_output(self.run_command(cmd), output_file)
             
-            # Log any output from dwidenoise
-            if result.stdout:
-                self.logger.debug(f"dwidenoise stdout: {result.stdout}")
-            if result.stderr:
-                self.logger.debug(f"dwidenoise stderr: {result.stderr}")
-            
-            # Verify output file was created
-            if not output_file.exists():
-                raise RuntimeError(f"Output file was not created: {output_file}")
+        except subprocess.CalledProcessError as e:
+            error_msg = f"dwidenoise failed for {input_file}: {e.stderr}"
+            self.logger.error(error_msg)
+            raise RuntimeError(error_msg)
+        
+        except Exception as e:
+            error_msg = f"Unexpected error during denoising {input_file}: {str(e)}"
+            self.logger.error(error_msg)
+            raise RuntimeError(error_msg)
+    
+    async def _denoise_file_async(self, input_file: Path, n_threads: Optional[int] = None) -> Optional[Path]:
+        """
+        Awaitable counterpart of _denoise_file.
+        
+        Args:
+            input_file: Input DWI file path
+            n_threads: Threads for dwidenoise (default: config n_threads)
             
-            return output_file
+        Returns:
+            Output file path if successful, None if skipped
+        """
+        output_file, cmd = self._denoise_command(input_file, n_threads)
+        if cmd is None:
+            return None
+        
+        # Execute command
+        try:
+            return self._check_denoise_output(await self.run_command_async(cmd), output_file)
             
         except subprocess.CalledProcessError as e:
             error_msg = f"dwidenoise failed for {input_file}: {e.stderr}"
@@ -246,10 +482,8 @@ class DWIDenoiser(BaseProcessor):
             self.logger.error(f"No DWI files found in {dwi_dir}")
             return False
         
-        # Check that MRtrix3 is available
-        try:
-            self.run_command(["dwidenoise", "--help"])
-        except (subprocess.CalledProcessError, FileNotFoundError):
+        # Check that MRtrix3 is available (looked up once per process)
+        if self.find_tool("dwidenoise") is None:
             self.logger.error("MRtrix3 dwidenoise command not found. Please ensure MRtrix3 is installed and in PATH.")
             return False
         
@@ -312,4 +546,4 @@ class DWIDenoiser(BaseProcessor):
             return False
         
         # Check if all expected outputs exist
-        return all(output.exists() for output in expected_outputs) 
\ No newline at end of file
+        return self.outputs_exist(expected_outputs)
\ No newline at end of file
@@ -5,9 +5,14 @@ This module handles distortion correction using FSL TopUp,
 corresponding to Step 003 in the original pipeline.
 """
 
+import fnmatch
+import shutil
 import subprocess
+import tempfile
 import time
 import json
+from concurrent.futures import wait
+from functools import lru_cache
 from pathlib import Path
 from typing import Dict, List, Optional, Any, Tuple
 import logging
@@ -15,6 +20,37 @@ import os
 
 from ..core.base_processor import BaseProcessor, ProcessingResult
 from ..config.settings import SubtractConfig
+from ..utils.bids_utils import load_json_sidecar
+
+try:
+    import nibabel as nib
+    import numpy as np
+except ImportError:
+    nib = None
+    np = None
+
+
+# tmpfs mount for scratch intermediates (see ProcessingConfig.topup_scratch)
+_SCRATCH_ROOT = Path("/dev/shm")
+
+# FSLOUTPUTTYPE matching each image extension written by this module
+_FSL_OUTPUT_TYPES = {".nii.gz": "NIFTI_GZ", ".nii": "NIFTI"}
+
+
+@lru_cache(maxsize=1024)
+def _sidecar_readout_time(json_file: str, mtime_ns: int, size: int) -> Optional[float]:
+    """
+    Get TotalReadoutTime from a JSON sidecar, parsing each file version once.
+    
+    Args:
+        json_file: Path to the JSON sidecar
+        mtime_ns: Modification time of the sidecar (invalidates edited files)
+        size: Size of the sidecar in bytes
+        
+    Returns:
+        TotalReadoutTime, or None if the sidecar does not define it
+    """
+    return load_json_sidecar(Path(json_file)).get('TotalReadoutTime')
 
 
 class DistortionCorrector(BaseProcessor):
@@ -98,25 +134,41 @@ class DistortionCorrector(BaseProcessor):
             outputs = []
             metrics = {}
             
-            # Step 1: Extract B0 images
-            self.logger.info(f"Extracting B0 images from {pe_direction} data")
-            b0_first, b0_second = self._extract_b0_images(pe_files, topup_dir, subject_id, pe_direction)
-            outputs.extend([b0_first, b0_second])
-            
-            # Step 2: Merge B0 images
-            self.logger.info(f"Merging {pe_direction} B0 images")
-            merged_b0 = self._merge_b0_images(b0_first, b0_second, topup_dir, subject_id, pe_direction)
-            outputs.append(merged_b0)
-            
-            # Step 3: Create acquisition parameters file
-            self.logger.info("Creating acquisition parameters file")
-            acq_params_file = self._create_acquisition_params(pe_files, topup_dir, pe_direction)
-            outputs.append(acq_params_file)
-            
-            # Step 4: Run TopUp
-            self.logger.info("Running FSL TopUp to estimate field inhomogeneity")
-            topup_output = self._run_topup(merged_b0, acq_params_file, topup_dir, subject_id, pe_direction)
-            outputs.extend(topup_output)
+            # The B0 images are only read back by topup itself; with scratch
+            # enabled they are written uncompressed to tmpfs and dropped after
+            scratch_dir = self._make_scratch_dir(subject_id)
+            try:
+                if scratch_dir is not None:
+                    b0_dir, b0_ext = scratch_dir, ".nii"
+                else:
+                    b0_dir, b0_ext = topup_dir, ".nii.gz"
+                
+                # Steps 1-2 and 3 are independent: extract and merge the B0 images
+                # while the acquisition parameters file is written from the JSON metadata
+                self.logger.info("Creating acquisition parameters file")
+                executor = self._get_executor()
+                b0_future = executor.submit(
+                    self._prepare_merged_b0, pe_files, b0_dir, subject_id, pe_direction, b0_ext
+                )
+                acq_params_future = executor.submit(
+                    self._create_acquisition_params, pe_files, topup_dir, pe_direction
+                )
+                # Let both finish before either error propagates
+                wait((b0_future, acq_params_future))
+                b0_outputs = b0_future.result()
+                acq_params_file = acq_params_future.result()
+                merged_b0 = b0_outputs[-1]
+                if scratch_dir is None:
+                    outputs.extend(b0_outputs)
+                outputs.append(acq_params_file)
+                
+                # Step 4: Run TopUp
+                self.logger.info("Running FSL TopUp to estimate field inhomogeneity")
+                topup_output = self._run_topup(merged_b0, acq_params_file, topup_dir, subject_id, pe_direction)
+                outputs.extend(topup_output)
+            finally:
+                if scratch_dir is not None:
+                    shutil.rmtree(scratch_dir, ignore_errors=True)
             
             # Step 5: Apply TopUp correction
             self.logger.info("Applying TopUp correction to DWI data")
@@ -168,6 +220,10 @@ class DistortionCorrector(BaseProcessor):
             'AP-PA': ['AP', 'PA']
         }
         
+        # List the directory once (reused while it is unchanged) and match
+        # every pattern against the names
+        names = self.list_dir(dwi_dir)
+        
         # Look for denoised files first, then original files
         for suffix in ['_denoised.nii.gz', '.nii.gz', '.nii']:
             for pe_direction, directions in pe_pairs.items():
@@ -176,15 +232,16 @@ class DistortionCorrector(BaseProcessor):
                 
                 for direction in directions:
                     pattern = f"*{subject_id}*dir-{direction}*dwi{suffix}"
-                    files = list(dwi_dir.glob(pattern))
+                    match = next((name for name in names if fnmatch.fnmatchcase(name, pattern)), None)
                     
-                    if files:
+                    if match:
+                        found_file = dwi_dir / match
                         if found_count == 0:
-                            pe_files['first'] = files[0]
+                            pe_files['first'] = found_file
                         else:
-                            pe_files['second'] = files[0]
+                            pe_files['second'] = found_file
                         found_count += 1
-                        self.logger.debug(f"Found {direction} file: {files[0]}")
+                        self.logger.debug(f"Found {direction} file: {found_file}")
                 
                 # If we found both files for this direction pair, return them
                 if pe_files['first'] and pe_files['second']:
@@ -194,83 +251,213 @@ class DistortionCorrector(BaseProcessor):
         # If no complete pair found, return empty dict and empty string
         return {'first': None, 'second': None}, ""
     
-    def _extract_b0_images(self, pe_files: Dict[str, Path], topup_dir: Path, subject_id: str, pe_direction: str) -> Tuple[Path, Path]:
+    def _make_scratch_dir(self, subject_id: str) -> Optional[Path]:
+        """
+        Create a per-run scratch directory on tmpfs if scratch is enabled.
+        
+        Args:
+            subject_id: Subject identifier
+            
+        Returns:
+            Path to the new scratch directory, or None to work in the TopUp directory
+        """
+        if not self.config.processing.topup_scratch:
+            return None
+        if not _SCRATCH_ROOT.is_dir():
+            self.logger.warning(f"{_SCRATCH_ROOT} not available; writing TopUp intermediates to the TopUp directory")
+            return None
+        return Path(tempfile.mkdtemp(prefix=f"topup_{subject_id}_", dir=_SCRATCH_ROOT))
+    
+    def _prepare_merged_b0(self, pe_files: Dict[str, Path], topup_dir: Path, subject_id: str,
+                           pe_direction: str, ext: str = ".nii.gz") -> List[Path]:
+        """
+        Extract the B0 image of both phase encoding directions and merge them.
+        
+        Args:
+            pe_files: Dictionary with first and second file paths
+            topup_dir: Directory for the B0 images
+            subject_id: Subject identifier
+            pe_direction: Phase encoding direction string (e.g., "AP-PA")
+            ext: Image extension for the B0 images (".nii.gz" or ".nii")
+            
+        Returns:
+            Files written, with the merged B0 image last
+        """
+        if self._use_inprocess_b0_merge():
+            self.logger.info(f"Extracting and merging {pe_direction} B0 images in-process")
+            return [self._extract_and_merge_b0s(pe_files, topup_dir, subject_id, pe_direction, ext)]
+        
+        # Step 1: Extract B0 images
+        self.logger.info(f"Extracting B0 images from {pe_direction} data")
+        b0_first, b0_second = self._extract_b0_images(pe_files, topup_dir, subject_id, pe_direction, ext)
+        
+        # Step 2: Merge B0 images
+        self.logger.info(f"Merging {pe_direction} B0 images")
+        merged_b0 = self._merge_b0_images(b0_first, b0_second, topup_dir, subject_id, pe_direction, ext)
+        return [b0_first, b0_second, merged_b0]
+    
+    def _use_inprocess_b0_merge(self) -> bool:
+        """Check whether the in-process B0 merge is enabled and usable."""
+        if not self.config.processing.inprocess_b0_merge:
+            return False
+        if nib is None:
+            self.logger.warning("In-process B0 merge needs nibabel and numpy; falling back to fslroi/fslmerge")
+            return False
+        return True
+    
+    def _extract_and_merge_b0s(self, pe_files: Dict[str, Path], topup_dir: Path, subject_id: str,
+                               pe_direction: str, ext: str = ".nii.gz") -> Path:
+        """
+        Write the merged B0 image in one pass, without per-direction B0 files.
+        
+        Slicing the image proxies decompresses only the first volume of
+        each input, and the merged image is compressed once, replacing two
+        fslroi runs and an fslmerge that re-reads their outputs.
+        
+        Args:
+            pe_files: Dictionary with first and second file paths
+            topup_dir: Directory for the merged B0 image
+            subject_id: Subject identifier
+            pe_direction: Phase encoding direction string (e.g., "AP-PA")
+            ext: Image extension for the merged B0 image
+            
+        Returns:
+            Path to merged B0 image
+        """
+        merged_b0 = topup_dir / f"{subject_id}_dir-{pe_direction}_dwi{ext}"
+        
+        image_first, b0_first = self._load_b0(pe_files['first'])
+        image_second, b0_second = self._load_b0(pe_files['second'])
+        if image_first.shape[:3] != image_second.shape[:3]:
+            raise RuntimeError(
+                f"Cannot merge B0 images with different grids: "
+                f"{image_first.shape[:3]} vs {image_second.shape[:3]}"
+            )
+        
+        # Keep the first image's header (datatype, qform/sform, pixdim) as fslmerge does
+        merged = type(image_first)(
+            np.concatenate([b0_first, b0_second], axis=3), image_first.affine, image_first.header
+        )
+        merged.to_filename(str(merged_b0))
+        
+        self.logger.debug(f"Wrote merged B0 image: {merged_b0}")
+        return merged_b0
+    
+    def _load_b0(self, image_file: Path) -> Tuple[Any, Any]:
+        """
+        Load an image and read only its first (B0) volume.
+        
+        Slicing the image proxy reads just that volume: a memory-mapped
+        slab for .nii files, and a decompressed prefix for .nii.gz files.
+        
+        Args:
+            image_file: 3D or 4D NIfTI file
+            
+        Returns:
+            Tuple of (nibabel image, B0 volume as an X x Y x Z x 1 array)
+        """
+        image = nib.load(str(image_file))
+        if len(image.shape) > 3:
+            return image, np.asanyarray(image.dataobj[..., :1])
+        return image, np.asanyarray(image.dataobj)[..., np.newaxis]
+    
+    def _extract_b0_images(self, pe_files: Dict[str, Path], topup_dir: Path, subject_id: str,
+                           pe_direction: str, ext: str = ".nii.gz") -> Tuple[Path, Path]:
         """
         Extract B0 (first volume) from dual phase encoding DWI data.
         
         Args:
             pe_files: Dictionary with first and second file paths
-            topup_dir: TopUp working directory
+            topup_dir: Directory for the B0 images
             subject_id: Subject identifier
             pe_direction: Phase encoding direction string (e.g., "AP-PA", "LR-RL")
+            ext: Image extension for the B0 images
             
         Returns:
             Tuple of (B0_first_path, B0_second_path)
         """
         # Extract direction names from pe_direction
         directions = pe_direction.split('-')
-        b0_first = topup_dir / f"{subject_id}_dir-{directions[0]}_dwi.nii.gz"
-        b0_second = topup_dir / f"{subject_id}_dir-{directions[1]}_dwi.nii.gz"
-        
-        # Extract first volume (B0) from first data
-        cmd_first = [
-            "fslroi",
-            str(pe_files['first'].resolve()),
-            str(b0_first.resolve()),
-            "0", "1"
-        ]
-        
-        # Extract first volume (B0) from second data
-        cmd_second = [
-            "fslroi",
-            str(pe_files['second'].resolve()),
-            str(b0_second.resolve()),
-            "0", "1"
-        ]
-        
-        # Run commands
-        for cmd, output_file in [(cmd_first, b0_first), (cmd_second, b0_second)]:
-            try:
+        b0_first = topup_dir / f"{subject_id}_dir-{directions[0]}_dwi{ext}"
+        b0_second = topup_dir / f"{subject_id}_dir-{directions[1]}_dwi{ext}"
+        
+        # Extract first volume (B0) from first and second data
+        jobs = [(pe_files['first'], b0_first), (pe_files['second'], b0_second)]
+        
+        if nib is not None:
+            # Read only the B0 volume instead of having fslroi load each whole series
+            for input_file, output_file in jobs:
+                image, b0 = self._load_b0(input_file)
+                type(image)(b0, image.affine, image.header).to_filename(str(output_file))
+            return b0_first, b0_second
+        
+        # Start both fslroi runs before waiting on either, so they overlap
+        env = self._fsl_env(ext)
+        processes = []
+        try:
+            for input_file, output_file in jobs:
+                cmd = [
+                    "fslroi",
+                    os.path.abspath(input_file),
+                    os.path.abspath(output_file),
+                    "0", "1"
+                ]
                 self.logger.debug(f"Running: {' '.join(cmd)}")
-                result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+                # stdout is never read; only stderr is kept, for error messages
+                processes.append(subprocess.Popen(
+                    cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, env=env
+                ))
+            
+            for process, (_, output_file) in zip(processes, jobs):
+                _, stderr = process.communicate()
+                if process.returncode != 0:
+                    error_msg = f"fslroi failed: {stderr}"
+                    self.logger.error(error_msg)
+                    raise RuntimeError(error_msg)
                 
                 if not output_file.exists():
                     raise RuntimeError(f"Output file was not created: {output_file}")
-                    
-            except subprocess.CalledProcessError as e:
-                error_msg = f"fslroi failed: {e.stderr}"
-                self.logger.error(error_msg)
-                raise RuntimeError(error_msg)
+        finally:
+            # Do not leave a run going if the other one failed
+            for process in processes:
+                if process.poll() is None:
+                    process.kill()
+                    process.communicate()
         
         return b0_first, b0_second
     
-    def _merge_b0_images(self, b0_first: Path, b0_second: Path, topup_dir: Path, subject_id: str, pe_direction: str) -> Path:
+    def _merge_b0_images(self, b0_first: Path, b0_second: Path, topup_dir: Path, subject_id: str,
+                         pe_direction: str, ext: str = ".nii.gz") -> Path:
         """
         Merge dual phase encoding B0 images for TopUp processing.
         
         Args:
             b0_first: First direction B0 image path
             b0_second: Second direction B0 image path
-            topup_dir: TopUp working directory
+            topup_dir: Directory for the merged B0 image
             subject_id: Subject identifier
             pe_direction: Phase encoding direction string (e.g., "AP-PA", "LR-RL")
+            ext: Image extension for the merged B0 image
             
         Returns:
             Path to merged B0 image
         """
-        merged_b0 = topup_dir / f"{subject_id}_dir-{pe_direction}_dwi.nii.gz"
+        merged_b0 = topup_dir / f"{subject_id}_dir-{pe_direction}_dwi{ext}"
         
         cmd = [
             "fslmerge",
             "-t",
-            str(merged_b0.resolve()),
-            str(b0_first.resolve()),
-            str(b0_second.resolve())
+            os.path.abspath(merged_b0),
+            os.path.abspath(b0_first),
+            os.path.abspath(b0_second)
         ]
         
         try:
             self.logger.debug(f"Running: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            subprocess.run(
+                cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True,
+                env=self._fsl_env(ext)
+            )
             
             if not merged_b0.exists():
                 raise RuntimeError(f"Merged B0 file was not created: {merged_b0}")
@@ -282,6 +469,20 @@ class DistortionCorrector(BaseProcessor):
         
         return merged_b0
     
+    def _fsl_env(self, ext: str) -> Dict[str, str]:
+        """
+        Get the environment for FSL tools writing images with the given extension.
+        
+        FSL picks the output format from FSLOUTPUTTYPE, not from the file name.
+        
+        Args:
+            ext: Image extension (".nii.gz" or ".nii")
+            
+        Returns:
+            Copy of the current environment with FSLOUTPUTTYPE set
+        """
+        return {**os.environ, "FSLOUTPUTTYPE": _FSL_OUTPUT_TYPES[ext]}
+    
     def _create_acquisition_params(self, pe_files: Dict[str, Path], topup_dir: Path, pe_direction: str) -> Path:
         """
         Create acquisition parameters file for TopUp.
@@ -331,18 +532,21 @@ class DistortionCorrector(BaseProcessor):
         for key in ['first', 'second']:
             if pe_files[key]:
                 json_file = pe_files[key].parent / f"{pe_files[key].stem.replace('.nii', '')}.json"
-                if json_file.exists():
-                    try:
-                        with open(json_file, 'r') as f:
-                            metadata = json.load(f)
+                try:
+                    # Sidecars are parsed once per version (keyed by stat), so
+                    # reruns in the same process skip the JSON entirely
+                    stat = os.stat(json_file)
+                    readout_time = _sidecar_readout_time(os.fspath(json_file), stat.st_mtime_ns, stat.st_size)
+                    
+                    # Use TotalReadoutTime if available in metadata
+                    if readout_time is not None:
+                        self.logger.info(f"Using TotalReadoutTime from JSON: {readout_time}")
+                        return readout_time
                         
-                        # Use TotalReadoutTime if available in metadata
-                        if 'TotalReadoutTime' in metadata:
-                            self.logger.info(f"Using TotalReadoutTime from JSON: {metadata['TotalReadoutTime']}")
-                            return metadata['TotalReadoutTime']
-                            
-                    except (json.JSONDecodeError, KeyError) as e:
-                        self.logger.warning(f"Could not read readout time from {json_file}: {e}")
+                except FileNotFoundError:
+                    continue
+                except (json.JSONDecodeError, KeyError) as e:
+                    self.logger.warning(f"Could not read readout time from {json_file}: {e}")
         
         # Check if readout time is specified in config
         if self.config.processing.readout_time is not None:
@@ -375,17 +579,17 @@ class DistortionCorrector(BaseProcessor):
         
         cmd = [
             "topup",
-            f"--imain={merged_b0.resolve()}",
-            f"--datain={acq_params.resolve()}",
+            f"--imain={os.path.abspath(merged_b0)}",
+            f"--datain={os.path.abspath(acq_params)}",
             f"--config={fsl_config_path}",
-            f"--out={topup_output_base.resolve()}",
-            f"--nthr={self.config.processing.n_threads}",
+            f"--out={os.path.abspath(topup_output_base)}",
+            f"--nthr={self.n_threads}",
             "--subsamp=1"
         ]
         
         try:
             self.logger.debug(f"Running: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
             
             # TopUp creates several output files
             expected_outputs = [
@@ -458,17 +662,17 @@ class DistortionCorrector(BaseProcessor):
         
         cmd = [
             "applytopup",
-            f"--imain={first_dwi.resolve()}",
+            f"--imain={os.path.abspath(first_dwi)}",
             "--inindex=1",
-            f"--datain={acq_params.resolve()}",
-            f"--topup={topup_output.resolve()}",
+            f"--datain={os.path.abspath(acq_params)}",
+            f"--topup={os.path.abspath(topup_output)}",
             "--method=jac",
-            f"--out={corrected_dwi.resolve()}"
+            f"--out={os.path.abspath(corrected_dwi)}"
         ]
         
         try:
             self.logger.debug(f"Running: {' '.join(cmd)}")
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+            subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True, check=True)
             
             if not corrected_dwi.exists():
                 raise RuntimeError(f"Corrected DWI file was not created: {corrected_dwi}")
@@ -509,11 +713,9 @@ class DistortionCorrector(BaseProcessor):
             self.logger.warning(f"Subject {subject_id} does not have dual phase encoding data")
             return True  # This is valid, but TopUp will be skipped
         
-        # Check that FSL is available
+        # Check that FSL is available (looked up once per process)
         for cmd in ["fslroi", "fslmerge", "topup", "applytopup"]:
-            try:
-                subprocess.run([cmd, "--help"], capture_output=True, check=True)
-            except (subprocess.CalledProcessError, FileNotFoundError):
+            if self.find_tool_on_path(cmd) is None:
                 self.logger.error(f"FSL command not found: {cmd}. Please ensure FSL is installed and in PATH.")
                 return False
         
@@ -390,7 +390,7 @@ class EddyCorrector(BaseProcessor):
         
         # Only add --nthr for non-CUDA versions
         if use_nthr:
-            cmd.append(f"--nthr={self.config.processing.n_threads}")
+            cmd.append(f"--nthr={self.n_threads}")
         
         try:
             self.logger.debug(f"Running: {' '.join(cmd)}")
@@ -512,19 +512,15 @@ class EddyCorrector(BaseProcessor):
             self.logger.error(f"bval/bvec files not found for {subject_id} with direction AP")
             return False
         
-        # Check that FSL commands are available
+        # Check that FSL commands are available (looked up once per process)
         for cmd in ["fslroi", "bet", "fslinfo"]:
-            try:
-                subprocess.run([cmd, "--help"], capture_output=True, check=True)
-            except (subprocess.CalledProcessError, FileNotFoundError):
+            if self.find_tool_on_path(cmd) is None:
                 self.logger.error(f"FSL command not found: {cmd}")
                 return False
         
         # Check that eddy command is available
         eddy_cmd = self.config.processing.eddy_method if self.config.processing.eddy_cuda else "eddy_openmp"
-        try:
-            subprocess.run([eddy_cmd, "--help"], capture_output=True, check=True)
-        except (subprocess.CalledProcessError, FileNotFoundError):
+        if self.find_tool_on_path(eddy_cmd) is None:
             self.logger.error(f"Eddy command not found: {eddy_cmd}")
             return False
         
@@ -184,7 +184,7 @@ class GibbsRemover(BaseProcessor):
             str(input_file.resolve()),
             str(output_file.resolve()),
             "-force",
-            "-nthreads", str(self.config.processing.n_threads)
+            "-nthreads", str(self.n_threads)
         ]
         
         # Execute command
@@ -242,10 +242,8 @@ class GibbsRemover(BaseProcessor):
             self.logger.error(f"No denoised DWI files found in {dwi_dir}")
             return False
         
-        # Check that MRtrix3 is available
-        try:
-            self.run_command(["mrdegibbs", "--help"])
-        except (subprocess.CalledProcessError, FileNotFoundError):
+        # Check that MRtrix3 is available (looked up once per process)
+        if self.find_tool("mrdegibbs") is None:
             self.logger.error("MRtrix3 mrdegibbs command not found. Please ensure MRtrix3 is installed and in PATH.")
             return False
         
@@ -304,4 +302,4 @@ class GibbsRemover(BaseProcessor):
             return False
         
         # Check if all expected outputs exist
-        return all(output.exists() for output in expected_outputs) 
\ No newline at end of file
+        return self.outputs_exist(expected_outputs)
\ No newline at end of file
@@ -29,21 +29,8 @@ class ROIRegistration(BaseProcessor):
         super().__init__(config, logger)
         self.name = "ROI Registration"
         
-        # Define the BNST network ROIs to transform
-        self.bnst_regions = [
-            "L_amygdala_fsaverage",
-            "R_amygdala_fsaverage", 
-            "L_hippocampus_fsaverage",
-            "R_hippocampus_fsaverage",
-            "L_vmPFC_fsaverage",
-            "R_vmPFC_fsaverage",
-            "L_insula_fsaverage",
-            "R_insula_fsaverage",
-            "L_hypothalamus_fsaverage",
-            "R_hypothalamus_fsaverage",
-            "L_bnst_fsaverage",
-            "R_bnst_fsaverage"
-        ]
+        # BNST network ROIs to transform (fsaverage names from the configuration)
+        self.bnst_regions = self.config.rois.roi_names
 
     def process(self, subject_id: str, session_id: Optional[str] = None) -> ProcessingResult:
         """
@@ -233,7 +233,7 @@ class TrackFilter(MRtrix3Processor):
             cmd = [
                 "tcksift2",
                 "-proc_mask", str(mask_file.resolve()),
-                "-nthreads", str(self.config.processing.n_threads),
+                "-nthreads", str(self.n_threads),
                 str(track_file.resolve()),
                 str(fod_file.resolve()),
                 str(sift_weights.resolve())
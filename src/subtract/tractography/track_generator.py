@@ -84,7 +84,7 @@ class TrackGenerator(MRtrix3Processor):
             
             # Check if outputs already exist
             expected_outputs = self._get_expected_track_files(mrtrix_dir)
-            if all(f.exists() for f in expected_outputs) and not self.config.processing.force_overwrite:
+            if not self.config.processing.force_overwrite and self.outputs_exist(expected_outputs):
                 self.logger.info(f"Track files already exist for {subject_id}, skipping")
                 return ProcessingResult(
                     success=True,
@@ -179,7 +179,7 @@ class TrackGenerator(MRtrix3Processor):
                 "-act", str(act_file.resolve()),  # Anatomically constrained tractography
                 "-backtrack",  # Allow backtracking
                 "-seed_gmwmi", str(gmwm_seed_file.resolve()),  # Seed from GM-WM interface
-                "-nthreads", str(self.config.processing.n_threads),
+                "-nthreads", str(self.n_threads),
                 "-select", str(self.config.processing.n_tracks),  # Number of tracks from config
                 "-cutoff", str(self.config.processing.track_cutoff),  # FOD amplitude cutoff
                 "-force",
@@ -6,13 +6,45 @@ including subject discovery, file finding, and metadata extraction.
 """
 
 import json
+import os
+import threading
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple, Any
+from typing import Dict, List, Optional, Sequence, Tuple, Any
 import logging
 import re
 
 from ..config.settings import SubtractConfig
 
+try:
+    import orjson
+except ImportError:
+    # orjson not available, fall back to the standard library parser
+    orjson = None
+
+
+# Anatomical suffixes copied alongside the DWI data
+_ANAT_SUFFIXES = ("T1w", "T2w", "FLAIR", "PD")
+
+
+def load_json_sidecar(json_file: Path) -> Dict[str, Any]:
+    """
+    Load a BIDS JSON sidecar.
+    
+    Uses orjson when available, which parses the raw bytes directly and is
+    considerably faster than the standard library on many small files.
+    
+    Args:
+        json_file: Path to the JSON sidecar
+        
+    Returns:
+        Parsed JSON content
+    """
+    if orjson is not None:
+        return orjson.loads(Path(json_file).read_bytes())
+    
+    with open(json_file, 'r') as f:
+        return json.load(f)
+
 
 class BIDSLayout:
     """
@@ -51,17 +83,16 @@ class BIDSLayout:
         Returns:
             List of subject IDs (without 'sub-' prefix)
         """
-        subject_dirs = [
-            d for d in self.bids_root.iterdir()
-            if d.is_dir() and d.name.startswith('sub-')
-        ]
-        
-        subjects = [d.name[4:] for d in subject_dirs]  # Remove 'sub-' prefix
+        # scandir reports the entry type from the directory listing, so no stat per entry
+        with os.scandir(self.bids_root) as entries:
+            subjects = [
+                entry.name[4:]  # Remove 'sub-' prefix
+                for entry in entries
+                if entry.name.startswith('sub-') and entry.is_dir()
+            ]
         
-        # Apply subject filter if specified
-        if self.config.subject_filter:
-            pattern = re.compile(self.config.subject_filter)
-            subjects = [s for s in subjects if pattern.match(s)]
+        # Apply participant labels and subject filter if specified
+        subjects = self.config.filter_subjects(subjects)
         
         return sorted(subjects)
     
@@ -77,22 +108,41 @@ class BIDSLayout:
         """
         subject_dir = self.bids_root / f"sub-{subject}"
         
-        if not subject_dir.exists():
+        # Let the listing itself report a missing subject instead of stat-ing first
+        try:
+            with os.scandir(subject_dir) as entries:
+                sessions = [
+                    entry.name[4:]  # Remove 'ses-' prefix
+                    for entry in entries
+                    if entry.name.startswith('ses-') and entry.is_dir()
+                ]
+        except (FileNotFoundError, NotADirectoryError):
             return []
         
-        session_dirs = [
-            d for d in subject_dir.iterdir()
-            if d.is_dir() and d.name.startswith('ses-')
-        ]
-        
-        sessions = [d.name[4:] for d in session_dirs]  # Remove 'ses-' prefix
-        
         # Apply session filter if specified
         if self.config.bids.sessions:
-            sessions = [s for s in sessions if s in self.config.bids.sessions]
+            wanted_sessions = frozenset(self.config.bids.sessions)
+            sessions = [s for s in sessions if s in wanted_sessions]
         
         return sorted(sessions)
     
+    def get_subject_files(self, subject: str, session: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        Get DWI and anatomical files for a subject/session in one call.
+        
+        Args:
+            subject: Subject ID (without 'sub-' prefix)
+            session: Session ID (without 'ses-' prefix), optional
+            
+        Returns:
+            Dictionary with 'dwi' and 'anat' lists, as returned by
+            get_dwi_files and get_anat_files
+        """
+        return {
+            'dwi': self.get_dwi_files(subject, session),
+            'anat': self.get_anat_files(subject, session),
+        }
+    
     def get_dwi_files(self, subject: str, session: Optional[str] = None) -> List[Dict[str, Any]]:
         """
         Get DWI files for a subject/session.
@@ -104,46 +154,25 @@ class BIDSLayout:
         Returns:
             List of dictionaries containing DWI file information
         """
-        if session:
-            dwi_dir = self.bids_root / f"sub-{subject}" / f"ses-{session}" / "dwi"
-        else:
-            dwi_dir = self.bids_root / f"sub-{subject}" / "dwi"
-        
-        if not dwi_dir.exists():
-            return []
+        dwi_dir = self._modality_dir(subject, session, "dwi")
         
         dwi_files = []
         
-        # Find all DWI NIfTI files (both .nii.gz and .nii)
-        for suffix in self.config.bids.dwi_suffixes:
-            # Try both .nii.gz and .nii extensions
-            nii_files = []
-            for ext in ['.nii.gz', '.nii']:
-                pattern = f"*_{suffix}{ext}"
-                nii_files.extend(list(dwi_dir.glob(pattern)))
+        # Find all DWI NIfTI files (both .nii.gz and .nii) with their sidecars
+        for suffix, nii_file, sidecars in self._find_modality_files(
+            dwi_dir, self.config.bids.dwi_suffixes, ('bval', 'bvec', 'json')
+        ):
+            dwi_info = {
+                'nii': nii_file,
+                'bval': sidecars['bval'],
+                'bvec': sidecars['bvec'],
+                'json': sidecars['json'],
+                'entities': self._parse_bids_filename(nii_file.name),
+                'subject': subject,
+                'session': session
+            }
             
-            for nii_file in nii_files:
-                # Extract BIDS entities from filename
-                entities = self._parse_bids_filename(nii_file.name)
-                
-                # Find associated files
-                base_name = nii_file.name.replace('.nii.gz', '').replace('.nii', '')
-                
-                bval_file = dwi_dir / f"{base_name}.bval"
-                bvec_file = dwi_dir / f"{base_name}.bvec"
-                json_file = dwi_dir / f"{base_name}.json"
-                
-                dwi_info = {
-                    'nii': nii_file,
-                    'bval': bval_file if bval_file.exists() else None,
-                    'bvec': bvec_file if bvec_file.exists() else None,
-                    'json': json_file if json_file.exists() else None,
-                    'entities': entities,
-                    'subject': subject,
-                    'session': session
-                }
-                
-                dwi_files.append(dwi_info)
+            dwi_files.append(dwi_info)
         
         return dwi_files
     
@@ -158,44 +187,69 @@ class BIDSLayout:
         Returns:
             List of dictionaries containing anatomical file information
         """
-        if session:
-            anat_dir = self.bids_root / f"sub-{subject}" / f"ses-{session}" / "anat"
-        else:
-            anat_dir = self.bids_root / f"sub-{subject}" / "anat"
-        
-        if not anat_dir.exists():
-            return []
+        anat_dir = self._modality_dir(subject, session, "anat")
         
         anat_files = []
         
-        # Common anatomical suffixes
-        anat_suffixes = ["T1w", "T2w", "FLAIR", "PD"]
-        
-        for suffix in anat_suffixes:
-            # Try both .nii.gz and .nii extensions
-            nii_files = []
-            for ext in ['.nii.gz', '.nii']:
-                pattern = f"*_{suffix}{ext}"
-                nii_files.extend(list(anat_dir.glob(pattern)))
-                
-            for nii_file in nii_files:
-                entities = self._parse_bids_filename(nii_file.name)
-                base_name = nii_file.name.replace('.nii.gz', '').replace('.nii', '')
-                json_file = anat_dir / f"{base_name}.json"
-                
-                anat_info = {
-                    'nii': nii_file,
-                    'json': json_file if json_file.exists() else None,
-                    'entities': entities,
-                    'subject': subject,
-                    'session': session,
-                    'suffix': suffix
-                }
-                
-                anat_files.append(anat_info)
+        for suffix, nii_file, sidecars in self._find_modality_files(
+            anat_dir, _ANAT_SUFFIXES, ('json',)
+        ):
+            anat_info = {
+                'nii': nii_file,
+                'json': sidecars['json'],
+                'entities': self._parse_bids_filename(nii_file.name),
+                'subject': subject,
+                'session': session,
+                'suffix': suffix
+            }
+            
+            anat_files.append(anat_info)
         
         return anat_files
     
+    def _modality_dir(self, subject: str, session: Optional[str], modality: str) -> Path:
+        """Get the BIDS directory holding one modality for a subject/session."""
+        if session:
+            return self.bids_root / f"sub-{subject}" / f"ses-{session}" / modality
+        return self.bids_root / f"sub-{subject}" / modality
+    
+    def _find_modality_files(
+        self,
+        modality_dir: Path,
+        suffixes: Sequence[str],
+        sidecar_extensions: Tuple[str, ...]
+    ) -> List[Tuple[str, Path, Dict[str, Optional[Path]]]]:
+        """
+        Find NIfTI files and their sidecars from a single directory listing.
+        
+        Args:
+            modality_dir: BIDS modality directory (e.g. dwi/ or anat/)
+            suffixes: BIDS suffixes to look for, in output order
+            sidecar_extensions: Sidecar extensions to pair with each NIfTI
+            
+        Returns:
+            (suffix, NIfTI path, {extension: sidecar path or None}) tuples
+        """
+        try:
+            with os.scandir(modality_dir) as entries:
+                names = {entry.name for entry in entries if not entry.name.startswith('.')}
+        except (FileNotFoundError, NotADirectoryError):
+            return []
+        
+        found = []
+        for suffix in suffixes:
+            for ext in ('.nii.gz', '.nii'):
+                tail = f"_{suffix}{ext}"
+                for name in sorted(n for n in names if n.endswith(tail)):
+                    base_name = name[:-len(ext)]
+                    sidecars = {}
+                    for sidecar_ext in sidecar_extensions:
+                        sidecar_name = f"{base_name}.{sidecar_ext}"
+                        sidecars[sidecar_ext] = modality_dir / sidecar_name if sidecar_name in names else None
+                    found.append((suffix, modality_dir / name, sidecars))
+        
+        return found
+    
     def get_dwi_metadata(self, dwi_info: Dict[str, Any]) -> Dict[str, Any]:
         """
         Extract metadata from DWI JSON sidecar.
@@ -210,8 +264,7 @@ class BIDSLayout:
         
         if dwi_info['json'] and dwi_info['json'].exists():
             try:
-                with open(dwi_info['json'], 'r') as f:
-                    metadata = json.load(f)
+                metadata = load_json_sidecar(dwi_info['json'])
             except Exception as e:
                 self.logger.warning(f"Failed to read JSON metadata from {dwi_info['json']}: {e}")
         
@@ -367,4 +420,45 @@ class BIDSLayout:
         if not anat_files:
             validation['warnings'].append("No anatomical files found")
         
-        return validation 
\ No newline at end of file
+        return validation 
+
+
+# Shared layouts per dataset root: root -> (root mtime, layout)
+_LAYOUT_CACHE: Dict[str, Tuple[int, BIDSLayout]] = {}
+_LAYOUT_CACHE_LOCK = threading.Lock()
+
+
+def get_bids_layout(
+    bids_root: Path,
+    config: SubtractConfig,
+    logger: Optional[logging.Logger] = None
+) -> BIDSLayout:
+    """
+    Get a BIDS layout for a dataset, shared by every caller in the process.
+    
+    The layout is rebuilt when the dataset root's mtime changes or when a
+    different configuration object asks for it.
+    
+    Args:
+        bids_root: Path to BIDS dataset root
+        config: Pipeline configuration
+        logger: Logger instance (used only when a new layout is built)
+        
+    Returns:
+        BIDSLayout for the dataset
+    """
+    bids_root = Path(bids_root)
+    try:
+        mtime = bids_root.stat().st_mtime_ns
+    except FileNotFoundError:
+        raise FileNotFoundError(f"BIDS root does not exist: {bids_root}")
+    
+    key = str(bids_root)
+    with _LAYOUT_CACHE_LOCK:
+        cached = _LAYOUT_CACHE.get(key)
+        if cached is not None and cached[0] == mtime and cached[1].config is config:
+            return cached[1]
+        
+        layout = BIDSLayout(bids_root, config, logger)
+        _LAYOUT_CACHE[key] = (mtime, layout)
+        return layout
@@ -5,14 +5,23 @@ This module provides utilities for running commands in specific conda environmen
 which is necessary for tools that have conflicting dependencies.
 """
 
+import asyncio
 import logging
+import os
+import shutil
 import subprocess
 import shlex
+import threading
+from functools import lru_cache
 from pathlib import Path
 from typing import List, Optional, Union, Dict
 
 logger = logging.getLogger(__name__)
 
+# Activated environment variables per conda env (None if capture failed)
+_ACTIVATED_ENVIRONMENTS: Dict[str, Optional[Dict[str, str]]] = {}
+_ACTIVATED_ENVIRONMENTS_LOCK = threading.Lock()
+
 
 def get_conda_command(
     command: Union[str, List[str]], 
@@ -42,6 +51,71 @@ def get_conda_command(
     return conda_cmd
 
 
+@lru_cache(maxsize=None)
+def _resolve_executable(name: str, search_path: Optional[str] = None) -> str:
+    """
+    Resolve a command name to an absolute path, caching the lookup.
+    
+    subprocess can only launch through posix_spawn (skipping fork) when the
+    executable is given as a path, so tool commands are resolved up front.
+    
+    Args:
+        name: Executable name or path
+        search_path: PATH to search (default: this process's PATH)
+        
+    Returns:
+        Absolute path to the executable, or name unchanged if not found
+    """
+    if os.path.dirname(name):
+        return name
+    resolved = shutil.which(name, path=search_path)
+    if resolved is None:
+        return name
+    logger.debug(f"Resolved '{name}' to {resolved}")
+    return resolved
+
+
+def _spawn_command(command: List[str], env: Optional[Dict[str, str]]) -> List[str]:
+    """Return command with its executable resolved against env's PATH."""
+    if not command:
+        return command
+    search_path = env.get("PATH") if env is not None else None
+    return [_resolve_executable(command[0], search_path)] + command[1:]
+
+
+def get_activated_environment(env_name: str = "subtract") -> Optional[Dict[str, str]]:
+    """
+    Get the environment variables of an activated conda environment.
+    
+    Activation is performed once per process via ``conda run`` and cached, so
+    later commands can be executed directly without paying conda's startup
+    cost on every call.
+    
+    Args:
+        env_name: Name of conda environment
+        
+    Returns:
+        Environment variables, or None if the environment could not be activated
+    """
+    with _ACTIVATED_ENVIRONMENTS_LOCK:
+        if env_name not in _ACTIVATED_ENVIRONMENTS:
+            try:
+                result = subprocess.run(
+                    ["conda", "run", "-n", env_name, "env", "-0"],
+                    capture_output=True,
+                    check=True
+                )
+                _ACTIVATED_ENVIRONMENTS[env_name] = dict(
+                    item.split("=", 1)
+                    for item in result.stdout.decode(errors="replace").split("\0")
+                    if "=" in item
+                )
+            except (subprocess.CalledProcessError, OSError) as e:
+                logger.debug(f"Could not capture conda env '{env_name}', using conda run per command: {e}")
+                _ACTIVATED_ENVIRONMENTS[env_name] = None
+        return _ACTIVATED_ENVIRONMENTS[env_name]
+
+
 def run_in_conda_env(
     command: Union[str, List[str]],
     env_name: str = "subtract",
@@ -64,18 +138,31 @@ def run_in_conda_env(
     Returns:
         CompletedProcess result
     """
-    conda_cmd = get_conda_command(command, env_name)
+    activated_env = get_activated_environment(env_name)
+    if activated_env is not None:
+        # Run directly with the cached activation instead of via conda run
+        conda_cmd = shlex.split(command) if isinstance(command, str) else list(command)
+        run_env = {**activated_env, **env} if env else activated_env
+    else:
+        conda_cmd = get_conda_command(command, env_name)
+        # Extra variables must not replace the environment conda run needs
+        run_env = {**os.environ, **env} if env else None
     
     logger.debug(f"Running in conda env '{env_name}': {' '.join(conda_cmd)}")
     
     try:
+        # With no cwd, an absolute executable and close_fds=False let
+        # subprocess use posix_spawn instead of fork + exec (calls that set
+        # cwd still fork); Python's own descriptors are non-inheritable, so
+        # none leak into the tool
         result = subprocess.run(
-            conda_cmd,
+            _spawn_command(conda_cmd, run_env),
             cwd=cwd,
-            env=env,
+            env=run_env,
             capture_output=capture_output,
             text=True,
-            check=check
+            check=check,
+            close_fds=False
         )
         return result
     except subprocess.CalledProcessError as e:
@@ -88,6 +175,71 @@ def run_in_conda_env(
         raise
 
 
+async def run_in_conda_env_async(
+    command: Union[str, List[str]],
+    env_name: str = "subtract",
+    cwd: Optional[Path] = None,
+    env: Optional[Dict[str, str]] = None,
+    capture_output: bool = True,
+    check: bool = True
+) -> subprocess.CompletedProcess:
+    """
+    Run a command in a specific conda environment without blocking the event loop.
+    
+    Args:
+        command: Command to run
+        env_name: Conda environment name
+        cwd: Working directory
+        env: Environment variables
+        capture_output: Whether to capture stdout/stderr
+        check: Whether to raise exception on non-zero exit
+        
+    Returns:
+        CompletedProcess result
+    """
+    # Activation is cached after the first call, but that call shells out to conda
+    loop = asyncio.get_running_loop()
+    activated_env = await loop.run_in_executor(None, get_activated_environment, env_name)
+    if activated_env is not None:
+        conda_cmd = shlex.split(command) if isinstance(command, str) else list(command)
+        run_env = {**activated_env, **env} if env else activated_env
+    else:
+        conda_cmd = get_conda_command(command, env_name)
+        # Extra variables must not replace the environment conda run needs
+        run_env = {**os.environ, **env} if env else None
+    
+    logger.debug(f"Running in conda env '{env_name}': {' '.join(conda_cmd)}")
+    
+    pipe = asyncio.subprocess.PIPE if capture_output else None
+    process = await asyncio.create_subprocess_exec(
+        *_spawn_command(conda_cmd, run_env),
+        cwd=cwd,
+        env=run_env,
+        stdout=pipe,
+        stderr=pipe
+    )
+    stdout, stderr = await process.communicate()
+    result = subprocess.CompletedProcess(
+        conda_cmd,
+        process.returncode,
+        stdout.decode(errors="replace") if stdout is not None else None,
+        stderr.decode(errors="replace") if stderr is not None else None
+    )
+    
+    if check and result.returncode != 0:
+        logger.error(f"Command failed in conda env '{env_name}': {' '.join(conda_cmd)}")
+        logger.error(f"Return code: {result.returncode}")
+        if result.stdout:
+            logger.error(f"Stdout: {result.stdout}")
+        if result.stderr:
+            logger.error(f"Stderr: {result.stderr}")
+        raise subprocess.CalledProcessError(
+            result.returncode, conda_cmd, output=result.stdout, stderr=result.stderr
+        )
+    
+    return result
+
+
 # Environment mapping for different tools
 TOOL_ENVIRONMENTS = {
     # ANTs tools - use dedicated ants environment
@@ -188,4 +340,36 @@ def run_tool_command(
         env=env,
         capture_output=capture_output,
         check=check
-    ) 
\ No newline at end of file
+    ) 
+
+
+async def run_tool_command_async(
+    command: Union[str, List[str]],
+    cwd: Optional[Path] = None,
+    env: Optional[Dict[str, str]] = None,
+    capture_output: bool = True,
+    check: bool = True
+) -> subprocess.CompletedProcess:
+    """
+    Run a tool command in the appropriate conda environment from a coroutine.
+    
+    Args:
+        command: Command to run
+        cwd: Working directory
+        env: Environment variables
+        capture_output: Whether to capture stdout/stderr
+        check: Whether to raise exception on non-zero exit
+        
+    Returns:
+        CompletedProcess result
+    """
+    env_name = get_tool_environment(command)
+    
+    return await run_in_conda_env_async(
+        command=command,
+        env_name=env_name,
+        cwd=cwd,
+        env=env,
+        capture_output=capture_output,
+        check=check
+    )
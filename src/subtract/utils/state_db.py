@@ -0,0 +1,233 @@
+"""
+Processing state index for SubTract pipeline.
+
+This module keeps a small SQLite database in the analysis directory that
+records the outcome of every pipeline step, so status queries do not have to
+walk the output tree.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional
+
+
+STATE_DB_NAME = ".subtract_state.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS state (
+    subject_id TEXT NOT NULL,
+    session_id TEXT NOT NULL DEFAULT '',
+    step TEXT NOT NULL,
+    status TEXT NOT NULL,
+    mtime REAL NOT NULL,
+    PRIMARY KEY (subject_id, session_id, step)
+);
+CREATE TABLE IF NOT EXISTS results (
+    subject_id TEXT NOT NULL,
+    session_id TEXT NOT NULL DEFAULT '',
+    step TEXT NOT NULL,
+    success INTEGER NOT NULL,
+    execution_time REAL NOT NULL,
+    outputs TEXT NOT NULL,
+    error_message TEXT,
+    PRIMARY KEY (subject_id, session_id, step)
+);
+"""
+
+
+class ProcessingStateDB:
+    """
+    SQLite-backed index of per-step processing status.
+
+    Connections are opened per call so instances stay picklable and can be
+    shipped to parallel workers; WAL journaling lets those workers write
+    concurrently.
+    """
+
+    def __init__(self, db_path: Path, timeout: float = 30.0):
+        """
+        Initialize the state index.
+
+        Args:
+            db_path: Path to the SQLite database file
+            timeout: Seconds to wait for a lock held by another writer
+        """
+        self.db_path = Path(db_path)
+        self.timeout = timeout
+        self._initialized = False
+
+    @classmethod
+    def for_analysis_dir(cls, analysis_dir: Path) -> "ProcessingStateDB":
+        """
+        Return the state index stored in an analysis directory.
+        
+        Instances are shared per directory, so the schema setup runs once
+        per process rather than once per status query.
+        """
+        key = os.path.abspath(analysis_dir)
+        with _INSTANCES_LOCK:
+            instance = _INSTANCES.get(key)
+            if instance is None:
+                instance = _INSTANCES[key] = cls(Path(key) / STATE_DB_NAME)
+        return instance
+
+    def exists(self) -> bool:
+        """Check whether the database file has been created."""
+        return self.db_path.is_file()
+
+    def _connect(self, write: bool = True) -> sqlite3.Connection:
+        conn = sqlite3.connect(str(self.db_path), timeout=self.timeout)
+        # Queries only need the tables a writer has already created
+        if write and not self._initialized:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(_SCHEMA)
+            conn.commit()
+            self._initialized = True
+        return conn
+
+    def record(
+        self,
+        subject_id: str,
+        session_id: Optional[str],
+        step: str,
+        status: str,
+        execution_time: float = 0.0,
+        outputs: Optional[Iterable[Any]] = None,
+        error_message: Optional[str] = None
+    ) -> None:
+        """
+        Record the outcome of a step, replacing any previous entry.
+
+        Args:
+            subject_id: Subject identifier
+            session_id: Session identifier (None for single-session data)
+            step: Pipeline step name
+            status: Step status ("done" or "failed")
+            execution_time: Step wall time in seconds
+            outputs: Output paths produced by the step
+            error_message: Error message for failed steps
+        """
+        key = (subject_id, session_id or "", step)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        with closing(self._connect()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO state (subject_id, session_id, step, status, mtime) "
+                "VALUES (?, ?, ?, ?, ?)",
+                key + (status, time.time())
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO results "
+                "(subject_id, session_id, step, success, execution_time, outputs, error_message) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                key + (
+                    int(status == "done"),
+                    execution_time,
+                    json.dumps([str(output) for output in outputs or ()]),
+                    error_message
+                )
+            )
+
+    def get_step_counts(
+        self,
+        status: str = "done",
+        subject_ids: Optional[Iterable[str]] = None
+    ) -> Dict[str, int]:
+        """
+        Count subject/session entries per step with the given status.
+
+        Args:
+            status: Status to count
+            subject_ids: Restrict counts to these subjects (default: all)
+
+        Returns:
+            Dictionary mapping step names to counts
+        """
+        if not self.exists():
+            return {}
+
+        with closing(self._connect(write=False)) as conn:
+            if subject_ids is None:
+                rows = conn.execute(
+                    "SELECT step, COUNT(*) FROM state WHERE status = ? GROUP BY step",
+                    (status,)
+                ).fetchall()
+                return dict(rows)
+
+            # Filter in Python to stay clear of SQLite's host parameter limit
+            wanted = frozenset(subject_ids)
+            counts: Dict[str, int] = {}
+            for subject_id, step in conn.execute(
+                "SELECT subject_id, step FROM state WHERE status = ?", (status,)
+            ):
+                if subject_id in wanted:
+                    counts[step] = counts.get(step, 0) + 1
+            return counts
+
+    def get_subject_status(self, subject_id: str, session_id: Optional[str] = None) -> Dict[str, str]:
+        """
+        Get the recorded status of every step for one subject/session.
+
+        Args:
+            subject_id: Subject identifier
+            session_id: Session identifier (None for single-session data)
+
+        Returns:
+            Dictionary mapping step names to status strings
+        """
+        if not self.exists():
+            return {}
+
+        with closing(self._connect(write=False)) as conn:
+            rows = conn.execute(
+                "SELECT step, status FROM state WHERE subject_id = ? AND session_id = ?",
+                (subject_id, session_id or "")
+            ).fetchall()
+        return dict(rows)
+
+    def get_subject_results(
+        self,
+        subject_id: str,
+        session_id: Optional[str] = None
+    ) -> Dict[str, Dict[str, Any]]:
+        """
+        Get the last recorded result of every step for one subject/session.
+
+        Args:
+            subject_id: Subject identifier
+            session_id: Session identifier (None for single-session data)
+
+        Returns:
+            Dictionary mapping step names to dictionaries with ``success``,
+            ``execution_time``, ``outputs`` (list of path strings) and
+            ``error_message``
+        """
+        if not self.exists():
+            return {}
+
+        with closing(self._connect(write=False)) as conn:
+            rows = conn.execute(
+                "SELECT step, success, execution_time, outputs, error_message FROM results "
+                "WHERE subject_id = ? AND session_id = ?",
+                (subject_id, session_id or "")
+            ).fetchall()
+
+        results: Dict[str, Dict[str, Any]] = {}
+        for step, success, execution_time, outputs, error_message in rows:
+            output_list: List[str] = json.loads(outputs)
+            results[step] = {
+                "success": bool(success),
+                "execution_time": execution_time,
+                "outputs": output_list,
+                "error_message": error_message,
+            }
+        return results
+
+
+# Shared instances per analysis directory (see ProcessingStateDB.for_analysis_dir)
+_INSTANCES: Dict[str, ProcessingStateDB] = {}
+_INSTANCES_LOCK = threading.Lock()